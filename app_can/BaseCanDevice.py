@@ -0,0 +1,321 @@
+import abc
+import logging
+import threading
+import time
+from ctypes import c_char_p
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, Signal
+
+from app_can.CanCapture import CaptureWriter
+from app_can.CanFrame import CanFrame
+from app_can.FrameRouter import FrameRouter
+from app_can.RxIngest import RxIngestThread, RxRingBuffer
+from app_can.TxQueue import TxPriority, TxQueue, wait_until
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DeviceInfo:
+    manufacturer: c_char_p = c_char_p()
+    product: c_char_p = c_char_p()
+    serial: c_char_p = c_char_p()
+
+
+class BaseCanDevice(QObject):
+    """
+    Общая часть CAN-устройств: доставка кадров пачками, маршрутизация,
+    логирование TX и запись трафика в файл.
+
+    Наследник реализует работу с конкретным источником кадров (адаптер TSCAN,
+    SocketCAN, шина в процессе, воспроизведение записи, симулятор ЭБУ) и кладет
+    принятые кадры в _push_rx, а отправку кадра - в _transmit. Поток доставки
+    и очередь передачи работают, пока устройство подключено: наследник вызывает
+    _start_workers при успешном connect_to и close в disconnect_device. send_async
+    ставит кадр в очередь TxQueue с приоритетом его класса (прошивка, диагностика,
+    фоновый опрос) и темпом не выше заданной загрузки шины.
+    Сервисы UDS и контроллер работают с активным устройством через active();
+    выбор по имени - app_can.CanBackends.
+    """
+
+    # Пачка кадров list[CanFrame], доставляется не чаще раза в rx_batch_interval
+    signal_new_messages = Signal(list)
+    signal_tracing_started = Signal()
+    signal_tracing_stopped = Signal()
+
+    _active = None
+
+    def __init__(self):
+        # abc.ABC несовместим с метаклассом Qt: нереализованный метод интерфейса
+        # (abc.abstractmethod) проверяется здесь, а не при первом вызове
+        abstract = sorted(name for name in dir(type(self))
+                          if getattr(getattr(type(self), name, None), "__isabstractmethod__", False))
+        if abstract:
+            raise TypeError(f"{type(self).__name__}: не реализованы методы {', '.join(abstract)}")
+        super().__init__()
+        self._device_info: DeviceInfo = DeviceInfo()
+        self._is_connect: bool = False
+        self._is_trace: bool = False
+
+        self._channel: int = -1
+        self._baud_rate: int = -1
+        self._terminator: bool = False
+
+        # Пачки из потока доставки попадают в router уже в GUI-потоке (queued connection)
+        self._router = FrameRouter(self)
+        self.signal_new_messages.connect(self._router.dispatch)
+
+        self._rx_ring = RxRingBuffer()
+        self._rx_ingest: RxIngestThread | None = None
+        self._rx_batch_interval = 0.02
+
+        # Запись трафика в файл (None - запись не ведется)
+        self._capture: CaptureWriter | None = None
+
+        # Очередь передачи (None - кадры уходят сразу из вызывающего потока),
+        # запускается при подключении с загрузкой шины _tx_utilisation
+        self._tx_queue: TxQueue | None = None
+        self._tx_utilisation = 0.7
+
+    @staticmethod
+    def active() -> "BaseCanDevice":
+        """Активное устройство; по умолчанию - адаптер TSCAN."""
+        if BaseCanDevice._active is None:
+            # DLL адаптера загружается только если другое устройство не выбрано
+            from app_can.CanDevice import CanDevice
+            CanDevice.instance().activate()
+        return BaseCanDevice._active
+
+    def activate(self):
+        BaseCanDevice._active = self
+
+    @property
+    def is_trace(self) -> bool:
+        return self._is_trace
+
+    @is_trace.setter
+    def is_trace(self, state: bool):
+        self._is_trace = state
+
+    @property
+    def channel(self) -> int:
+        return self._channel
+
+    @channel.setter
+    def channel(self, chan: int):
+        self._channel = chan
+
+    @property
+    def baud_rate(self) -> int:
+        return self._baud_rate
+
+    @baud_rate.setter
+    def baud_rate(self, br: int):
+        self._baud_rate = br
+        if self._tx_queue is not None:
+            self._tx_queue.configure(baud_rate_kbps=br)
+
+    @property
+    def terminator(self):
+        return self._terminator
+
+    @terminator.setter
+    def terminator(self, ter: bool):
+        self._terminator = ter
+
+    @property
+    def router(self) -> FrameRouter:
+        return self._router
+
+    @property
+    def rx_batch_interval(self) -> float:
+        return self._rx_batch_interval
+
+    @rx_batch_interval.setter
+    def rx_batch_interval(self, interval_s: float):
+        self._rx_batch_interval = max(float(interval_s), 0.001)
+        if self._rx_ingest is not None:
+            self._rx_ingest.interval_s = self._rx_batch_interval
+
+    @property
+    def rx_dropped(self) -> int:
+        return self._rx_ring.dropped
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return self._device_info
+
+    @device_info.setter
+    def device_info(self, info: DeviceInfo):
+        self._device_info = info
+
+    @property
+    def is_connect(self) -> bool:
+        return self._is_connect
+
+    @is_connect.setter
+    def is_connect(self, state: bool):
+        self._is_connect = state
+
+    def _start_workers(self):
+        """Запускает поток доставки RX и очередь передачи; повторный вызов ничего не делает."""
+        if self._rx_ingest is None:
+            self._rx_ingest = RxIngestThread(self._rx_ring, self._deliver_batch, self._rx_batch_interval)
+            self._rx_ingest.start()
+        self.start_tx_queue(self._tx_utilisation)
+
+    def close(self):
+        """
+        Останавливает очередь передачи (неотправленные кадры отбрасываются) и поток
+        доставки RX - остаток принятых кадров доставляется перед выходом.
+        """
+        self.stop_tx_queue()
+        ingest = self._rx_ingest
+        if ingest is None:
+            return
+        self._rx_ingest = None
+        ingest.stop()
+        if ingest is not threading.current_thread():
+            ingest.join(timeout=1.0)
+
+    @property
+    def capture(self) -> CaptureWriter | None:
+        return self._capture
+
+    def start_capture(self, path: str, compress: bool = False, max_file_bytes: int = 0) -> CaptureWriter:
+        self.stop_capture()
+        writer = CaptureWriter(path, compress=compress, max_file_bytes=max_file_bytes)
+        writer.start()
+        self._capture = writer
+        return writer
+
+    def stop_capture(self) -> CaptureWriter | None:
+        writer = self._capture
+        if writer is None:
+            return None
+        # Сначала отключаем источник, затем поток дописывает последний блок
+        self._capture = None
+        writer.stop()
+        writer.join(timeout=5.0)
+        LOGGER.info(f"Запись CAN-трафика остановлена: {writer.frames_written} кадров, "
+                    f"{writer.bytes_written} байт, потеряно {writer.dropped}")
+        return writer
+
+    @property
+    def tx_queue(self) -> TxQueue | None:
+        return self._tx_queue
+
+    def start_tx_queue(self, utilisation: float = 0.7) -> TxQueue:
+        """Включает очередь передачи с ограничением загрузки шины долей utilisation (до close)."""
+        self._tx_utilisation = utilisation
+        if self._tx_queue is not None:
+            self._tx_queue.configure(utilisation=utilisation)
+            return self._tx_queue
+        queue = TxQueue(self._transmit,
+                        baud_rate_kbps=self._baud_rate if self._baud_rate > 0 else 500,
+                        utilisation=utilisation)
+        queue.start()
+        self._tx_queue = queue
+        return queue
+
+    def stop_tx_queue(self):
+        """Отключает очередь: неотправленные кадры отбрасываются, дальше send_async передает сразу."""
+        queue = self._tx_queue
+        if queue is None:
+            return
+        self._tx_queue = None
+        queue.clear()
+        queue.stop()
+        if queue is not threading.current_thread():
+            queue.join(timeout=1.0)
+
+    def tx_stats(self) -> dict[str, dict[str, float | int]]:
+        """Глубина очереди и задержка передачи по классам приоритета."""
+        return self._tx_queue.stats() if self._tx_queue is not None else {}
+
+    def send_async(self, iden: int, dlc: int, data: list[int], priority: TxPriority = TxPriority.DIAGNOSTIC):
+        """Отправка кадра без ожидания через очередь передачи."""
+        queue = self._tx_queue
+        if queue is None:
+            return self._transmit(iden, dlc, data)
+        return 0 if queue.put(iden, dlc, list(data), priority) else -1
+
+    def send_burst(self,
+                   frames: list[tuple[int, int, list[int]]],
+                   st_min_s: float = 0.0,
+                   priority: TxPriority = TxPriority.FLASHING):
+        """
+        Серия кадров подряд с паузой не меньше st_min_s (блок CF ISO-TP).
+        Без очереди передачи паузы выдерживаются в вызывающем потоке.
+        """
+        queue = self._tx_queue
+        if queue is not None:
+            return 0 if queue.put_burst(frames, st_min_s, priority) else -1
+        last_sent = 0.0
+        for index, (iden, dlc, data) in enumerate(frames):
+            if index > 0 and st_min_s > 0.0:
+                wait_until(last_sent + st_min_s)
+            self._transmit(iden, dlc, data)
+            last_sent = time.perf_counter()
+        return 0
+
+    # Интерфейс источника кадров, который реализует каждый наследник.
+
+    @abc.abstractmethod
+    def get_devices(self):
+        """Число доступных устройств (c_int32/s32 с полем value)."""
+
+    @abc.abstractmethod
+    def update_device_info(self, device_index: int):
+        """Заполняет device_info для устройства с индексом device_index."""
+
+    @abc.abstractmethod
+    def connect_to(self, device_index: int):
+        """Подключение; возвращает handle (c_size_t), value == 0 - ошибка."""
+
+    @abc.abstractmethod
+    def disconnect_device(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def start_trace(self, channel: int, baud_rate: int, terminator: bool):
+        """Запуск приема; наследник испускает signal_tracing_started."""
+
+    @abc.abstractmethod
+    def stop_trace(self):
+        ...
+
+    @abc.abstractmethod
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
+        """Передача кадра без ожидания; кадр логируется через _log_tx_frame."""
+
+    @abc.abstractmethod
+    def send_sync(self, iden: int, dlc: int, data: list[int], timeout: int):
+        """Передача с ожиданием подтверждения, мимо очереди."""
+
+    def send_cyclic(self, iden: int, dlc: int, data: list[int], timeout: int):
+        """Периодическая отправка средствами устройства; None - не поддерживается."""
+        return None
+
+    def stop_cyclic(self, message):
+        return None
+
+    def _push_rx(self, time_us: int, identifier: int, properties: int, dlc: int, data: bytes) -> bool:
+        pushed = self._rx_ring.push(time_us, identifier, properties, dlc, data)
+        capture = self._capture
+        if capture is not None:
+            capture.push(time_us, identifier, properties, dlc, data)
+        return pushed
+
+    def _log_tx_frame(self, iden: int, dlc: int, data: list[int]):
+        payload_len = min(max(int(dlc), 0), len(data), 8)
+        payload = bytes(int(data[i]) & 0xFF for i in range(payload_len))
+        self._push_rx(int(time.perf_counter() * 1000000),
+                      int(iden) & 0x1FFFFFFF,
+                      CanFrame.FLAG_TX | CanFrame.FLAG_EXTENDED,
+                      int(dlc),
+                      payload)
+
+    def _deliver_batch(self, frames: list[CanFrame]):
+        self.signal_new_messages.emit(frames)
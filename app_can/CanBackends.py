@@ -0,0 +1,62 @@
+from app_can.BaseCanDevice import BaseCanDevice
+
+# Имена CAN-бэкендов для командной строки и конфигурации
+BACKENDS = ("tscan", "socketcan", "loopback")
+
+
+def create_can_device(backend: str, interface: str | None = None) -> BaseCanDevice:
+    """
+    Создает устройство выбранного бэкенда.
+
+    Модули импортируются только для выбранного бэкенда: DLL libTSCANAPI
+    не загружается на Linux, если используется SocketCAN или loopback.
+    interface - имя интерфейса SocketCAN (can0, vcan0); None - все CAN-интерфейсы.
+    """
+    name = str(backend).strip().lower()
+    if name == "tscan":
+        from app_can.CanDevice import CanDevice
+        return CanDevice.instance()
+    if name == "socketcan":
+        from app_can.SocketCanDevice import SocketCanDevice
+        return SocketCanDevice(interface)
+    if name == "loopback":
+        from app_can.LoopbackCanDevice import LoopbackCanDevice
+        return LoopbackCanDevice()
+    raise ValueError(f"Неизвестный CAN-бэкенд: {backend}")
+
+
+def add_virtual_bus_arguments(parser):
+    """Параметры виртуальной шины с симулятором ЭБУ (--virtual-*) для точек входа."""
+    parser.add_argument("--virtual-ecus", type=int, default=0, metavar="N",
+                        help="simulate N fuel-sensor ECUs on a virtual bus instead of the TSCAN adapter")
+    parser.add_argument("--virtual-latency-ms", type=float, default=2.0, help="ECU response latency (default: 2)")
+    parser.add_argument("--virtual-jitter-ms", type=float, default=0.0, help="ECU response jitter, +-ms (default: 0)")
+    parser.add_argument("--virtual-pending", type=int, default=0, metavar="N",
+                        help="NRC 0x78 responses before the final answer of long services (default: 0)")
+    parser.add_argument("--virtual-bs", type=int, default=8, help="flow control block size (default: 8)")
+    parser.add_argument("--virtual-stmin", type=int, default=0, help="flow control STmin, ms (default: 0)")
+    parser.add_argument("--virtual-frame-loss", type=float, default=0.0, metavar="FRACTION",
+                        help="share of tester frames the ECUs never receive, e.g. 0.001 (default: 0)")
+    parser.add_argument("--virtual-max-block", type=int, default=1026, metavar="BYTES",
+                        help="maxNumberOfBlockLength the ECUs return to RequestDownload (default: 1026)")
+    parser.add_argument("--virtual-no-region-erase", action="store_true",
+                        help="ECUs reject Erase Memory with address and length, like a bootloader without it")
+    parser.add_argument("--virtual-moving", type=float, default=1.0, metavar="FRACTION",
+                        help="share of ECUs whose fuel/temperature change, the rest are static (default: 1.0)")
+
+
+def create_virtual_device(arguments) -> BaseCanDevice:
+    """Виртуальная шина по параметрам add_virtual_bus_arguments."""
+    from app_can.VirtualCanDevice import VirtualCanDevice
+    from app_can.VirtualEcu import VirtualEcuConfig
+    config = VirtualEcuConfig(latency_ms=arguments.virtual_latency_ms,
+                              jitter_ms=arguments.virtual_jitter_ms,
+                              block_size=arguments.virtual_bs,
+                              st_min_ms=arguments.virtual_stmin,
+                              pending_count=arguments.virtual_pending,
+                              moving_fraction=arguments.virtual_moving,
+                              frame_loss=arguments.virtual_frame_loss,
+                              max_block_length=arguments.virtual_max_block,
+                              region_erase=not arguments.virtual_no_region_erase,
+                              rx_buffer_size=max(2050, arguments.virtual_max_block))
+    return VirtualCanDevice(arguments.virtual_ecus, config)
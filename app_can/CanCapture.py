@@ -0,0 +1,479 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from pathlib import Path
+
+from app_can.CanFrame import CanFrame
+from app_can.RxIngest import RAW_FRAME_RECORD, RxRingBuffer
+
+LOGGER = logging.getLogger(__name__)
+
+# Формат файла записи трафика (*.tccap):
+#   заголовок файла, затем блоки "заголовок блока + записи".
+#   Запись кадра совпадает с RAW_FRAME_RECORD: timestamp_us (int64, время по часам ПК),
+#   identifier (uint32), flags (uint8, биты CanFrame.FLAG_*), dlc (uint8), data (8 байт).
+CAPTURE_MAGIC = b"TCCAP\x00\r\n"
+CAPTURE_VERSION = 1
+CAPTURE_SUFFIX = ".tccap"
+# magic, version, record_size, flags, created_us
+FILE_HEADER = struct.Struct("<8sHHIq")
+
+BLOCK_MAGIC = b"BLK1"
+# magic, compression, reserved, record_count, stored_size, min_ts_us, max_ts_us, first_record_index, crc32
+BLOCK_HEADER = struct.Struct("<4sHHIIqqqI")
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+_TIMESTAMP = struct.Struct("<q")
+
+
+class CaptureWriter(threading.Thread):
+    """
+    Фоновая запись CAN-трафика в бинарный файл.
+
+    Источник (callback DLL, логирование TX) только кладет кадр в кольцевой буфер,
+    поток записи собирает записи в блоки, при необходимости сжимает их zlib
+    и вызывает fsync не чаще раза в fsync_interval_s. Память ограничена
+    емкостью кольца и размером одного блока, при переполнении кадры
+    отбрасываются и учитываются в dropped.
+    """
+
+    def __init__(self,
+                 path: str | Path,
+                 compress: bool = False,
+                 block_records: int = 4096,
+                 flush_interval_s: float = 1.0,
+                 fsync_interval_s: float = 5.0,
+                 max_file_bytes: int = 0,
+                 ring_capacity: int = 65536):
+        super().__init__(name="CanCaptureWriter", daemon=True)
+        self._base_path = Path(path)
+        self._compression = COMPRESSION_ZLIB if compress else COMPRESSION_NONE
+        self._block_records = max(int(block_records), 1)
+        self._flush_interval_s = max(float(flush_interval_s), 0.05)
+        self._fsync_interval_s = max(float(fsync_interval_s), 0.0)
+        self._max_file_bytes = max(int(max_file_bytes), 0)  # 0 - без ротации
+
+        self._ring = RxRingBuffer(ring_capacity)
+        self._stop_event = threading.Event()
+
+        # Часы: RX кадры приходят со временем адаптера, TX - с perf_counter().
+        # В файл пишется время ПК, как в журнале CAN.
+        self._tx_perf_origin_us = int(time.perf_counter() * 1000000)
+        self._tx_wall_origin_us = int(time.time() * 1000000)
+        self._rx_anchor_raw_us: int | None = None
+        self._rx_anchor_wall_us = 0
+
+        self._file = None
+        self._files: list[Path] = []
+        self._file_bytes = 0
+        self._record_index = 0
+        self._frames_written = 0
+        self._blocks_written = 0
+        self._bytes_written = 0
+        self._last_fsync = time.monotonic()
+        self._error = ""
+
+    @property
+    def path(self) -> Path:
+        return self._files[-1] if self._files else self._base_path
+
+    @property
+    def files(self) -> list[Path]:
+        return list(self._files)
+
+    @property
+    def frames_written(self) -> int:
+        return self._frames_written
+
+    @property
+    def blocks_written(self) -> int:
+        return self._blocks_written
+
+    @property
+    def bytes_written(self) -> int:
+        return self._bytes_written
+
+    @property
+    def dropped(self) -> int:
+        return self._ring.dropped
+
+    @property
+    def error(self) -> str:
+        return self._error
+
+    def push(self, time_us: int, identifier: int, flags: int, dlc: int, data: bytes) -> bool:
+        if flags & CanFrame.FLAG_TX:
+            wall_us = self._tx_wall_origin_us + (time_us - self._tx_perf_origin_us)
+        else:
+            anchor_raw = self._rx_anchor_raw_us
+            if anchor_raw is None or time_us < anchor_raw - 1000:
+                # Первый кадр или перезапуск часов адаптера
+                anchor_raw = time_us
+                self._rx_anchor_raw_us = time_us
+                self._rx_anchor_wall_us = int(time.time() * 1000000)
+            wall_us = self._rx_anchor_wall_us + (time_us - anchor_raw)
+        return self._ring.push(wall_us, identifier, flags, dlc, data)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            self._open_next_file()
+            pending = bytearray()
+            pending_count = 0
+            block_started = time.monotonic()
+            while True:
+                stopping = self._stop_event.wait(0.02)
+                raw, count = self._ring.drain_raw(self._block_records - pending_count)
+                if count > 0:
+                    if pending_count == 0:
+                        block_started = time.monotonic()
+                    pending += raw
+                    pending_count += count
+
+                due = pending_count > 0 and (time.monotonic() - block_started) >= self._flush_interval_s
+                if pending_count >= self._block_records or due or (stopping and pending_count > 0):
+                    self._write_block(bytes(pending), pending_count)
+                    pending = bytearray()
+                    pending_count = 0
+
+                if stopping and len(self._ring) == 0 and pending_count == 0:
+                    break
+                self._sync_if_due()
+        except Exception as err:
+            self._error = str(err)
+            LOGGER.error(f"CaptureWriter: {err}")
+        finally:
+            self._close_file()
+
+    def _next_file_path(self) -> Path:
+        if not self._files:
+            return self._base_path
+        base = self._base_path
+        return base.with_name(f"{base.stem}_{len(self._files):03d}{base.suffix}")
+
+    def _open_next_file(self):
+        self._close_file()
+        path = self._next_file_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("wb")
+        header = FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, RAW_FRAME_RECORD.size, 0, int(time.time() * 1000000))
+        self._file.write(header)
+        self._file_bytes = len(header)
+        self._record_index = 0
+        self._files.append(path)
+        LOGGER.info(f"Запись CAN-трафика в файл: {path}")
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as err:
+            LOGGER.error(f"CaptureWriter: {err}")
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _write_block(self, records: bytes, count: int):
+        if self._max_file_bytes > 0 and self._file_bytes >= self._max_file_bytes:
+            self._open_next_file()
+
+        record_size = RAW_FRAME_RECORD.size
+        unpack_ts = _TIMESTAMP.unpack_from
+        timestamps = [unpack_ts(records, index * record_size)[0] for index in range(count)]
+
+        payload = records
+        if self._compression == COMPRESSION_ZLIB:
+            payload = zlib.compress(records, 1)
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, self._compression, 0, count, len(payload),
+                                   min(timestamps), max(timestamps), self._record_index,
+                                   zlib.crc32(payload))
+        self._file.write(header)
+        self._file.write(payload)
+        self._file.flush()
+
+        written = len(header) + len(payload)
+        self._file_bytes += written
+        self._bytes_written += written
+        self._record_index += count
+        self._frames_written += count
+        self._blocks_written += 1
+
+    def _sync_if_due(self):
+        if self._file is None:
+            return
+        now = time.monotonic()
+        if now - self._last_fsync < self._fsync_interval_s:
+            return
+        self._last_fsync = now
+        os.fsync(self._file.fileno())
+
+
+class CaptureReader:
+    """
+    Чтение файла записи через mmap без загрузки в память.
+
+    При открытии читаются только заголовки блоков, по ним строится
+    индекс времени, поэтому открытие многогигабайтного файла почти мгновенно.
+    Кадры адресуются сквозным номером записи в файле.
+    """
+
+    NUMPY_DTYPE = [("timestamp_us", "<i8"), ("identifier", "<u4"), ("flags", "u1"), ("dlc", "u1"), ("data", "u1", (8,))]
+
+    def __init__(self, path: str | Path, block_cache_size: int = 8):
+        self._path = Path(path)
+        self._file = self._path.open("rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл нельзя отобразить в память
+            self._file.close()
+            raise ValueError(f"Файл записи пуст: {self._path}")
+
+        magic, version, record_size, _, created_us = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError(f"Неизвестный формат файла записи: {self._path}")
+        if version != CAPTURE_VERSION or record_size != RAW_FRAME_RECORD.size:
+            self.close()
+            raise ValueError(f"Неподдерживаемая версия файла записи: {version}")
+        self._created_us = created_us
+
+        self._offsets = array('q')  # смещение данных блока в файле
+        self._stored_sizes = array('q')
+        self._compression = bytearray()
+        self._first_records = array('q')
+        self._min_ts = array('q')
+        self._max_ts = array('q')
+        self._record_count = 0
+        self._truncated = False
+        self._scan_blocks()
+
+        # Время внутри файла почти монотонно (TX и RX идут от разных часов),
+        # поэтому поиск ведется по нарастающему максимуму и убывающему с конца минимуму.
+        self._max_prefix = array('q', self._max_ts)
+        for index in range(1, len(self._max_prefix)):
+            if self._max_prefix[index] < self._max_prefix[index - 1]:
+                self._max_prefix[index] = self._max_prefix[index - 1]
+        self._min_suffix = array('q', self._min_ts)
+        for index in range(len(self._min_suffix) - 2, -1, -1):
+            if self._min_suffix[index] > self._min_suffix[index + 1]:
+                self._min_suffix[index] = self._min_suffix[index + 1]
+
+        self._block_cache: OrderedDict[int, bytes] = OrderedDict()
+        self._block_cache_size = max(int(block_cache_size), 1)
+
+    def _scan_blocks(self):
+        buffer = self._mmap
+        size = len(buffer)
+        offset = FILE_HEADER.size
+        while offset + BLOCK_HEADER.size <= size:
+            magic, compression, _, count, stored_size, min_ts, max_ts, _, _ = BLOCK_HEADER.unpack_from(buffer, offset)
+            data_offset = offset + BLOCK_HEADER.size
+            if magic != BLOCK_MAGIC or data_offset + stored_size > size:
+                # Недописанный хвост (запись прервана): читаем все целые блоки
+                self._truncated = True
+                break
+            self._offsets.append(data_offset)
+            self._stored_sizes.append(stored_size)
+            self._compression.append(compression)
+            self._first_records.append(self._record_count)
+            self._min_ts.append(min_ts)
+            self._max_ts.append(max_ts)
+            self._record_count += count
+            offset = data_offset + stored_size
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def created_us(self) -> int:
+        return self._created_us
+
+    @property
+    def block_count(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def truncated(self) -> bool:
+        return self._truncated
+
+    @property
+    def first_timestamp_us(self) -> int:
+        return self._min_suffix[0] if len(self._min_suffix) else 0
+
+    @property
+    def last_timestamp_us(self) -> int:
+        return self._max_prefix[-1] if len(self._max_prefix) else 0
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._block_cache.clear()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Живы представления NumPy поверх mmap: отображение закроется вместе с ними
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _block_of(self, index: int) -> int:
+        return bisect_right(self._first_records, index) - 1
+
+    def _block_buffer(self, block: int) -> tuple[bytes | mmap.mmap, int]:
+        """Буфер с записями блока и смещение первой записи в нем."""
+        offset = self._offsets[block]
+        if self._compression[block] == COMPRESSION_NONE:
+            return self._mmap, offset
+
+        cached = self._block_cache.get(block)
+        if cached is not None:
+            self._block_cache.move_to_end(block)
+            return cached, 0
+        records = zlib.decompress(self._mmap[offset:offset + self._stored_sizes[block]])
+        self._block_cache[block] = records
+        if len(self._block_cache) > self._block_cache_size:
+            self._block_cache.popitem(last=False)
+        return records, 0
+
+    def _block_stop(self, block: int) -> int:
+        if block + 1 < len(self._first_records):
+            return self._first_records[block + 1]
+        return self._record_count
+
+    def frame(self, index: int) -> CanFrame:
+        if not (0 <= index < self._record_count):
+            raise IndexError(index)
+        block = self._block_of(index)
+        buffer, base = self._block_buffer(block)
+        offset = base + (index - self._first_records[block]) * RAW_FRAME_RECORD.size
+        return CanFrame(*RAW_FRAME_RECORD.unpack_from(buffer, offset))
+
+    def frames(self, start: int, stop: int) -> list[CanFrame]:
+        start = max(int(start), 0)
+        stop = min(int(stop), self._record_count)
+        frames: list[CanFrame] = []
+        index = start
+        unpack_from = RAW_FRAME_RECORD.unpack_from
+        record_size = RAW_FRAME_RECORD.size
+        while index < stop:
+            block = self._block_of(index)
+            buffer, base = self._block_buffer(block)
+            block_start = self._first_records[block]
+            block_stop = min(self._block_stop(block), stop)
+            for position in range(index - block_start, block_stop - block_start):
+                frames.append(CanFrame(*unpack_from(buffer, base + position * record_size)))
+            index = block_stop
+        return frames
+
+    def index_at_time(self, timestamp_us: int) -> int:
+        """
+        Номер записи, с которой начинается время timestamp_us:
+        все записи до нее раньше timestamp_us.
+        """
+        block = bisect_left(self._max_prefix, timestamp_us)
+        if block >= len(self._offsets):
+            return self._record_count
+        buffer, base = self._block_buffer(block)
+        unpack_ts = _TIMESTAMP.unpack_from
+        record_size = RAW_FRAME_RECORD.size
+        count = self._block_stop(block) - self._first_records[block]
+        for position in range(count):
+            if unpack_ts(buffer, base + position * record_size)[0] >= timestamp_us:
+                return self._first_records[block] + position
+        return self._block_stop(block)
+
+    def time_range(self, start_us: int, stop_us: int) -> tuple[int, int]:
+        """
+        Диапазон номеров записей [start, stop), который содержит все кадры
+        интервала времени [start_us, stop_us). Кадры вне интервала внутри
+        диапазона возможны, select_* отсекают их по времени.
+        """
+        start = self.index_at_time(start_us)
+        last_block = bisect_left(self._min_suffix, stop_us)
+        stop = self._first_records[last_block] if last_block < len(self._offsets) else self._record_count
+        return start, max(start, stop)
+
+    def select_frames(self, start_us: int, stop_us: int, pgn: int | None = None, pgn_mask: int = 0x3FFFF) -> list[CanFrame]:
+        start, stop = self.time_range(start_us, stop_us)
+        frames = self.frames(start, stop)
+        result: list[CanFrame] = []
+        for frame in frames:
+            if not (start_us <= frame.timestamp_us < stop_us):
+                continue
+            if pgn is not None and ((frame.identifier >> 8) & pgn_mask) != (pgn & pgn_mask):
+                continue
+            result.append(frame)
+        return result
+
+    def iter_numpy_blocks(self, start: int, stop: int):
+        """
+        Структурированные массивы NumPy по блокам диапазона [start, stop).
+        Для несжатых блоков это представления поверх mmap без копирования.
+        """
+        try:
+            import numpy
+        except ImportError as err:
+            raise ImportError("Для представлений NumPy требуется пакет numpy") from err
+
+        dtype = numpy.dtype(CaptureReader.NUMPY_DTYPE)
+        start = max(int(start), 0)
+        stop = min(int(stop), self._record_count)
+        index = start
+        while index < stop:
+            block = self._block_of(index)
+            block_start = self._first_records[block]
+            block_stop = min(self._block_stop(block), stop)
+            if self._compression[block] == COMPRESSION_NONE:
+                view = numpy.frombuffer(self._mmap, dtype=dtype,
+                                        count=block_stop - index,
+                                        offset=self._offsets[block] + (index - block_start) * RAW_FRAME_RECORD.size)
+            else:
+                records, _ = self._block_buffer(block)
+                view = numpy.frombuffer(records, dtype=dtype)[index - block_start:block_stop - block_start]
+            yield view
+            index = block_stop
+
+    def numpy_range(self, start: int, stop: int):
+        """Массив NumPy диапазона записей; копия создается, только если диапазон занимает несколько блоков."""
+        import numpy
+
+        views = list(self.iter_numpy_blocks(start, stop))
+        if len(views) == 1:
+            return views[0]
+        if len(views) == 0:
+            return numpy.empty(0, dtype=numpy.dtype(CaptureReader.NUMPY_DTYPE))
+        return numpy.concatenate(views)
+
+    def select_array(self, start_us: int, stop_us: int, pgn: int | None = None, pgn_mask: int = 0x3FFFF):
+        """Кадры интервала времени (и PGN) в виде массива NumPy."""
+        start, stop = self.time_range(start_us, stop_us)
+        frames = self.numpy_range(start, stop)
+        mask = (frames["timestamp_us"] >= start_us) & (frames["timestamp_us"] < stop_us)
+        if pgn is not None:
+            mask &= ((frames["identifier"] >> 8) & pgn_mask) == (pgn & pgn_mask)
+        return frames[mask]
@@ -1,30 +1,21 @@
 ﻿import time
 import logging
-from ctypes import c_char_p, c_float
-from dataclasses import dataclass
-
-from PySide6.QtCore import Signal, Slot, QObject
+from ctypes import c_float
 
 from libTSCANAPI import tsapp_configure_baudrate_can, tscan_scan_devices, tscan_get_device_info, s32, size_t, \
     tsapp_disconnect_by_handle, tsapp_connect, tsapp_register_event_can_whandle, OnTx_RxFUNC_CAN_WHandle, \
-    DLC_DATA_BYTE_CNT, TLIBCAN, tsapp_delete_cyclic_msg_can, tsapp_add_cyclic_msg_can, tsapp_transmit_can_async, \
+    TLIBCAN, tsapp_delete_cyclic_msg_can, tsapp_add_cyclic_msg_can, tsapp_transmit_can_async, \
     tsapp_transmit_can_sync, tsapp_unregister_event_can_whandle
 
-LOGGER = logging.getLogger(__name__)
+from app_can.BaseCanDevice import BaseCanDevice
 
+LOGGER = logging.getLogger(__name__)
 
-@dataclass
-class DeviceInfo:
-    manufacturer: c_char_p = c_char_p()
-    product: c_char_p = c_char_p()
-    serial: c_char_p = c_char_p()
 
+class CanDevice(BaseCanDevice):
+    """CAN-адаптер TOSUN через libTSCANAPI."""
 
-class CanDevice(QObject):
     _instance = None
-    signal_new_message = Signal(str, str, str, str, list)
-    signal_tracing_started = Signal()
-    signal_tracing_stopped = Signal()
 
     def __new__(cls):
         if cls._instance is None:
@@ -39,14 +30,7 @@ class CanDevice(QObject):
 
             self._devices = s32(0)
 
-            self._device_info: DeviceInfo = DeviceInfo()
             self._hardware_handle = size_t(0)
-            self._is_connect: bool = False
-            self._is_trace: bool = False
-
-            self._channel: int = -1
-            self._baud_rate: int = -1
-            self._terminator: bool = False
 
             self._can_tx_start_time = time.perf_counter()
             self._refresh_time: float = 0.1
@@ -58,59 +42,12 @@ class CanDevice(QObject):
             cls._instance = CanDevice()
         return cls._instance
 
-    @property
-    def is_trace(self) -> bool:
-        return self._is_trace
-
-    @is_trace.setter
-    def is_trace(self, state: bool):
-        self._is_trace = state
-
-    @property
-    def channel(self) -> int:
-        return self._channel
-
-    @channel.setter
-    def channel(self, chan: int):
-        self._channel = chan
-
-    @property
-    def baud_rate(self) -> int:
-        return self._baud_rate
-
-    @baud_rate.setter
-    def baud_rate(self, br: int):
-        self._baud_rate = br
-
-    @property
-    def terminator(self):
-        return self._terminator
-
-    @terminator.setter
-    def terminator(self, ter: bool):
-        self._terminator = ter
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        return self._device_info
-
-    @device_info.setter
-    def device_info(self, info: DeviceInfo):
-        self._device_info = info
-
-    @property
-    def is_connect(self) -> bool:
-        return self._is_connect
-
-    @is_connect.setter
-    def is_connect(self, state: bool):
-        self._is_connect = state
-
     def disconnect_device(self) -> bool:
         if self._is_connect:
             try:
                 tsapp_disconnect_by_handle(self._hardware_handle)
                 self.is_connect = False
+                self.close()
                 LOGGER.info("Успешное отключение CAN-устройства")
             except Exception as err:
                 LOGGER.error(f"{err}")
@@ -160,6 +97,7 @@ class CanDevice(QObject):
                                 self._hardware_handle)
             if ret == 0 or ret == 5:
                 self.is_connect = True
+                self._start_workers()
             else:
                 raise Exception(f"error connect to device")
         except Exception as err:
@@ -218,24 +156,18 @@ class CanDevice(QObject):
         self.signal_tracing_stopped.emit()
 
     def _event_handler(self, obj, a_can):
+        # Callback DLL: только кладем сырой кадр в кольцевой буфер,
+        # разбор и доставка в GUI выполняются потоком _rx_ingest.
+        msg = a_can.contents
         # 1 - error frame
-        if a_can.contents.FProperties & 0x80:
+        if msg.FProperties & 0x80:
             return
-
-        msg = a_can.contents
-        _time = str(float(msg.FTimeUs) / 1000000.0)
-        _id = str(hex(msg.FIdentifier))
-        _data_len_code = str(msg.FDLC)
-        _data_len = DLC_DATA_BYTE_CNT[msg.FDLC]
-        _dir = 'Tx' if (msg.FProperties & 1) == 1 else 'Rx'
-        _data = [msg.FData[i] for i in range(_data_len)]
-
-        # TX кадры для UI логируются явно в send_async/send_sync.
+        # TX кадры для UI логируются явно в _transmit/send_sync.
         # Из callback оставляем только RX, чтобы избежать дублей.
-        if _dir == 'Tx':
+        if msg.FProperties & 0x1:
             return
 
-        self.signal_new_message.emit(_time, _id, _dir, _data_len_code, _data)
+        self._push_rx(msg.FTimeUs, msg.FIdentifier, msg.FProperties, msg.FDLC, bytes(msg.FData))
 
     def _create_message(self, iden: int, dlc: int, data: list[int]) -> TLIBCAN | None:
         # [7] 0 - normal frame, 1 - error frame
@@ -273,8 +205,7 @@ class CanDevice(QObject):
             return
         return tsapp_delete_cyclic_msg_can(self._hardware_handle, message)
 
-    @Slot(int, int, list)
-    def send_async(self, iden: int, dlc: int, data: list[int]):
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
         if self._hardware_handle is None or self._hardware_handle.value == 0:
             return
         message: TLIBCAN = self._create_message(iden, dlc, data)
@@ -283,15 +214,7 @@ class CanDevice(QObject):
         ret = tsapp_transmit_can_async(self._hardware_handle, message)
 
         # Явно логируем TX кадр для UI независимо от режима trace.
-        payload_len = min(max(int(dlc), 0), len(data))
-        payload = [int(data[i]) & 0xFF for i in range(payload_len)]
-        self.signal_new_message.emit(
-            f"{time.perf_counter():.6f}",
-            hex(int(iden) & 0x1FFFFFFF),
-            "Tx",
-            str(int(dlc)),
-            payload,
-        )
+        self._log_tx_frame(iden, dlc, data)
 
         return ret
 
@@ -301,14 +224,6 @@ class CanDevice(QObject):
         message: TLIBCAN = self._create_message(iden, dlc, data)
         ret = tsapp_transmit_can_sync(self._hardware_handle, message, timeout)
 
-        payload_len = min(max(int(dlc), 0), len(data))
-        payload = [int(data[i]) & 0xFF for i in range(payload_len)]
-        self.signal_new_message.emit(
-            f"{time.perf_counter():.6f}",
-            hex(int(iden) & 0x1FFFFFFF),
-            "Tx",
-            str(int(dlc)),
-            payload,
-        )
+        self._log_tx_frame(iden, dlc, data)
 
         return ret
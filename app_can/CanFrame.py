@@ -0,0 +1,50 @@
+class CanFrame:
+    """
+    Компактная запись CAN-кадра, которая передается от CanDevice подписчикам.
+
+    Все поля хранятся в сыром виде: строки для UI формируются
+    только в момент отображения.
+    """
+
+    # Биты flags совпадают с TLIBCAN.FProperties
+    FLAG_TX = 0x01
+    FLAG_REMOTE = 0x02
+    FLAG_EXTENDED = 0x04
+    FLAG_ERROR = 0x80
+
+    __slots__ = ("timestamp_us", "identifier", "flags", "dlc", "data")
+
+    def __init__(self, timestamp_us: int, identifier: int, flags: int, dlc: int, data: bytes):
+        self.timestamp_us: int = timestamp_us
+        self.identifier: int = identifier
+        self.flags: int = flags
+        self.dlc: int = dlc
+        self.data: bytes = data  # всегда 8 байт, лишние байты дополнены нулями
+
+    @property
+    def is_tx(self) -> bool:
+        return (self.flags & CanFrame.FLAG_TX) != 0
+
+    @property
+    def is_rx(self) -> bool:
+        return (self.flags & CanFrame.FLAG_TX) == 0
+
+    @property
+    def direction(self) -> str:
+        return "TX" if self.flags & CanFrame.FLAG_TX else "RX"
+
+    @property
+    def data_length(self) -> int:
+        return self.dlc if self.dlc < 8 else 8
+
+    @property
+    def payload(self) -> bytes:
+        return self.data[:self.data_length]
+
+    @property
+    def timestamp(self) -> float:
+        return self.timestamp_us / 1000000.0
+
+    def __repr__(self) -> str:
+        return (f"CanFrame({self.timestamp_us}, 0x{self.identifier:08X}, "
+                f"flags=0x{self.flags:02X}, dlc={self.dlc}, data={self.payload.hex(' ').upper()})")
@@ -0,0 +1,182 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterator
+
+from app_can.CanFrame import CanFrame
+
+
+class CanJournal:
+    """
+    Журнал CAN-кадров фиксированной емкости в виде колонок кольцевого буфера.
+
+    Каждая строка получает возрастающий порядковый номер (seq).
+    Добавление - O(1), вытеснение старых строк ничего не стоит:
+    новая строка просто перезаписывает ячейку самой старой.
+
+    Дополнительно ведется индекс: ключ (идентификатор, направление, DLC) ->
+    возрастающий список seq. Различных ключей на шине немного, поэтому
+    фильтр по точным полям сводится к выбору ключей и слиянию их списков.
+    """
+
+    MAX_CAPACITY = 1000000
+
+    def __init__(self, capacity: int = 100000):
+        self._capacity = 0
+        self._timestamps = array('q')
+        self._identifiers = array('I')
+        self._flags = bytearray()
+        self._dlcs = bytearray()
+        self._data = bytearray()
+        self._next_seq = 0
+        self._cleared_seq = 0
+        self._index: dict[int, array] = {}
+        self._index_prune_seq = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self._capacity = max(1, min(int(capacity), CanJournal.MAX_CAPACITY))
+        self._timestamps = array('q', [0]) * self._capacity
+        self._identifiers = array('I', [0]) * self._capacity
+        self._flags = bytearray(self._capacity)
+        self._dlcs = bytearray(self._capacity)
+        self._data = bytearray(self._capacity * 8)
+        self._cleared_seq = self._next_seq
+        self._reset_index()
+
+    def _reset_index(self):
+        self._index = {}
+        self._index_prune_seq = self._next_seq + self._capacity
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity: int):
+        # Смена емкости очищает журнал
+        self._allocate(capacity)
+
+    @property
+    def first_seq(self) -> int:
+        return max(self._cleared_seq, self._next_seq - self._capacity)
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def __contains__(self, seq: int) -> bool:
+        return self.first_seq <= seq < self._next_seq
+
+    def append(self, timestamp_us: int, identifier: int, flags: int, dlc: int, data: bytes) -> int:
+        seq = self._next_seq
+        index = seq % self._capacity
+        self._timestamps[index] = timestamp_us
+        self._identifiers[index] = identifier & 0xFFFFFFFF
+        self._flags[index] = flags & 0xFF
+        self._dlcs[index] = dlc & 0xFF
+        offset = index * 8
+        self._data[offset:offset + 8] = data[:8].ljust(8, b"\x00")
+        self._next_seq = seq + 1
+
+        key = CanJournal.index_key(identifier, flags, dlc)
+        seqs = self._index.get(key)
+        if seqs is None:
+            seqs = array('q')
+            self._index[key] = seqs
+        seqs.append(seq)
+        if seq >= self._index_prune_seq:
+            self._prune_index()
+        return seq
+
+    def append_frame(self, frame: CanFrame, timestamp_us: int | None = None) -> int:
+        return self.append(frame.timestamp_us if timestamp_us is None else timestamp_us,
+                           frame.identifier,
+                           frame.flags,
+                           frame.dlc,
+                           frame.data)
+
+    def timestamp_us(self, seq: int) -> int:
+        return self._timestamps[seq % self._capacity]
+
+    def identifier(self, seq: int) -> int:
+        return self._identifiers[seq % self._capacity]
+
+    def flags(self, seq: int) -> int:
+        return self._flags[seq % self._capacity]
+
+    def dlc(self, seq: int) -> int:
+        return self._dlcs[seq % self._capacity]
+
+    def data(self, seq: int) -> bytes:
+        offset = (seq % self._capacity) * 8
+        return bytes(self._data[offset:offset + 8])
+
+    def frame(self, seq: int) -> CanFrame:
+        index = seq % self._capacity
+        offset = index * 8
+        return CanFrame(self._timestamps[index],
+                        self._identifiers[index],
+                        self._flags[index],
+                        self._dlcs[index],
+                        bytes(self._data[offset:offset + 8]))
+
+    def seqs(self, start: int | None = None, stop: int | None = None) -> range:
+        first = self.first_seq
+        start = first if start is None else max(first, start)
+        stop = self._next_seq if stop is None else min(self._next_seq, stop)
+        return range(start, max(start, stop))
+
+    @staticmethod
+    def index_key(identifier: int, flags: int, dlc: int) -> int:
+        return ((dlc & 0xFF) << 33) | ((flags & CanFrame.FLAG_TX) << 32) | (identifier & 0xFFFFFFFF)
+
+    @staticmethod
+    def split_index_key(key: int) -> tuple[int, bool, int]:
+        """Возвращает (identifier, is_tx, dlc)"""
+        return key & 0xFFFFFFFF, bool((key >> 32) & 0x1), (key >> 33) & 0xFF
+
+    def index_keys(self) -> list[int]:
+        return list(self._index.keys())
+
+    def index_key_at(self, seq: int) -> int:
+        index = seq % self._capacity
+        return CanJournal.index_key(self._identifiers[index], self._flags[index], self._dlcs[index])
+
+    def indexed_count(self, key: int, start: int | None = None) -> int:
+        seqs = self._index.get(key)
+        if seqs is None:
+            return 0
+        first = self.first_seq if start is None else max(self.first_seq, start)
+        return len(seqs) - bisect_left(seqs, first)
+
+    def iter_indexed_reversed(self, key: int, start: int | None = None) -> Iterator[int]:
+        """Строки ключа от новых к старым, не старше start"""
+        seqs = self._index.get(key)
+        if seqs is None:
+            return
+        first = self.first_seq if start is None else max(self.first_seq, start)
+        low = bisect_left(seqs, first)
+        position = len(seqs) - 1
+        while position >= low:
+            yield seqs[position]
+            position -= 1
+
+    def _prune_index(self):
+        # Раз за оборот кольца удаляем из индекса вытесненные строки
+        first = self.first_seq
+        for key, seqs in list(self._index.items()):
+            cut = bisect_left(seqs, first)
+            if cut >= len(seqs):
+                del self._index[key]
+            elif cut > 0:
+                del seqs[:cut]
+        self._index_prune_seq = self._next_seq + self._capacity
+
+    def clear(self):
+        # Колонки не обнуляем: строки за пределами [first_seq, next_seq) недоступны,
+        # а номера seq остаются уникальными за все время работы журнала
+        self._cleared_seq = self._next_seq
+        self._reset_index()
@@ -0,0 +1,176 @@
+import logging
+from typing import Callable
+
+from PySide6.QtCore import QObject, Slot
+
+from app_can.CanFrame import CanFrame
+
+LOGGER = logging.getLogger(__name__)
+
+FULL_MASK = 0x1FFFFFFF
+
+FrameCallback = Callable[[list[CanFrame]], None]
+
+
+class FrameRoute:
+    """Подписка на кадры: точный идентификатор, диапазон по маске или все кадры."""
+
+    __slots__ = ("name", "identifier", "mask", "callback", "hits")
+
+    def __init__(self, name: str, identifier: int | None, mask: int, callback: FrameCallback):
+        self.name: str = name
+        self.identifier: int | None = identifier  # None - catch-all
+        self.mask: int = mask
+        self.callback: FrameCallback = callback
+        self.hits: int = 0
+
+    @property
+    def is_catch_all(self) -> bool:
+        return self.identifier is None
+
+    @property
+    def is_exact(self) -> bool:
+        return self.identifier is not None and self.mask == FULL_MASK
+
+
+class FrameRouter(QObject):
+    """
+    Диспетчер входящих пачек кадров по идентификатору.
+
+    Точные идентификаторы ищутся в словаре, диапазоны - в словаре
+    на каждую маску, поэтому стоимость кадра не зависит от числа подписчиков.
+    Каждый подписчик получает за пачку один вызов со своими кадрами.
+    """
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self._routes: list[FrameRoute] = []
+        self._exact: dict[int, list[FrameRoute]] = {}
+        self._masked: dict[int, dict[int, list[FrameRoute]]] = {}
+        self._catch_all: list[FrameRoute] = []
+        self._unrouted: int = 0
+
+    @property
+    def routes(self) -> list[FrameRoute]:
+        return list(self._routes)
+
+    @property
+    def unrouted(self) -> int:
+        return self._unrouted
+
+    def add_exact(self, identifier: int, callback: FrameCallback, name: str = "") -> FrameRoute:
+        return self._add(FrameRoute(name, int(identifier) & FULL_MASK, FULL_MASK, callback))
+
+    def add_masked(self, identifier: int, mask: int, callback: FrameCallback, name: str = "") -> FrameRoute:
+        mask = int(mask) & FULL_MASK
+        return self._add(FrameRoute(name, int(identifier) & mask, mask, callback))
+
+    def add_catch_all(self, callback: FrameCallback, name: str = "") -> FrameRoute:
+        return self._add(FrameRoute(name, None, 0, callback))
+
+    def retarget(self, route: FrameRoute, identifier: int, mask: int | None = None):
+        if route.is_catch_all:
+            return
+        new_mask = route.mask if mask is None else int(mask) & FULL_MASK
+        new_identifier = int(identifier) & new_mask
+        if route.identifier == new_identifier and route.mask == new_mask:
+            return
+        self._unindex(route)
+        route.identifier = new_identifier
+        route.mask = new_mask
+        self._index(route)
+
+    def remove(self, route: FrameRoute):
+        if route not in self._routes:
+            return
+        self._unindex(route)
+        self._routes.remove(route)
+
+    def route_stats(self) -> dict[str, int]:
+        stats: dict[str, int] = {}
+        for route in self._routes:
+            name = route.name or f"0x{route.identifier or 0:08X}/0x{route.mask:08X}"
+            stats[name] = stats.get(name, 0) + route.hits
+        stats["unrouted"] = self._unrouted
+        return stats
+
+    def reset_stats(self):
+        for route in self._routes:
+            route.hits = 0
+        self._unrouted = 0
+
+    def _add(self, route: FrameRoute) -> FrameRoute:
+        self._routes.append(route)
+        self._index(route)
+        return route
+
+    def _index(self, route: FrameRoute):
+        if route.is_catch_all:
+            self._catch_all.append(route)
+        elif route.is_exact:
+            self._exact.setdefault(route.identifier, []).append(route)
+        else:
+            self._masked.setdefault(route.mask, {}).setdefault(route.identifier, []).append(route)
+
+    def _unindex(self, route: FrameRoute):
+        if route.is_catch_all:
+            if route in self._catch_all:
+                self._catch_all.remove(route)
+            return
+
+        if route.is_exact:
+            table = self._exact
+        else:
+            table = self._masked.get(route.mask, {})
+
+        routes = table.get(route.identifier)
+        if routes is not None and route in routes:
+            routes.remove(route)
+            if len(routes) == 0:
+                del table[route.identifier]
+        if not route.is_exact and len(table) == 0:
+            self._masked.pop(route.mask, None)
+
+    @Slot(list)
+    def dispatch(self, frames: list[CanFrame]):
+        if not frames:
+            return
+
+        matched: dict[FrameRoute, list[CanFrame]] = {}
+        exact = self._exact
+        masked = self._masked
+        has_catch_all = len(self._catch_all) > 0
+
+        for frame in frames:
+            identifier = frame.identifier
+            routed = False
+
+            routes = exact.get(identifier)
+            if routes is not None:
+                routed = True
+                for route in routes:
+                    matched.setdefault(route, []).append(frame)
+
+            for mask, table in masked.items():
+                routes = table.get(identifier & mask)
+                if routes is not None:
+                    routed = True
+                    for route in routes:
+                        matched.setdefault(route, []).append(frame)
+
+            if not routed and not has_catch_all:
+                self._unrouted += 1
+
+        # Вызовы идут в порядке регистрации подписчиков.
+        for route in list(self._routes):
+            if route.is_catch_all:
+                route_frames = frames
+            else:
+                route_frames = matched.get(route)
+                if not route_frames:
+                    continue
+            route.hits += len(route_frames)
+            try:
+                route.callback(route_frames)
+            except Exception as err:
+                LOGGER.exception(f"FrameRouter: ошибка обработчика '{route.name}': {err}")
@@ -0,0 +1,73 @@
+import time
+from ctypes import c_char_p, c_int32, c_size_t
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanFrame import CanFrame
+
+
+class LoopbackCanDevice(BaseCanDevice):
+    """
+    Шина внутри процесса без адаптера.
+
+    Отправленные кадры логируются как TX и при echo=True возвращаются как RX,
+    кадры от имени других узлов подаются через inject(). Нужна для проверки
+    журнала, router и сервисов UDS без оборудования.
+    """
+
+    def __init__(self, echo: bool = True):
+        super().__init__()
+        self._echo = bool(echo)
+
+    def get_devices(self) -> c_int32:
+        return c_int32(1)
+
+    def update_device_info(self, device_index: int):
+        if device_index != -1:
+            self._device_info.manufacturer = c_char_p(b"Loopback")
+            self._device_info.product = c_char_p(b"loopback")
+            self._device_info.serial = c_char_p(b"")
+
+    def connect_to(self, device_index: int) -> c_size_t:
+        self.update_device_info(device_index)
+        self.is_connect = True
+        self._start_workers()
+        return c_size_t(1)
+
+    def disconnect_device(self) -> bool:
+        self.stop_trace()
+        self.is_connect = False
+        self.close()
+        return True
+
+    def start_trace(self, channel: int, baud_rate: int, terminator: bool):
+        if self._is_trace:
+            return
+        self.channel = channel
+        self.baud_rate = baud_rate
+        self.terminator = terminator
+        self.is_trace = True
+        self.signal_tracing_started.emit()
+
+    def stop_trace(self):
+        self.is_trace = False
+        self.signal_tracing_stopped.emit()
+
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
+        if not self._is_connect:
+            return
+        self._log_tx_frame(iden, dlc, data)
+        if self._echo:
+            self.inject(iden, data[:min(int(dlc), 8)])
+        return 0
+
+    def send_sync(self, iden: int, dlc: int, data: list[int], timeout: int):
+        return self._transmit(iden, dlc, data)
+
+    def inject(self, identifier: int, data, time_us: int | None = None) -> bool:
+        """Кладет RX кадр на шину (только при запущенной трассировке)."""
+        if not self._is_trace:
+            return False
+        payload = bytes(int(b) & 0xFF for b in data[:8])
+        if time_us is None:
+            time_us = int(time.perf_counter() * 1000000)
+        return self._push_rx(time_us, int(identifier) & 0x1FFFFFFF, CanFrame.FLAG_EXTENDED, len(payload), payload)
@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from ctypes import c_char_p, c_int32, c_size_t
+from pathlib import Path
+
+from PySide6.QtCore import Signal
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanCapture import CaptureReader
+from app_can.CanFrame import CanFrame
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ReplayCanDevice(BaseCanDevice):
+    """
+    Замена CanDevice, которая воспроизводит файл записи трафика (*.tccap).
+
+    Кадры идут через тот же кольцевой буфер, поток доставки и router,
+    что и кадры адаптера, поэтому журнал, автоопределение, коллектор
+    и загрузчик работают без DLL и без адаптера.
+    speed: 1.0 - исходный темп, N - ускорение в N раз, 0 - максимально быстро
+    (режим замера пропускной способности всего RX тракта).
+    Отправленные кадры только логируются как TX.
+    """
+
+    # frames, seconds
+    signal_replay_finished = Signal(int, float)
+
+    def __init__(self, path: str | Path, speed: float = 1.0, loop: bool = False):
+        super().__init__()
+        self._path = Path(path)
+        self._speed = max(float(speed), 0.0)
+        self._loop = bool(loop)
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._frames_replayed = 0
+        self._elapsed_s = 0.0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    @speed.setter
+    def speed(self, value: float):
+        self._speed = max(float(value), 0.0)
+
+    @property
+    def frames_replayed(self) -> int:
+        return self._frames_replayed
+
+    @property
+    def elapsed_s(self) -> float:
+        return self._elapsed_s
+
+    def get_devices(self) -> c_int32:
+        return c_int32(1)
+
+    def update_device_info(self, device_index: int):
+        if device_index != -1:
+            self._device_info.manufacturer = c_char_p(b"Replay")
+            self._device_info.product = c_char_p(self._path.name.encode("utf-8", errors="replace"))
+            self._device_info.serial = c_char_p(b"")
+
+    def connect_to(self, device_index: int) -> c_size_t:
+        if not self._path.is_file():
+            LOGGER.error(f"Файл записи не найден: {self._path}")
+            return c_size_t(0)
+        self.update_device_info(device_index)
+        self.is_connect = True
+        self._start_workers()
+        return c_size_t(1)
+
+    def disconnect_device(self) -> bool:
+        self.stop_trace()
+        self.is_connect = False
+        self.close()
+        return True
+
+    def start_trace(self, channel: int, baud_rate: int, terminator: bool):
+        if self._is_trace:
+            return
+        self.channel = channel
+        self.baud_rate = baud_rate
+        self.terminator = terminator
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._replay, name="CanReplay", daemon=True)
+        self.is_trace = True
+        self._thread.start()
+        LOGGER.info(f"Воспроизведение записи {self._path} (скорость: {self._speed or 'максимальная'})")
+        self.signal_tracing_started.emit()
+
+    def stop_trace(self):
+        if self._is_trace:
+            self._stop_event.set()
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
+            self._thread = None
+            self.is_trace = False
+
+        self.signal_tracing_stopped.emit()
+
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
+        if not self._is_connect:
+            return
+        self._log_tx_frame(iden, dlc, data)
+        return 0
+
+    def send_sync(self, iden: int, dlc: int, data: list[int], timeout: int):
+        return self._transmit(iden, dlc, data)
+
+    def _replay(self):
+        started = time.perf_counter()
+        replayed = 0
+        try:
+            with CaptureReader(self._path) as reader:
+                while not self._stop_event.is_set():
+                    replayed += self._replay_pass(reader)
+                    if not self._loop:
+                        break
+        except Exception as err:
+            LOGGER.error(f"ReplayCanDevice: {err}")
+
+        # Ждем, пока поток доставки заберет остаток кадров
+        while len(self._rx_ring) > 0 and not self._stop_event.is_set():
+            time.sleep(0.005)
+        time.sleep(self.rx_batch_interval * 2)
+
+        self._frames_replayed = replayed
+        self._elapsed_s = time.perf_counter() - started
+        rate = replayed / self._elapsed_s if self._elapsed_s > 0 else 0.0
+        LOGGER.info(f"Воспроизведение завершено: {replayed} кадров за {self._elapsed_s:.3f} с "
+                    f"({rate:.0f} кадр/с), потеряно {self.rx_dropped}")
+        self.signal_replay_finished.emit(replayed, self._elapsed_s)
+
+    def _replay_pass(self, reader: CaptureReader, chunk: int = 4096) -> int:
+        count = len(reader)
+        if count == 0:
+            return 0
+
+        first_ts = reader.first_timestamp_us
+        pass_started = time.perf_counter()
+        replayed = 0
+        for start in range(0, count, chunk):
+            if self._stop_event.is_set():
+                break
+            for frame in reader.frames(start, start + chunk):
+                if self._speed > 0:
+                    # Исходный темп с множителем: ждем момента кадра относительно начала прохода
+                    delay = (frame.timestamp_us - first_ts) / 1000000.0 / self._speed
+                    wait = delay - (time.perf_counter() - pass_started)
+                    if wait > 0.0005 and self._stop_event.wait(wait):
+                        return replayed
+                self._push_replayed(frame)
+                replayed += 1
+        return replayed
+
+    def _push_replayed(self, frame: CanFrame):
+        if frame.flags & CanFrame.FLAG_TX:
+            # TX кадры журнал ведет по perf_counter(), как при живой отправке
+            time_us = int(time.perf_counter() * 1000000)
+        else:
+            time_us = frame.timestamp_us
+        # Без потерь: при заполненном буфере ждем поток доставки
+        ring = self._rx_ring
+        while len(ring) >= ring.capacity:
+            if self._stop_event.wait(0.001):
+                return
+        self._push_rx(time_us, frame.identifier, frame.flags, frame.dlc, frame.data)
@@ -0,0 +1,126 @@
+import logging
+import struct
+import threading
+from typing import Callable
+
+from app_can.CanFrame import CanFrame
+
+LOGGER = logging.getLogger(__name__)
+
+# timestamp_us (int64), identifier (uint32), properties (uint8), dlc (uint8), data (8 байт)
+RAW_FRAME_RECORD = struct.Struct("<qIBB8s")
+
+
+class RxRingBuffer:
+    """
+    Предвыделенный кольцевой буфер сырых CAN-кадров.
+
+    Писатели (callback DLL и логирование TX) только упаковывают поля кадра
+    в заранее выделенную память, читатель забирает накопленные записи пачкой.
+    При переполнении новые кадры отбрасываются и учитываются в dropped.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self._capacity = max(int(capacity), 1)
+        self._record_size = RAW_FRAME_RECORD.size
+        self._buffer = bytearray(self._record_size * self._capacity)
+        self._head = 0  # общее число записанных кадров
+        self._tail = 0  # общее число прочитанных кадров
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def push(self, time_us: int, identifier: int, properties: int, dlc: int, data: bytes) -> bool:
+        with self._lock:
+            if self._head - self._tail >= self._capacity:
+                self._dropped += 1
+                return False
+            offset = (self._head % self._capacity) * self._record_size
+            RAW_FRAME_RECORD.pack_into(self._buffer, offset,
+                                       time_us, identifier & 0xFFFFFFFF, properties & 0xFF, dlc & 0xFF, data)
+            self._head += 1
+        return True
+
+    def drain(self, max_count: int = 0) -> list[CanFrame]:
+        data, _ = self.drain_raw(max_count)
+        # Распаковка уже скопированных записей идет вне блокировки
+        return [CanFrame(*fields) for fields in RAW_FRAME_RECORD.iter_unpack(data)]
+
+    def drain_raw(self, max_count: int = 0) -> tuple[bytes, int]:
+        """Забирает записи одним куском байт в формате RAW_FRAME_RECORD, без распаковки."""
+        with self._lock:
+            count = self._head - self._tail
+            if max_count > 0:
+                count = min(count, max_count)
+            if count == 0:
+                return b"", 0
+            # Копия снимается до сдвига _tail: освобожденные слоты писатели сразу перезаписывают
+            first = (self._tail % self._capacity) * self._record_size
+            last = ((self._tail + count - 1) % self._capacity + 1) * self._record_size
+            if last > first:
+                data = bytes(self._buffer[first:last])
+            else:
+                # Кусок переходит через конец буфера
+                data = bytes(self._buffer[first:]) + bytes(self._buffer[:last])
+            self._tail += count
+        return data, count
+
+    def clear(self):
+        with self._lock:
+            self._tail = self._head
+
+
+class RxIngestThread(threading.Thread):
+    """
+    Поток доставки: раз в interval_s забирает кадры из RxRingBuffer
+    и передает их потребителю одной пачкой.
+    """
+
+    def __init__(self,
+                 ring: RxRingBuffer,
+                 deliver: Callable[[list[CanFrame]], None],
+                 interval_s: float = 0.02,
+                 max_batch: int = 4096):
+        super().__init__(name="CanRxIngest", daemon=True)
+        self._ring = ring
+        self._deliver = deliver
+        self._interval_s = interval_s
+        self._max_batch = max_batch
+        self._stop_event = threading.Event()
+
+    @property
+    def interval_s(self) -> float:
+        return self._interval_s
+
+    @interval_s.setter
+    def interval_s(self, value: float):
+        self._interval_s = max(float(value), 0.001)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval_s):
+            self._flush()
+        # Кадры, принятые до остановки, доставляются последней пачкой
+        self._flush()
+
+    def _flush(self):
+        while len(self._ring) > 0:
+            batch = self._ring.drain(self._max_batch)
+            if not batch:
+                break
+            try:
+                self._deliver(batch)
+            except Exception as err:
+                LOGGER.error(f"RxIngestThread: {err}")
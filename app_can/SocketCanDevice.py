@@ -0,0 +1,328 @@
+import ctypes
+import errno
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from ctypes import POINTER, Structure, c_char_p, c_int, c_int32, c_size_t, c_uint, c_uint32, c_void_p
+from pathlib import Path
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanFrame import CanFrame
+
+LOGGER = logging.getLogger(__name__)
+
+# struct can_frame: can_id (u32), len (u8), 3 байта выравнивания, data[8]
+CAN_FRAME = struct.Struct("=IB3x8s")
+
+CAN_EFF_FLAG = 0x80000000
+CAN_RTR_FLAG = 0x40000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1FFFFFFF
+
+# ARPHRD_CAN в /sys/class/net/<if>/type
+ARPHRD_CAN = 280
+
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+MSG_WAITFORONE = 0x10000
+
+# struct cmsghdr: cmsg_len (size_t), cmsg_level (int), cmsg_type (int); за ним struct timespec
+CMSG_HEADER = struct.Struct("@Nii")
+TIMESPEC = struct.Struct("@ll")
+TIMEVAL = struct.Struct("@ll")
+CONTROL_SIZE = 64
+
+
+class _IoVec(Structure):
+    _fields_ = [("iov_base", c_void_p), ("iov_len", c_size_t)]
+
+
+class _MsgHdr(Structure):
+    _fields_ = [("msg_name", c_void_p),
+                ("msg_namelen", c_uint32),
+                ("msg_iov", POINTER(_IoVec)),
+                ("msg_iovlen", c_size_t),
+                ("msg_control", c_void_p),
+                ("msg_controllen", c_size_t),
+                ("msg_flags", c_int)]
+
+
+class _MMsgHdr(Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", c_uint)]
+
+
+class BatchReceiver:
+    """
+    Пакетное чтение датаграмм фиксированного размера через recvmmsg(2)
+    с временем приема ядра (SO_TIMESTAMPNS).
+
+    Буферы выделяются один раз; за один системный вызов читается до batch записей.
+    Если libc не предоставляет recvmmsg, читает по одной записи через recvmsg.
+    """
+
+    _libc = None
+
+    def __init__(self, sock: socket.socket, record_size: int, batch: int = 64):
+        self._sock = sock
+        self._record_size = int(record_size)
+        self._batch = max(int(batch), 1)
+
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+
+        self._recvmmsg = self._load_recvmmsg()
+        self._records = ctypes.create_string_buffer(self._record_size * self._batch)
+        self._control = ctypes.create_string_buffer(CONTROL_SIZE * self._batch)
+        self._iov = (_IoVec * self._batch)()
+        self._msgs = (_MMsgHdr * self._batch)()
+        records_addr = ctypes.addressof(self._records)
+        control_addr = ctypes.addressof(self._control)
+        for i in range(self._batch):
+            self._iov[i].iov_base = records_addr + i * self._record_size
+            self._iov[i].iov_len = self._record_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._iov[i])
+            hdr.msg_iovlen = 1
+            hdr.msg_control = control_addr + i * CONTROL_SIZE
+
+    @classmethod
+    def _load_recvmmsg(cls):
+        if cls._libc is None:
+            try:
+                cls._libc = ctypes.CDLL(None, use_errno=True)
+            except OSError:
+                return None
+        func = getattr(cls._libc, "recvmmsg", None)
+        if func is None:
+            return None
+        func.argtypes = [c_int, POINTER(_MMsgHdr), c_uint, c_int, c_void_p]
+        func.restype = c_int
+        return func
+
+    @property
+    def batched(self) -> bool:
+        return self._recvmmsg is not None
+
+    def receive(self) -> list[tuple[bytes, int]]:
+        """
+        Блокируется до первой записи (или таймаута сокета) и возвращает
+        все уже пришедшие записи: [(данные, время ядра в мкс)], 0 - времени нет.
+        """
+        if self._recvmmsg is None:
+            return self._receive_single()
+
+        for i in range(self._batch):
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_controllen = CONTROL_SIZE
+            hdr.msg_flags = 0
+
+        count = self._recvmmsg(self._sock.fileno(), self._msgs, self._batch, MSG_WAITFORONE, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        result = []
+        records = self._records
+        control = self._control
+        record_size = self._record_size
+        for i in range(count):
+            offset = i * record_size
+            data = records[offset:offset + record_size]
+            time_us = self._parse_timestamp(control, i * CONTROL_SIZE, self._msgs[i].msg_hdr.msg_controllen)
+            result.append((data, time_us))
+        return result
+
+    @staticmethod
+    def _parse_timestamp(control, offset: int, length: int) -> int:
+        end = offset + min(length, CONTROL_SIZE)
+        align = ctypes.sizeof(c_size_t)
+        while offset + CMSG_HEADER.size <= end:
+            cmsg_len, level, kind = CMSG_HEADER.unpack_from(control, offset)
+            if cmsg_len < CMSG_HEADER.size:
+                break
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                seconds, nanoseconds = TIMESPEC.unpack_from(control, offset + CMSG_HEADER.size)
+                return seconds * 1000000 + nanoseconds // 1000
+            offset += (cmsg_len + align - 1) & ~(align - 1)
+        return 0
+
+    def _receive_single(self) -> list[tuple[bytes, int]]:
+        try:
+            data, ancdata, _flags, _addr = self._sock.recvmsg(self._record_size, CONTROL_SIZE)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            return []
+        time_us = 0
+        for level, kind, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(cmsg_data) >= TIMESPEC.size:
+                seconds, nanoseconds = TIMESPEC.unpack_from(cmsg_data)
+                time_us = seconds * 1000000 + nanoseconds // 1000
+        return [(data, time_us)]
+
+
+class SocketCanDevice(BaseCanDevice):
+    """
+    CAN-интерфейс Linux SocketCAN (can0, vcan0 ...).
+
+    Кадры читаются пачками через recvmmsg с временем приема ядра, поэтому
+    поток чтения делает один системный вызов на пачку, а не на кадр.
+    Скорость шины задается системой (ip link set can0 type can bitrate ...),
+    baud_rate в start_trace только запоминается.
+    """
+
+    def __init__(self, interface: str | None = None, batch: int = 64):
+        super().__init__()
+        self._interface = interface
+        self._batch = batch
+        self._interfaces: list[str] = []
+        self._selected_interface = ""
+        self._socket: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._tx_errors = 0
+
+    @staticmethod
+    def available_interfaces() -> list[str]:
+        """CAN-интерфейсы системы по /sys/class/net/*/type."""
+        result = []
+        try:
+            for path in sorted(Path("/sys/class/net").iterdir()):
+                try:
+                    if int((path / "type").read_text().strip()) == ARPHRD_CAN:
+                        result.append(path.name)
+                except (OSError, ValueError):
+                    continue
+        except OSError:
+            pass
+        return result
+
+    @property
+    def interface(self) -> str:
+        return self._selected_interface
+
+    @property
+    def tx_errors(self) -> int:
+        return self._tx_errors
+
+    def get_devices(self) -> c_int32:
+        self._interfaces = [self._interface] if self._interface else self.available_interfaces()
+        return c_int32(len(self._interfaces))
+
+    def update_device_info(self, device_index: int):
+        if 0 <= device_index < len(self._interfaces):
+            self._device_info.manufacturer = c_char_p(b"SocketCAN")
+            self._device_info.product = c_char_p(self._interfaces[device_index].encode("ascii", errors="replace"))
+            self._device_info.serial = c_char_p(b"")
+
+    def connect_to(self, device_index: int) -> c_size_t:
+        if self._is_connect:
+            return c_size_t(0)
+        if not self._interfaces:
+            self.get_devices()
+        if not 0 <= device_index < len(self._interfaces):
+            LOGGER.error(f"SocketCAN: нет интерфейса с индексом {device_index}")
+            return c_size_t(0)
+
+        interface = self._interfaces[device_index]
+        try:
+            sock = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            sock.bind((interface,))
+        except (OSError, AttributeError) as err:
+            LOGGER.error(f"SocketCAN: ошибка подключения к {interface}: {err}")
+            return c_size_t(0)
+
+        # Таймаут чтения на уровне ядра: сокет остается блокирующим для recvmmsg,
+        # а поток приема раз в 200 мс проверяет остановку
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, TIMEVAL.pack(0, 200000))
+        self._socket = sock
+        self._selected_interface = interface
+        self.update_device_info(device_index)
+        self.is_connect = True
+        self._start_workers()
+        LOGGER.info(f"Успешное подключение к SocketCAN {interface}")
+        return c_size_t(sock.fileno())
+
+    def disconnect_device(self) -> bool:
+        self.stop_trace()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self.is_connect = False
+        self.close()
+        return True
+
+    def start_trace(self, channel: int, baud_rate: int, terminator: bool):
+        if self._is_trace or self._socket is None:
+            return
+        self.channel = channel
+        self.baud_rate = baud_rate
+        self.terminator = terminator
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._receive_loop, name="CanSocketRx", daemon=True)
+        self.is_trace = True
+        self._thread.start()
+        LOGGER.info(f"Запуск отслеживания сообщений SocketCAN {self._selected_interface}")
+        self.signal_tracing_started.emit()
+
+    def stop_trace(self):
+        if self._is_trace:
+            self._stop_event.set()
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
+            self._thread = None
+            self.is_trace = False
+
+        self.signal_tracing_stopped.emit()
+
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
+        if self._socket is None:
+            return
+        payload_len = min(max(int(dlc), 0), len(data), 8)
+        payload = bytes(int(data[i]) & 0xFF for i in range(payload_len))
+        try:
+            self._socket.send(CAN_FRAME.pack((int(iden) & CAN_EFF_MASK) | CAN_EFF_FLAG, payload_len, payload))
+        except OSError as err:
+            # ENOBUFS: очередь передачи интерфейса заполнена
+            self._tx_errors += 1
+            LOGGER.error(f"SocketCAN: ошибка отправки 0x{int(iden):08X}: {err}")
+            return -1
+
+        self._log_tx_frame(iden, dlc, data)
+        return 0
+
+    def send_sync(self, iden: int, dlc: int, data: list[int], timeout: int):
+        return self._transmit(iden, dlc, data)
+
+    def _receive_loop(self):
+        try:
+            receiver = BatchReceiver(self._socket, CAN_FRAME.size, self._batch)
+        except OSError as err:
+            LOGGER.error(f"SocketCAN: {err}")
+            return
+        if not receiver.batched:
+            LOGGER.warning("SocketCAN: recvmmsg недоступен, чтение по одному кадру")
+
+        unpack = CAN_FRAME.unpack_from
+        while not self._stop_event.is_set():
+            try:
+                records = receiver.receive()
+            except OSError as err:
+                if not self._stop_event.is_set():
+                    LOGGER.error(f"SocketCAN: ошибка чтения: {err}")
+                break
+
+            for data, time_us in records:
+                can_id, dlc, payload = unpack(data)
+                if can_id & CAN_ERR_FLAG:
+                    continue
+                properties = 0
+                if can_id & CAN_EFF_FLAG:
+                    properties |= CanFrame.FLAG_EXTENDED
+                if can_id & CAN_RTR_FLAG:
+                    properties |= CanFrame.FLAG_REMOTE
+                if time_us == 0:
+                    time_us = int(time.time() * 1000000)
+                self._push_rx(time_us, can_id & CAN_EFF_MASK, properties, dlc, payload)
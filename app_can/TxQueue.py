@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable
+
+LOGGER = logging.getLogger(__name__)
+
+# Длина кадра с 29-битным идентификатором и 8 байтами данных в битах,
+# с учетом межкадрового интервала и типичного bit stuffing
+EXTENDED_FRAME_BITS = 140
+
+# Остаток паузы короче этого выжидается активным ожиданием: sleep() не точнее ~1 мс
+SPIN_THRESHOLD_S = 0.002
+
+
+def wait_until(deadline: float):
+    """Ожидание до момента perf_counter() с точностью до десятков микросекунд."""
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0.0:
+            return
+        if remaining > SPIN_THRESHOLD_S:
+            time.sleep(remaining - SPIN_THRESHOLD_S / 2)
+
+
+class TxPriority(IntEnum):
+    """Классы передачи; меньше значение - выше приоритет."""
+    FLASHING = 0        # CF прошивки: задержка растягивает загрузку
+    DIAGNOSTIC = 1      # запросы сервисов UDS
+    POLLING = 2         # фоновый опрос коллектора
+
+
+class TxClassStats:
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.latency_sum_s = 0.0
+        self.latency_max_s = 0.0
+
+    def as_dict(self, depth: int) -> dict[str, float | int]:
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "latency_mean_ms": self.latency_sum_s / self.sent * 1000.0 if self.sent else 0.0,
+            "latency_max_ms": self.latency_max_s * 1000.0,
+        }
+
+
+class TxQueue(threading.Thread):
+    """
+    Очередь передачи с приоритетами и ограничением загрузки шины.
+
+    Кадры каждого класса TxPriority ждут в своей очереди, поток передачи
+    всегда берет кадр самого приоритетного непустого класса. Темп задает
+    token bucket: utilisation от пропускной способности шины при baud_rate
+    (кадров/с), запас burst_frames позволяет отправить блок CF без пауз.
+
+    put_burst ставит серию кадров одним элементом: поток отправляет ее кадры
+    по порядку с паузой не меньше st_min_s между ними (ISO-TP STmin). Паузы
+    заполняются кадрами других серий, поэтому несколько узлов, прошиваемых
+    одновременно, делят шину без простоев. Глубина очереди считается в элементах.
+    """
+
+    def __init__(self,
+                 transmit: Callable[[int, int, list[int]], object],
+                 baud_rate_kbps: int = 500,
+                 utilisation: float = 0.7,
+                 burst_frames: int = 16,
+                 max_depth: int = 4096):
+        super().__init__(name="CanTxQueue", daemon=True)
+        self._transmit = transmit
+        self._queues: dict[TxPriority, deque] = {priority: deque() for priority in TxPriority}
+        self._stats: dict[TxPriority, TxClassStats] = {priority: TxClassStats() for priority in TxPriority}
+        self._max_depth = max(int(max_depth), 1)
+        self._burst_frames = max(float(burst_frames), 1.0)
+        # Начатые серии: кадры одной серии идут с паузой st_min_s, в паузах - кадры других серий
+        self._active: list[_Burst] = []
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+        self._baud_rate_kbps = 500
+        self._utilisation = 0.7
+        self._rate_fps = 0.0
+        self._tokens = self._burst_frames
+        self._tokens_time = time.perf_counter()
+        self.configure(baud_rate_kbps, utilisation)
+
+    @property
+    def rate_fps(self) -> float:
+        """Разрешенный темп передачи, кадров/с."""
+        return self._rate_fps
+
+    @property
+    def utilisation(self) -> float:
+        return self._utilisation
+
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def configure(self, baud_rate_kbps: int | None = None, utilisation: float | None = None):
+        with self._cond:
+            if baud_rate_kbps is not None and int(baud_rate_kbps) > 0:
+                self._baud_rate_kbps = int(baud_rate_kbps)
+            if utilisation is not None:
+                self._utilisation = min(max(float(utilisation), 0.01), 1.0)
+            self._rate_fps = self._baud_rate_kbps * 1000.0 / EXTENDED_FRAME_BITS * self._utilisation
+            self._cond.notify()
+
+    def put(self, iden: int, dlc: int, data: list[int], priority: TxPriority = TxPriority.DIAGNOSTIC) -> bool:
+        return self.put_burst([(iden, dlc, data)], 0.0, priority)
+
+    def put_burst(self,
+                  frames: list[tuple[int, int, list[int]]],
+                  st_min_s: float = 0.0,
+                  priority: TxPriority = TxPriority.FLASHING) -> bool:
+        if not frames:
+            return True
+        with self._cond:
+            queue = self._queues[priority]
+            stats = self._stats[priority]
+            if len(queue) >= self._max_depth:
+                stats.dropped += len(frames)
+                return False
+            queue.append((time.perf_counter(), frames, max(float(st_min_s), 0.0)))
+            stats.queued += len(frames)
+            if len(queue) > stats.max_depth:
+                stats.max_depth = len(queue)
+            self._cond.notify()
+        return True
+
+    def clear(self, priority: TxPriority | None = None):
+        with self._cond:
+            for key, queue in self._queues.items():
+                if priority is None or key == priority:
+                    self._stats[key].dropped += sum(len(item[1]) for item in queue)
+                    queue.clear()
+            for burst in self._active:
+                if priority is None or burst.priority == priority:
+                    self._stats[burst.priority].dropped += len(burst.frames) - burst.index
+                    burst.index = len(burst.frames)
+            self._active = [burst for burst in self._active if burst.index < len(burst.frames)]
+
+    def stats(self) -> dict[str, dict[str, float | int]]:
+        with self._cond:
+            return {priority.name.lower(): self._stats[priority].as_dict(len(self._queues[priority]))
+                    for priority in TxPriority}
+
+    def reset_stats(self):
+        with self._cond:
+            self._stats = {priority: TxClassStats() for priority in TxPriority}
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                burst, spin_until = self._next_burst()
+            if burst is None:
+                if spin_until is not None:
+                    wait_until(spin_until)
+                continue
+
+            iden, dlc, data = burst.frames[burst.index]
+            try:
+                self._transmit(iden, dlc, data)
+            except Exception as err:
+                LOGGER.error(f"TxQueue: ошибка отправки 0x{int(iden):08X}: {err}")
+            sent_at = time.perf_counter()
+
+            with self._cond:
+                self._stats[burst.priority].sent += 1
+                burst.index += 1
+                burst.next_time = sent_at + burst.st_min_s
+                if burst.index >= len(burst.frames) and burst in self._active:
+                    self._active.remove(burst)
+
+    def _refill(self, now: float):
+        self._tokens = min(self._tokens + (now - self._tokens_time) * self._rate_fps, self._burst_frames)
+        self._tokens_time = now
+
+    def _next_burst(self) -> tuple["_Burst | None", float | None]:
+        """
+        Выбирает под блокировкой серию, чей очередной кадр можно отправить, и берет токен.
+        Без серии возвращает момент для активного ожидания или None, если уже подождали.
+        """
+        now = time.perf_counter()
+        ready: _Burst | None = None
+        next_time: float | None = None
+        for burst in self._active:
+            if burst.next_time <= now:
+                if ready is None or burst.priority < ready.priority:
+                    ready = burst
+            elif next_time is None or burst.next_time < next_time:
+                next_time = burst.next_time
+
+        # Новая серия начинается, только если она приоритетнее готовой
+        head = next((key for key in TxPriority if self._queues[key]), None)
+        if head is not None and (ready is None or head < ready.priority):
+            ready = None
+            deadline = now
+        else:
+            head = None
+            deadline = now if ready is not None else next_time
+
+        if deadline is None:
+            self._cond.wait(0.2)
+            return None, None
+
+        self._refill(now)
+        if self._tokens < 1.0:
+            deadline = max(deadline, now + (1.0 - self._tokens) / self._rate_fps)
+        if deadline > now:
+            remaining = deadline - now
+            if remaining > SPIN_THRESHOLD_S:
+                self._cond.wait(remaining - SPIN_THRESHOLD_S / 2)
+                return None, None
+            return None, deadline
+
+        self._tokens -= 1.0
+        if head is not None:
+            queued_at, frames, st_min_s = self._queues[head].popleft()
+            ready = _Burst(head, frames, st_min_s)
+            self._active.append(ready)
+            # Задержка в очереди до первого кадра серии
+            latency = now - queued_at
+            stats = self._stats[head]
+            stats.latency_sum_s += latency * len(frames)
+            if latency > stats.latency_max_s:
+                stats.latency_max_s = latency
+        return ready, None
+
+
+class _Burst:
+    """Серия кадров, переданная в put_burst, и позиция ее отправки."""
+
+    __slots__ = ("priority", "frames", "st_min_s", "index", "next_time")
+
+    def __init__(self, priority: TxPriority, frames: list[tuple[int, int, list[int]]], st_min_s: float):
+        self.priority = priority
+        self.frames = frames
+        self.st_min_s = st_min_s
+        self.index = 0
+        self.next_time = 0.0
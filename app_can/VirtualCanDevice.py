@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from ctypes import c_char_p, c_int32, c_size_t
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanFrame import CanFrame
+from app_can.VirtualEcu import VirtualEcu, VirtualEcuConfig
+
+LOGGER = logging.getLogger(__name__)
+
+# Адрес тестера и служебные адреса J1939 симулируемым узлам не выдаются
+TESTER_ADDRESS = 0xF1
+MAX_NODE_ADDRESS = 0xFD
+
+
+class VirtualCanDevice(BaseCanDevice):
+    """
+    Замена CanDevice с виртуальной шиной и набором симулируемых ЭБУ (VirtualEcu).
+
+    Кадры тестера (PF 0xDA) передаются ЭБУ с совпадающим адресом сразу в _transmit,
+    ответы ставятся в очередь по времени и выдаются потоком симулятора через
+    тот же кольцевой буфер и router, что и кадры адаптера. Каждый ЭБУ раз
+    в broadcast_interval_s шлет PGN 0xFEFC, по которому коллектор находит узлы.
+    Позволяет замерить опрос коллектора и прошивку на 1..253 узлах без адаптера.
+    """
+
+    def __init__(self,
+                 node_count: int = 1,
+                 config: VirtualEcuConfig | None = None,
+                 first_address: int = 0x6A,
+                 seed: int | None = None):
+        super().__init__()
+        self._config = config if config is not None else VirtualEcuConfig()
+        self._rng = random.Random(seed)
+
+        self._ecus: dict[int, VirtualEcu] = {}
+        for address in self._allocate_addresses(node_count, first_address):
+            self._ecus[address] = VirtualEcu(address, self._config, random.Random(self._rng.random()))
+
+        # Очередь кадров: (время, порядковый номер, ЭБУ, идентификатор, данные);
+        # данные None - широковещательный кадр ЭБУ, формируется в момент отправки
+        self._events: list[tuple[float, int, VirtualEcu, int, bytes | None]] = []
+        self._event_order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._frames_sent = 0
+
+    @staticmethod
+    def _allocate_addresses(node_count: int, first_address: int) -> list[int]:
+        addresses = []
+        address = int(first_address) & 0xFF
+        for _ in range(MAX_NODE_ADDRESS + 1):
+            if len(addresses) >= node_count:
+                break
+            if address != TESTER_ADDRESS and address <= MAX_NODE_ADDRESS:
+                addresses.append(address)
+            address = (address + 1) & 0xFF
+        if len(addresses) < node_count:
+            LOGGER.warning(f"Виртуальная шина: доступно только {len(addresses)} адресов из {node_count}")
+        return addresses
+
+    @property
+    def config(self) -> VirtualEcuConfig:
+        return self._config
+
+    @property
+    def ecus(self) -> list[VirtualEcu]:
+        with self._cond:
+            return list(self._ecus.values())
+
+    def ecu(self, source_address: int) -> VirtualEcu | None:
+        with self._cond:
+            return self._ecus.get(int(source_address) & 0xFF)
+
+    def stats(self) -> dict[str, int]:
+        """Суммарные счетчики всех ЭБУ и число кадров, выданных на шину."""
+        totals = {
+            "nodes": 0,
+            "requests": 0,
+            "responses": 0,
+            "negative_responses": 0,
+            "pending_responses": 0,
+            "stmin_violations": 0,
+            "sequence_errors": 0,
+            "overflows": 0,
+            "lost_frames": 0,
+            "erased_bytes": 0,
+            "written_bytes": 0,
+        }
+        with self._cond:
+            totals["nodes"] = len(self._ecus)
+            for ecu in self._ecus.values():
+                totals["requests"] += ecu.requests
+                totals["responses"] += ecu.responses
+                totals["negative_responses"] += ecu.negative_responses
+                totals["pending_responses"] += ecu.pending_responses
+                totals["stmin_violations"] += ecu.stmin_violations
+                totals["sequence_errors"] += ecu.sequence_errors
+                totals["overflows"] += ecu.overflows
+                totals["lost_frames"] += ecu.lost_frames
+                totals["erased_bytes"] += ecu.erased_bytes
+                totals["written_bytes"] += ecu.written_bytes
+            totals["frames_sent"] = self._frames_sent
+        return totals
+
+    def get_devices(self) -> c_int32:
+        return c_int32(1)
+
+    def update_device_info(self, device_index: int):
+        if device_index != -1:
+            self._device_info.manufacturer = c_char_p(b"Virtual")
+            self._device_info.product = c_char_p(f"{len(self._ecus)} ECU".encode("ascii"))
+            self._device_info.serial = c_char_p(b"")
+
+    def connect_to(self, device_index: int) -> c_size_t:
+        self.update_device_info(device_index)
+        self.is_connect = True
+        self._start_workers()
+        return c_size_t(1)
+
+    def disconnect_device(self) -> bool:
+        self.stop_trace()
+        self.is_connect = False
+        self.close()
+        return True
+
+    def start_trace(self, channel: int, baud_rate: int, terminator: bool):
+        if self._is_trace:
+            return
+        self.channel = channel
+        self.baud_rate = baud_rate
+        self.terminator = terminator
+        self._stop_event.clear()
+
+        now = time.perf_counter()
+        interval = self._config.broadcast_interval_s
+        with self._cond:
+            self._events = []
+            if interval > 0:
+                # Широковещательные кадры узлов разнесены по периоду
+                for index, ecu in enumerate(self._ecus.values()):
+                    self._push_event(now + interval * index / max(len(self._ecus), 1), ecu, 0, None)
+
+        self._thread = threading.Thread(target=self._run, name="CanVirtualBus", daemon=True)
+        self.is_trace = True
+        self._thread.start()
+        LOGGER.info(f"Виртуальная шина: {len(self._ecus)} ЭБУ, задержка {self._config.latency_ms} мс")
+        self.signal_tracing_started.emit()
+
+    def stop_trace(self):
+        if self._is_trace:
+            self._stop_event.set()
+            with self._cond:
+                self._cond.notify()
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
+            self._thread = None
+            self.is_trace = False
+
+        self.signal_tracing_stopped.emit()
+
+    def _transmit(self, iden: int, dlc: int, data: list[int]):
+        if not self._is_connect:
+            return
+        self._log_tx_frame(iden, dlc, data)
+        if self._is_trace:
+            self._deliver_to_ecu(int(iden) & 0x1FFFFFFF, bytes(int(b) & 0xFF for b in data[:min(int(dlc), 8)]))
+        return 0
+
+    def send_sync(self, iden: int, dlc: int, data: list[int], timeout: int):
+        return self._transmit(iden, dlc, data)
+
+    def _deliver_to_ecu(self, identifier: int, data: bytes):
+        if (identifier >> 16) & 0xFF != 0xDA:
+            return
+        now = time.perf_counter()
+        with self._cond:
+            ecu = self._ecus.get((identifier >> 8) & 0xFF)
+            if ecu is None:
+                return
+            frames = ecu.on_frame(identifier, data, now)
+            old_address = ecu.source_address
+            if ecu.apply_source_address():
+                # WriteDataById 0x0011: ответ уже сформирован со старым адресом
+                if ecu.source_address in self._ecus:
+                    LOGGER.warning(f"Виртуальная шина: адрес 0x{ecu.source_address:02X} уже занят")
+                self._ecus.pop(old_address, None)
+                self._ecus[ecu.source_address] = ecu
+            for delay, response_id, payload in frames:
+                self._push_event(now + delay, ecu, response_id, payload)
+            if frames:
+                self._cond.notify()
+
+    def _push_event(self, due: float, ecu: VirtualEcu, identifier: int, payload: bytes | None):
+        if payload is not None:
+            due = max(due, ecu.last_due)
+            ecu.last_due = due
+        heapq.heappush(self._events, (due, next(self._event_order), ecu, identifier, payload))
+
+    def _run(self):
+        interval = self._config.broadcast_interval_s
+        while not self._stop_event.is_set():
+            ready = []
+            with self._cond:
+                now = time.perf_counter()
+                while self._events and self._events[0][0] <= now:
+                    due, _order, ecu, identifier, payload = heapq.heappop(self._events)
+                    if payload is None:
+                        identifier, payload = ecu.broadcast_frame(due)
+                        self._push_event(due + interval, ecu, 0, None)
+                    ready.append((identifier, payload))
+                if not ready:
+                    timeout = self._events[0][0] - now if self._events else None
+                    self._cond.wait(timeout)
+                    continue
+                self._frames_sent += len(ready)
+
+            for identifier, payload in ready:
+                self._push_rx(int(time.perf_counter() * 1000000), identifier,
+                              CanFrame.FLAG_EXTENDED, len(payload), payload)
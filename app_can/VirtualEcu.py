@@ -0,0 +1,509 @@
+import math
+import random
+from dataclasses import dataclass, field
+
+from uds.data_identifiers import UdsData
+from uds.services.request_download import ServiceRequestDownload
+
+# Сервисы, на которые ЭБУ отвечает NRC 0x78 (responsePending) перед окончательным ответом:
+# RoutineControl, RequestDownload, TransferData, RequestTransferExit
+PENDING_SERVICES = frozenset((0x31, 0x34, 0x36, 0x37))
+
+# Negative Response Codes
+NRC_SERVICE_NOT_SUPPORTED = 0x11
+NRC_SUB_FUNCTION_NOT_SUPPORTED = 0x12
+NRC_INCORRECT_LENGTH = 0x13
+NRC_CONDITIONS_NOT_CORRECT = 0x22
+NRC_REQUEST_SEQUENCE_ERROR = 0x24
+NRC_REQUEST_OUT_OF_RANGE = 0x31
+NRC_SECURITY_ACCESS_DENIED = 0x33
+NRC_INVALID_KEY = 0x35
+NRC_UPLOAD_DOWNLOAD_NOT_ACCEPTED = 0x70
+NRC_TRANSFER_DATA_SUSPENDED = 0x71
+NRC_WRONG_BLOCK_SEQUENCE_COUNTER = 0x73
+NRC_RESPONSE_PENDING = 0x78
+
+# Flow Status кадра Flow Control
+FC_CONTINUE_TO_SEND = 0
+FC_OVERFLOW = 2
+
+# Страница flash: стирание участка идет целыми страницами
+FLASH_PAGE_SIZE = 1024
+ERASED_BYTE = 0xFF
+
+# PGN 0xFEFC (Dash Display): уровень топлива в байте 1, 0.4 %/бит
+BROADCAST_PGN = 0xFEFC
+
+PROGRAMMING_SESSION = 2
+
+
+@dataclass
+class VirtualEcuConfig:
+    """Параметры поведения симулируемого ЭБУ (времена в миллисекундах)."""
+
+    latency_ms: float = 2.0                 # задержка ответа на запрос
+    jitter_ms: float = 0.0                  # случайное отклонение задержки, +-jitter_ms
+    fc_latency_ms: float = 0.5              # задержка Flow Control после FF и блока CF
+    block_size: int = 8                     # BS в Flow Control, 0 - без ограничения
+    st_min_ms: int = 0                      # STmin в Flow Control
+    pending_count: int = 0                  # число NRC 0x78 перед окончательным ответом
+    pending_interval_ms: float = 20.0       # период повторения NRC 0x78
+    pending_services: frozenset = field(default_factory=lambda: PENDING_SERVICES)
+    max_block_length: int = 1026            # maxNumberOfBlockLength в ответе RequestDownload
+    rx_buffer_size: int = 2050              # больше - Flow Control overflow, не меньше max_block_length
+    byte_order: str = "big"                 # порядок байт DID и адреса/длины RequestDownload
+    broadcast_interval_s: float = 1.0       # период широковещательного PGN 0xFEFC, 0 - выключен
+    moving_fraction: float = 1.0            # доля ЭБУ с меняющимися сигналами, остальные стоят на месте
+    frame_loss: float = 0.0                 # доля кадров тестера, которые ЭБУ не получает (плохой контакт)
+    region_erase: bool = True               # Erase Memory с адресом и длиной, иначе NRC 0x31
+    memory_address: int = ServiceRequestDownload.MEMORY_ADDRESS    # область основной программы во flash
+    memory_length: int = ServiceRequestDownload.MAX_MEMORY_LENGTH
+
+
+class VirtualEcu:
+    """
+    Симулятор датчика уровня топлива Geehy на уровне UDS поверх ISO-TP.
+
+    Принимает кадры тестера, собирает многокадровые запросы (с Flow Control
+    по BS/STmin) и возвращает ответы списком (задержка с, идентификатор, данные).
+    Время отправки ответов и порядок кадров обеспечивает VirtualCanDevice.
+    Принятая по TransferData прошивка доступна в image. Flash моделируется
+    постранично: Erase Memory без параметров стирает всю область, с адресом и
+    длиной - только эти страницы, RequestDownload принимается только в стертые.
+    """
+
+    def __init__(self, source_address: int, config: VirtualEcuConfig | None = None, rng: random.Random | None = None):
+        self.source_address: int = int(source_address) & 0xFF
+        self._config = config if config is not None else VirtualEcuConfig()
+        self._rng = rng if rng is not None else random.Random()
+
+        self._session = 1
+        self._unlocked = False
+        self._seed = 0
+
+        # Прием многокадрового запроса ISO-TP
+        self._rx_buffer = bytearray()
+        self._rx_length = 0
+        self._rx_next_sn = 0
+        self._rx_block_frames = 0
+        self._rx_last_cf_time = 0.0
+
+        # Активная загрузка: адрес, длина, принято байт, ожидаемый счетчик блока
+        self._download: dict[str, int] | None = None
+        # Flash основной программы: содержимое, стертые страницы и конец записанного образа
+        self._flash = bytearray([ERASED_BYTE]) * self._config.memory_length
+        self._erased_pages = bytearray(math.ceil(self._config.memory_length / FLASH_PAGE_SIZE))
+        self._image_end = 0
+
+        self._fuel_raw = self._rng.uniform(200.0, 900.0)
+        self._temperature_raw = self._rng.uniform(150.0, 300.0)
+        # Сигналы меняются во времени, а не от числа запросов: частый опрос не рождает изменений
+        self._moving = self._rng.random() < self._config.moving_fraction
+        self._signals_time: float | None = None
+        self._dids: dict[int, int] = {
+            UdsData.can_baud_rate.pid: 250,
+            UdsData.can_sa.pid: self.source_address,
+            UdsData.empty_fuel_tank.pid: 0,
+            UdsData.full_fuel_tank.pid: 1000,
+            UdsData.fingerprint.pid: 0,
+            UdsData.k_fuel_level.pid: 8,
+        }
+
+        # Очередной ответ не раньше предыдущего: кадры одного ЭБУ не переставляются
+        self.last_due: float = 0.0
+
+        self.requests = 0
+        self.responses = 0
+        self.negative_responses = 0
+        self.pending_responses = 0
+        self.stmin_violations = 0
+        self.sequence_errors = 0
+        self.overflows = 0
+        self.lost_frames = 0
+        self.erased_bytes = 0
+        self.written_bytes = 0
+
+    @property
+    def config(self) -> VirtualEcuConfig:
+        return self._config
+
+    @property
+    def session(self) -> int:
+        return self._session
+
+    @property
+    def unlocked(self) -> bool:
+        return self._unlocked
+
+    @property
+    def image(self) -> bytes:
+        """Содержимое flash от начала области до конца последнего записанного байта."""
+        return bytes(self._flash[:self._image_end])
+
+    @property
+    def fuel_percent(self) -> float:
+        return self._fuel_raw / 10.0
+
+    def broadcast_frame(self, now: float) -> tuple[int, bytes]:
+        """Широковещательный кадр PGN 0xFEFC, по нему коллектор находит узел."""
+        self._advance_signals(now)
+        fuel = min(int(round(self.fuel_percent / 0.4)), 0xFA)
+        return (0x18000000 | (BROADCAST_PGN << 8) | self.source_address,
+                bytes((0xFF, fuel, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF)))
+
+    def on_frame(self, identifier: int, data: bytes, now: float) -> list[tuple[float, int, bytes]]:
+        """Обрабатывает кадр, адресованный этому ЭБУ; возвращает кадры ответа."""
+        if len(data) == 0:
+            return []
+        if self._config.frame_loss > 0.0 and self._rng.random() < self._config.frame_loss:
+            self.lost_frames += 1
+            return []
+        self._advance_signals(now)
+
+        # Ответ тестеру: те же приоритет и PF, адреса меняются местами
+        tester = identifier & 0xFF
+        response_id = (identifier & 0x1FFF0000) | (tester << 8) | self.source_address
+
+        frame_type = data[0] >> 4
+        if frame_type == 0:
+            length = data[0] & 0x0F
+            if length == 0 or length > len(data) - 1:
+                return []
+            self._reset_rx()
+            return self._respond(response_id, bytes(data[1:1 + length]))
+
+        if frame_type == 1:
+            return self._on_first_frame(response_id, data, now)
+
+        if frame_type == 2:
+            return self._on_consecutive_frame(response_id, data, now)
+
+        # Flow Control от тестера: ответы ЭБУ однокадровые, ждать нечего
+        return []
+
+    def _reset_rx(self):
+        self._rx_buffer = bytearray()
+        self._rx_length = 0
+
+    def _on_first_frame(self, response_id: int, data: bytes, now: float) -> list[tuple[float, int, bytes]]:
+        length = ((data[0] & 0x0F) << 8) | data[1]
+        offset = 2
+        if length == 0 and len(data) >= 6:
+            # Escape-последовательность: 32-битная длина
+            length = int.from_bytes(data[2:6], "big")
+            offset = 6
+
+        fc_delay = self._config.fc_latency_ms / 1000.0
+        if length > self._config.rx_buffer_size:
+            self._reset_rx()
+            self.overflows += 1
+            return [(fc_delay, response_id, self._flow_control(FC_OVERFLOW))]
+
+        self._rx_buffer = bytearray(data[offset:])
+        self._rx_length = length
+        self._rx_next_sn = 1
+        self._rx_block_frames = 0
+        self._rx_last_cf_time = now
+        return [(fc_delay, response_id, self._flow_control(FC_CONTINUE_TO_SEND))]
+
+    def _on_consecutive_frame(self, response_id: int, data: bytes, now: float) -> list[tuple[float, int, bytes]]:
+        if self._rx_length == 0:
+            return []
+
+        sn = data[0] & 0x0F
+        if sn != self._rx_next_sn:
+            # Потерян кадр: запрос отбрасывается, тестер получит таймаут
+            self.sequence_errors += 1
+            self._reset_rx()
+            return []
+
+        st_min_s = self._config.st_min_ms / 1000.0
+        if self._rx_block_frames > 0 and now - self._rx_last_cf_time < st_min_s:
+            self.stmin_violations += 1
+        self._rx_last_cf_time = now
+
+        self._rx_next_sn = (sn + 1) & 0x0F
+        self._rx_block_frames += 1
+        self._rx_buffer += data[1:]
+
+        if len(self._rx_buffer) >= self._rx_length:
+            payload = bytes(self._rx_buffer[:self._rx_length])
+            self._reset_rx()
+            return self._respond(response_id, payload)
+
+        block_size = self._config.block_size
+        if block_size > 0 and self._rx_block_frames % block_size == 0:
+            self._rx_block_frames = 0
+            return [(self._config.fc_latency_ms / 1000.0, response_id, self._flow_control(FC_CONTINUE_TO_SEND))]
+        return []
+
+    def _flow_control(self, status: int) -> bytes:
+        return bytes((0x30 | status, self._config.block_size & 0xFF, self._config.st_min_ms & 0xFF,
+                      0xFF, 0xFF, 0xFF, 0xFF, 0xFF))
+
+    def _latency(self) -> float:
+        latency = self._config.latency_ms
+        jitter = self._config.jitter_ms
+        if jitter > 0:
+            latency += self._rng.uniform(-jitter, jitter)
+        return max(latency, 0.0) / 1000.0
+
+    def _respond(self, response_id: int, request: bytes) -> list[tuple[float, int, bytes]]:
+        self.requests += 1
+        response = self._handle_request(request)
+        if response is None:
+            return []
+
+        frames = []
+        delay = self._latency()
+        sid = request[0]
+        if response[0] != 0x7F and self._config.pending_count > 0 and sid in self._config.pending_services:
+            interval = self._config.pending_interval_ms / 1000.0
+            for _ in range(self._config.pending_count):
+                frames.append((delay, response_id, self._single_frame(bytes((0x7F, sid, NRC_RESPONSE_PENDING)))))
+                delay += interval
+            self.pending_responses += self._config.pending_count
+
+        if response[0] == 0x7F:
+            self.negative_responses += 1
+        self.responses += 1
+        frames.append((delay, response_id, self._single_frame(response)))
+        return frames
+
+    @staticmethod
+    def _single_frame(payload: bytes) -> bytes:
+        return bytes((len(payload),)) + payload + b"\xff" * (7 - len(payload))
+
+    @staticmethod
+    def _negative(sid: int, nrc: int) -> bytes:
+        return bytes((0x7F, sid, nrc))
+
+    def _handle_request(self, request: bytes) -> bytes | None:
+        sid = request[0]
+        handler = self._HANDLERS.get(sid)
+        if handler is None:
+            return self._negative(sid, NRC_SERVICE_NOT_SUPPORTED)
+        return handler(self, request)
+
+    def _parse_did(self, request: bytes) -> int:
+        if self._config.byte_order == "little":
+            return (request[2] << 8) | request[1]
+        return (request[1] << 8) | request[2]
+
+    def _advance_signals(self, now: float):
+        # Случайное блуждание во времени (разброс растет как корень из dt), чтобы графики коллектора были живыми
+        elapsed = 0.0 if self._signals_time is None else max(now - self._signals_time, 0.0)
+        self._signals_time = now
+        if not self._moving or elapsed == 0.0:
+            return
+        scale = math.sqrt(elapsed)
+        self._fuel_raw = min(max(self._fuel_raw + self._rng.gauss(0.0, 3.0 * scale), 0.0), 1000.0)
+        self._temperature_raw = min(max(self._temperature_raw + self._rng.gauss(0.0, 6.0 * scale), -400.0), 1250.0)
+
+    def _did_value(self, did: int) -> tuple[int, int] | None:
+        if did == UdsData.raw_fuel_level.pid:
+            return int(self._fuel_raw), UdsData.raw_fuel_level.size
+        if did == UdsData.raw_temperature.pid:
+            return int(self._temperature_raw) & 0xFFFF, UdsData.raw_temperature.size
+        if did == UdsData.curr_fuel_tank.pid:
+            # Период сигнала емкостного датчика растет с уровнем топлива
+            return 20000 + int(self._fuel_raw * 10), UdsData.curr_fuel_tank.size
+        if did == UdsData.type_session.pid:
+            return self._session, UdsData.type_session.size
+        if did in self._dids:
+            var = next(var for var in UdsData.vars.values() if var.pid == did)
+            return self._dids[did], var.size
+        return None
+
+    def _read_data_by_id(self, request: bytes) -> bytes:
+        if len(request) != 3:
+            return self._negative(0x22, NRC_INCORRECT_LENGTH)
+        value = self._did_value(self._parse_did(request))
+        if value is None:
+            return self._negative(0x22, NRC_REQUEST_OUT_OF_RANGE)
+        data, size = value
+        # Значение передается младшим байтом вперед (ServiceReadDataById.parse_data_field)
+        return bytes((0x62, request[1], request[2])) + (data & ((1 << (8 * size)) - 1)).to_bytes(size, "little")
+
+    def _write_data_by_id(self, request: bytes) -> bytes:
+        if len(request) < 4:
+            return self._negative(0x2E, NRC_INCORRECT_LENGTH)
+        did = self._parse_did(request)
+        if did not in self._dids:
+            return self._negative(0x2E, NRC_REQUEST_OUT_OF_RANGE)
+        value = int.from_bytes(request[3:], "little")
+        if did == UdsData.can_sa.pid:
+            value &= 0xFF
+            if value > 0xFD:
+                return self._negative(0x2E, NRC_REQUEST_OUT_OF_RANGE)
+        self._dids[did] = value
+        # Новый SA применяется после ответа: VirtualCanDevice перепривязывает ЭБУ
+        return bytes((0x6E, request[1], request[2]))
+
+    def apply_source_address(self) -> bool:
+        new_address = self._dids[UdsData.can_sa.pid] & 0xFF
+        if new_address == self.source_address:
+            return False
+        self.source_address = new_address
+        return True
+
+    def _session_control(self, request: bytes) -> bytes:
+        if len(request) != 2:
+            return self._negative(0x10, NRC_INCORRECT_LENGTH)
+        session = request[1] & 0x7F
+        if session not in (1, 2, 3):
+            return self._negative(0x10, NRC_SUB_FUNCTION_NOT_SUPPORTED)
+        self._session = session
+        self._unlocked = False
+        # P2 = 50 мс, P2* = 5000 мс
+        return bytes((0x50, session, 0x00, 0x32, 0x01, 0xF4))
+
+    def _ecu_reset(self, request: bytes) -> bytes:
+        if len(request) != 2:
+            return self._negative(0x11, NRC_INCORRECT_LENGTH)
+        self._session = 1
+        self._unlocked = False
+        self._download = None
+        return bytes((0x51, request[1]))
+
+    def _security_access(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self._negative(0x27, NRC_INCORRECT_LENGTH)
+        sub_function = request[1]
+        if sub_function == 0x01:
+            self._seed = self._rng.randint(1, 0xFFFF)
+            # Seed передается младшим байтом вперед (ServiceSecurityAccess)
+            return bytes((0x67, 0x01, self._seed & 0xFF, self._seed >> 8))
+        if sub_function == 0x02:
+            if len(request) < 4:
+                return self._negative(0x27, NRC_INCORRECT_LENGTH)
+            if self._seed == 0:
+                return self._negative(0x27, NRC_REQUEST_SEQUENCE_ERROR)
+            key = (request[2] << 8) | request[3]
+            expected = ((self._seed ^ 0xAA55) | self._seed) & 0xFFFF
+            self._seed = 0
+            if key != expected:
+                return self._negative(0x27, NRC_INVALID_KEY)
+            self._unlocked = True
+            return bytes((0x67, 0x02))
+        return self._negative(0x27, NRC_SUB_FUNCTION_NOT_SUPPORTED)
+
+    def _routine_control(self, request: bytes) -> bytes:
+        if len(request) < 4:
+            return self._negative(0x31, NRC_INCORRECT_LENGTH)
+        # Erase Memory: идентификатор рутины 0xFF00 передается как 0xFF, 0x00 (ServiceRoutineControl)
+        if request[1] != 0x01 or (request[2], request[3]) != (0xFF, 0x00):
+            return self._negative(0x31, NRC_REQUEST_OUT_OF_RANGE)
+        if not self._unlocked:
+            return self._negative(0x31, NRC_SECURITY_ACCESS_DENIED)
+
+        if len(request) == 4:
+            # Без параметров - вся область основной программы
+            offset, length = 0, self._config.memory_length
+        elif not self._config.region_erase:
+            return self._negative(0x31, NRC_REQUEST_OUT_OF_RANGE)
+        else:
+            region = self._parse_address_and_length(request[4:])
+            if region is None:
+                return self._negative(0x31, NRC_INCORRECT_LENGTH)
+            offset, length = region[0] - self._config.memory_address, region[1]
+            if (offset < 0 or length <= 0 or offset + length > self._config.memory_length
+                    or offset % FLASH_PAGE_SIZE or length % FLASH_PAGE_SIZE):
+                return self._negative(0x31, NRC_REQUEST_OUT_OF_RANGE)
+
+        self._flash[offset:offset + length] = bytes([ERASED_BYTE]) * length
+        first_page = offset // FLASH_PAGE_SIZE
+        last_page = math.ceil((offset + length) / FLASH_PAGE_SIZE)
+        self._erased_pages[first_page:last_page] = b"\x01" * (last_page - first_page)
+        if offset + length >= self._image_end:
+            self._image_end = min(self._image_end, offset)
+        self.erased_bytes += length
+        return bytes((0x71, request[1], request[2], request[3]))
+
+    def _parse_address_and_length(self, data: bytes) -> tuple[int, int] | None:
+        """addressAndLengthFormatIdentifier, адрес и длина (RequestDownload, Erase Memory)."""
+        if not data:
+            return None
+        size_len = data[0] >> 4
+        addr_len = data[0] & 0x0F
+        if len(data) != 1 + addr_len + size_len:
+            return None
+        order = "little" if self._config.byte_order == "little" else "big"
+        return (int.from_bytes(data[1:1 + addr_len], order),
+                int.from_bytes(data[1 + addr_len:1 + addr_len + size_len], order))
+
+    def _request_download(self, request: bytes) -> bytes:
+        if len(request) < 3:
+            return self._negative(0x34, NRC_INCORRECT_LENGTH)
+        region = self._parse_address_and_length(request[2:])
+        if region is None:
+            return self._negative(0x34, NRC_INCORRECT_LENGTH)
+        if not self._unlocked:
+            return self._negative(0x34, NRC_SECURITY_ACCESS_DENIED)
+
+        address, length = region
+        offset = address - self._config.memory_address
+        if length == 0:
+            return self._negative(0x34, NRC_UPLOAD_DOWNLOAD_NOT_ACCEPTED)
+        if offset < 0 or offset + length > self._config.memory_length:
+            return self._negative(0x34, NRC_REQUEST_OUT_OF_RANGE)
+        first_page = offset // FLASH_PAGE_SIZE
+        last_page = math.ceil((offset + length) / FLASH_PAGE_SIZE)
+        if not all(self._erased_pages[first_page:last_page]):
+            # Записывать можно только в стертые страницы
+            return self._negative(0x34, NRC_CONDITIONS_NOT_CORRECT)
+
+        self._download = {"address": address, "offset": offset, "length": length, "received": 0, "next_seq": 1}
+        max_block = self._config.max_block_length & 0xFFFFFFFF
+        # lengthFormatIdentifier 0x20: maxNumberOfBlockLength в двух байтах, больше 0xFFFF - в четырех
+        length_size = 2 if max_block <= 0xFFFF else 4
+        return bytes((0x74, length_size << 4)) + max_block.to_bytes(length_size, "big")
+
+    def _transfer_data(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self._negative(0x36, NRC_INCORRECT_LENGTH)
+        download = self._download
+        if download is None:
+            return self._negative(0x36, NRC_REQUEST_SEQUENCE_ERROR)
+        if len(request) > self._config.max_block_length:
+            return self._negative(0x36, NRC_INCORRECT_LENGTH)
+
+        seq = request[1]
+        if seq == (download["next_seq"] - 1) & 0xFF and download["received"] > 0:
+            # Повтор последнего блока: данные уже приняты
+            return bytes((0x76, seq))
+        if seq != download["next_seq"]:
+            return self._negative(0x36, NRC_WRONG_BLOCK_SEQUENCE_COUNTER)
+
+        chunk = request[2:]
+        if download["received"] + len(chunk) > download["length"]:
+            return self._negative(0x36, NRC_TRANSFER_DATA_SUSPENDED)
+        position = download["offset"] + download["received"]
+        end = position + len(chunk)
+        self._flash[position:end] = chunk
+        first_page = position // FLASH_PAGE_SIZE
+        last_page = math.ceil(end / FLASH_PAGE_SIZE)
+        self._erased_pages[first_page:last_page] = bytes(last_page - first_page)
+        self._image_end = max(self._image_end, end)
+        self.written_bytes += len(chunk)
+        download["received"] += len(chunk)
+        download["next_seq"] = (seq + 1) & 0xFF
+        return bytes((0x76, seq))
+
+    def _request_transfer_exit(self, request: bytes) -> bytes:
+        if self._download is None:
+            return self._negative(0x37, NRC_REQUEST_SEQUENCE_ERROR)
+        self._download = None
+        return bytes((0x77,))
+
+    _HANDLERS = {
+        0x10: _session_control,
+        0x11: _ecu_reset,
+        0x22: _read_data_by_id,
+        0x27: _security_access,
+        0x2E: _write_data_by_id,
+        0x31: _routine_control,
+        0x34: _request_download,
+        0x36: _transfer_data,
+        0x37: _request_transfer_exit,
+    }
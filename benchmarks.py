@@ -0,0 +1,279 @@
+"""Benchmarks and firmware tooling without QML.
+
+RX path throughput on a capture replay, collector polling, single-node and fleet
+flashing on the virtual bus, and the 1 KiB block diff of two BIN images.
+Results are written to the log; the exit code is non-zero if a run failed.
+"""
+
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, Qt, QTimer
+
+from app_can.CanBackends import add_virtual_bus_arguments, create_virtual_device
+from app_can.ReplayCanDevice import ReplayCanDevice
+from app_can.VirtualCanDevice import VirtualCanDevice
+from colors import RowColor
+from uds.bootloader import Bootloader
+from uds.firmware_cache import FIRMWARE_BLOCK_SIZE, FirmwareCache
+from uds.flash_orchestrator import FlashOrchestrator
+from uds.uds_identifiers import UdsIdentifiers
+from ui.qml.app_controller import AppController
+
+LOGGER = logging.getLogger(__name__)
+
+
+def run_firmware_diff(old_path: str, new_path: str) -> int:
+    cache = FirmwareCache()
+    try:
+        old, new = cache.load(old_path), cache.load(new_path)
+    except OSError as err:
+        LOGGER.error(f"Firmware diff: {err}")
+        return 2
+    changed = new.changed_blocks(old)
+    for image, path in ((old, old_path), (new, new_path)):
+        LOGGER.info(f"{path}: {len(image)} bytes, CRC32 0x{image.crc32:08X}, SHA-256 {image.sha256}, "
+                    f"{len(image.block_hashes)} blocks")
+    LOGGER.info(f"Changed {len(changed)} of {len(new.block_hashes)} blocks of {FIRMWARE_BLOCK_SIZE} bytes: "
+                f"{', '.join(str(index) for index in changed) or '-'}")
+    return 0
+
+
+def run_replay_benchmark(device: ReplayCanDevice) -> int:
+    app = QCoreApplication(sys.argv[:1])
+    controller = AppController()
+    started = time.perf_counter()
+
+    def on_finished(frames, _seconds):
+        # Measured here, after the GUI thread has consumed every delivered batch.
+        elapsed = time.perf_counter() - started
+        rate = frames / elapsed if elapsed > 0 else 0.0
+        LOGGER.info("Replay benchmark: %d frames in %.3f s (%.0f frames/s), dropped %d, journal rows %d",
+                    frames, elapsed, rate, device.rx_dropped, controller.canTrafficJournalCount)
+        LOGGER.info("Router: %s", device.router.route_stats())
+        device.disconnect_device()
+        app.quit()
+
+    device.signal_replay_finished.connect(on_finished)
+    device.connect_to(0)
+    device.start_trace(0, 0, False)
+    return app.exec()
+
+
+def run_virtual_collector_benchmark(device: VirtualCanDevice, seconds: float, adaptive: bool, bus_budget: int) -> int:
+    app = QCoreApplication(sys.argv[:1])
+    controller = AppController()
+    # The shortest intervals and the most concurrent requests the collector accepts.
+    controller.setCollectorPollIntervalMs("30")
+    controller.setCollectorCyclePauseMs("30")
+    controller.setCollectorMaxInFlight("64")
+    controller.setCollectorAdaptivePolling(adaptive)
+    controller.setCollectorBusBudgetFps(str(bus_budget))
+    device.connect_to(0)
+    device.start_trace(0, 0, False)
+    started = time.perf_counter()
+
+    def on_timeout():
+        elapsed = time.perf_counter() - started
+        stats = device.stats()
+        rate = stats["responses"] / elapsed if elapsed > 0 else 0.0
+        poll_stats = controller.collectorPollStats()
+        LOGGER.info("Collector benchmark: %d virtual ECUs, %d discovered, %d responses in %.1f s (%.1f responses/s)",
+                    stats["nodes"], len(controller.collectorNodes), stats["responses"], elapsed, rate)
+        LOGGER.info("Collector benchmark: %.1f changed values/s, %.1f polling frames/s, adaptive %s",
+                    poll_stats["changed_responses"] / elapsed, (stats["requests"] + stats["responses"]) / elapsed,
+                    poll_stats["adaptive"])
+        LOGGER.info("Virtual bus: %s", stats)
+        LOGGER.info("TX queue: %s", device.tx_stats())
+        device.disconnect_device()
+        app.quit()
+
+    QTimer.singleShot(int(seconds * 1000), on_timeout)
+    return app.exec()
+
+
+def with_changed_blocks(content: bytes, blocks: int) -> bytes:
+    """Copy of content with one byte changed in `blocks` 1 KiB blocks spread over the image."""
+    image = bytearray(content)
+    total = -(-len(image) // FIRMWARE_BLOCK_SIZE)
+    blocks = min(max(blocks, 0), total)
+    for index in range(blocks):
+        image[(index * total // blocks) * FIRMWARE_BLOCK_SIZE] ^= 0xFF
+    return bytes(image)
+
+
+def run_virtual_flash_benchmark(device: VirtualCanDevice, binary_content: bytes, delta_blocks: int = 0) -> int:
+    app = QCoreApplication(sys.argv[:1])
+    ecu = device.ecus[0]
+    UdsIdentifiers.set_src(ecu.source_address)
+    # Checkpoints and flashed-image records of a previous run must not leak into this one.
+    checkpoints = tempfile.TemporaryDirectory()
+    bootloader = Bootloader()
+    bootloader.set_checkpoint_directory(checkpoints.name)
+    images = [binary_content]
+    if delta_blocks > 0:
+        images.append(with_changed_blocks(binary_content, delta_blocks))
+    device.connect_to(0)
+    device.start_trace(0, 0, False)
+    result = {"success": True, "phase": 0, "started": 0.0, "transfer_started": 0.0, "written": 0}
+
+    def start_phase():
+        bootloader.set_firmware(images[result["phase"]])
+        bootloader.set_delta_flash(result["phase"] > 0)
+        result["started"] = time.perf_counter()
+        result["transfer_started"] = 0.0
+        result["written"] = ecu.written_bytes
+        if not bootloader.start():
+            result["success"] = False
+            app.quit()
+
+    def on_data_sent(_total_bytes):
+        if result["transfer_started"] == 0.0:
+            result["transfer_started"] = time.perf_counter()
+
+    def on_finished(success):
+        finished = time.perf_counter()
+        image = images[result["phase"]]
+        elapsed = finished - result["started"]
+        transfer_elapsed = finished - result["transfer_started"] if result["transfer_started"] else elapsed
+        written = ecu.written_bytes - result["written"]
+        result["success"] = result["success"] and bool(success) and ecu.image == image
+        LOGGER.info("Flash benchmark (%s): %d bytes in %.2f s (%.0f bytes/s), TransferData %.2f s, "
+                    "%d bytes written, image %s",
+                    "delta" if result["phase"] > 0 else "full", len(image), elapsed,
+                    len(image) / elapsed if elapsed > 0 else 0.0, transfer_elapsed, written,
+                    "matches" if ecu.image == image else "differs")
+        result["phase"] += 1
+        if result["phase"] < len(images) and result["success"]:
+            QTimer.singleShot(0, start_phase)
+            return
+        LOGGER.info("Virtual bus: %s", device.stats())
+        LOGGER.info("TX queue: %s", device.tx_stats())
+        device.disconnect_device()
+        app.quit()
+
+    def on_state(text, color):
+        # Retries, resumes and errors only; progress states would flood the log.
+        if color in (RowColor.yellow, RowColor.red):
+            LOGGER.warning("Bootloader: %s", text)
+
+    bootloader.signal_new_state.connect(on_state)
+    bootloader.signal_data_sent.connect(on_data_sent)
+    bootloader.signal_finished.connect(on_finished)
+    QTimer.singleShot(0, start_phase)
+    exit_code = app.exec()
+    checkpoints.cleanup()
+    return exit_code if result["success"] else 1
+
+
+def run_virtual_fleet_flash_benchmark(device: VirtualCanDevice, binary_content: bytes, max_parallel: int,
+                                      delta_blocks: int = 0) -> int:
+    app = QCoreApplication(sys.argv[:1])
+    device.connect_to(0)
+    device.start_trace(0, 0, False)
+    checkpoints = tempfile.TemporaryDirectory()
+    orchestrator = FlashOrchestrator(max_parallel=max_parallel, checkpoint_directory=checkpoints.name)
+    delta_orchestrator = FlashOrchestrator(client=orchestrator.client, max_parallel=max_parallel,
+                                           checkpoint_directory=checkpoints.name, delta=True)
+    images = [binary_content]
+    if delta_blocks > 0:
+        images.append(with_changed_blocks(binary_content, delta_blocks))
+    nodes = [ecu.source_address for ecu in device.ecus]
+    result = {"success": True, "phase": 0, "written": 0}
+
+    def start_phase():
+        result["written"] = device.stats()["written_bytes"]
+        (delta_orchestrator if result["phase"] > 0 else orchestrator).start(nodes, images[result["phase"]])
+
+    def on_finished(report):
+        image = images[result["phase"]]
+        mismatched = [ecu.source_address for ecu in device.ecus if ecu.image != image]
+        result["success"] = result["success"] and not report.failed and not mismatched
+        label = "delta" if result["phase"] > 0 else "full"
+        LOGGER.info("Fleet flash benchmark (%s): %s", label, report.summary())
+        LOGGER.info("Fleet flash benchmark (%s): %d nodes x %d bytes, %d at once, mean node time %.2f s, "
+                    "%d bytes written, images %s",
+                    label, len(report.nodes), report.image_size, max_parallel,
+                    sum(node.elapsed_s for node in report.nodes) / max(1, len(report.nodes)),
+                    device.stats()["written_bytes"] - result["written"],
+                    "match" if not mismatched else "differ: " + ", ".join(f"0x{sa:02X}" for sa in mismatched))
+        result["phase"] += 1
+        if result["phase"] < len(images) and result["success"]:
+            start_phase()
+            return
+        LOGGER.info("Virtual bus: %s", device.stats())
+        LOGGER.info("TX queue: %s (limit %.0f frames/s)", device.tx_stats(), device.tx_queue.rate_fps)
+        device.disconnect_device()
+        orchestrator.client.close()
+        app.quit()
+
+    # The report is emitted from the asyncio thread.
+    orchestrator.signal_finished.connect(on_finished, Qt.QueuedConnection)
+    delta_orchestrator.signal_finished.connect(on_finished, Qt.QueuedConnection)
+    start_phase()
+    exit_code = app.exec()
+    checkpoints.cleanup()
+    return exit_code if result["success"] else 1
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks and firmware diff without QML")
+    parser.add_argument("--replay", metavar="FILE", help="RX path throughput: replay a *.tccap capture at full speed")
+    add_virtual_bus_arguments(parser)
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="collector polling benchmark duration (default: 10)")
+    parser.add_argument("--adaptive", action="store_true", help="collector benchmark with adaptive polling")
+    parser.add_argument("--bus-budget", type=int, default=0, metavar="FPS",
+                        help="collector benchmark bus budget, frames/s (default: 0 = unlimited)")
+    parser.add_argument("--firmware", metavar="FILE",
+                        help="with --virtual-ecus: flash FILE into the first virtual ECU and report the time")
+    parser.add_argument("--flash-size", type=int, default=0, metavar="BYTES",
+                        help="with --virtual-ecus: flash a generated image of BYTES instead of --firmware")
+    parser.add_argument("--fleet", action="store_true", help="flash every virtual ECU in parallel")
+    parser.add_argument("--fleet-parallel", type=int, default=8, metavar="N",
+                        help="nodes flashed at once with --fleet (default: 8)")
+    parser.add_argument("--delta", type=int, default=0, metavar="BLOCKS",
+                        help="after the full flash, change BLOCKS 1 KiB blocks and flash again in delta mode")
+    parser.add_argument("--firmware-diff", nargs=2, metavar=("OLD", "NEW"),
+                        help="print the 1 KiB blocks that differ between two BIN images")
+    return parser.parse_args()
+
+
+def main() -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    arguments = parse_arguments()
+
+    if arguments.firmware_diff:
+        return run_firmware_diff(*arguments.firmware_diff)
+    if arguments.replay:
+        device = ReplayCanDevice(arguments.replay, speed=0.0)
+        device.activate()
+        return run_replay_benchmark(device)
+    if arguments.virtual_ecus <= 0:
+        LOGGER.error("Nothing to run: use --replay FILE, --virtual-ecus N or --firmware-diff OLD NEW")
+        return 2
+
+    device = create_virtual_device(arguments)
+    device.activate()
+    firmware = None
+    if arguments.flash_size > 0:
+        firmware = random.Random(0).randbytes(arguments.flash_size)
+    elif arguments.firmware:
+        firmware = Path(arguments.firmware).read_bytes()
+    if firmware is not None and arguments.fleet:
+        return run_virtual_fleet_flash_benchmark(device, firmware, arguments.fleet_parallel, arguments.delta)
+    if firmware is not None:
+        return run_virtual_flash_benchmark(device, firmware, arguments.delta)
+    return run_virtual_collector_benchmark(device, arguments.seconds, arguments.adaptive, arguments.bus_budget)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Headless collector: node discovery, UDS polling and CSV/capture writing without QML.
+
+Only QtCore is loaded (signals, timers and the event loop of the CAN device layer);
+no QGuiApplication, QML engine, journal model or trend views are created.
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanBackends import BACKENDS, create_can_device
+from app_can.CanFrame import CanFrame
+from j1939.j1939_decode_cache import J1939DecodeCache
+from uds.data_identifiers import UdsData
+from uds.services.read_data_by_id import ServiceReadDataById
+from ui.qml.app_controller_parts import AppControllerCanTrafficMixin, AppControllerCollectorMixin
+from ui.qml.collector_poll_scheduler import CollectorPollScheduler
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CollectorDaemon(QObject, AppControllerCanTrafficMixin, AppControllerCollectorMixin):
+    """
+    Collector without UI: reuses the collector mixin for discovery, polling and CSV,
+    and the traffic mixin only for RX/TX wall-clock time conversion.
+    View updates and trend history are disabled.
+    """
+
+    def __init__(self,
+                 device: BaseCanDevice,
+                 output_directory: Path,
+                 poll_interval_ms: int = 1000,
+                 cycle_pause_ms: int = 1000,
+                 max_in_flight: int = 8,
+                 adaptive: bool = False,
+                 bus_budget_fps: float = 0.0,
+                 capture: bool = False,
+                 status_interval_s: float = 60.0):
+        super().__init__()
+        self._can = device
+        self._capture_enabled = bool(capture)
+
+        self._collector_read_service = ServiceReadDataById()
+        self._collector_read_service.set_byte_order("big")
+        self._collector_nodes: dict[int, dict[str, object]] = {}
+        self._collector_node_order: list[int] = []
+        self._collector_poll_vars = [UdsData.curr_fuel_tank, UdsData.raw_fuel_level, UdsData.raw_temperature]
+        self._collector_poll_interval_ms = max(1, int(poll_interval_ms))
+        self._collector_cycle_pause_ms = max(1, int(cycle_pause_ms))
+        self._collector_poll_scheduler = CollectorPollScheduler(
+            self._collector_poll_vars,
+            max_in_flight=max_in_flight,
+            poll_interval_s=self._collector_poll_interval_ms / 1000.0,
+            cycle_pause_s=self._collector_cycle_pause_ms / 1000.0,
+            adaptive=adaptive,
+            bus_budget_fps=bus_budget_fps,
+        )
+        self._collector_state = "stopped"
+        self._collector_output_directory = str(output_directory)
+        self._collector_session_dir: Path | None = None
+        self._collector_csv_managers = {}
+        self._collector_trend_points_by_node: dict[int, list[dict[str, object]]] = {}
+        self._source_address_busy = False
+
+        self._j1939_decode_cache = J1939DecodeCache(max_size=1024)
+        self._perf_origin = time.perf_counter()
+        self._wall_origin = time.time()
+        self._rx_time_anchor_raw: float | None = None
+        self._rx_time_anchor_wall: float | None = None
+        self._wall_second_cached = -1
+        self._wall_second_text = ""
+
+        self._responses = 0
+        self._last_status_responses = 0
+        self._last_status_time = time.perf_counter()
+
+        # Every RX frame is used for discovery, diagnostic (PF=0xDA) frames for polling answers.
+        self._discovery_route = device.router.add_catch_all(self._on_discovery_frames, "discovery")
+        self._collector_route = device.router.add_masked(
+            0x00DA0000, 0x00FF0000, self._on_collector_frames, "collector"
+        )
+
+        self._collector_poll_timer = QTimer(self)
+        self._collector_poll_timer.setInterval(20)
+        self._collector_poll_timer.timeout.connect(self._on_collector_poll_tick)
+
+        self._status_timer = QTimer(self)
+        self._status_timer.setInterval(int(max(status_interval_s, 1.0) * 1000))
+        self._status_timer.timeout.connect(self._log_status)
+
+    @property
+    def nodes_count(self) -> int:
+        return len(self._collector_node_order)
+
+    @property
+    def responses(self) -> int:
+        return self._responses
+
+    @property
+    def session_directory(self) -> Path | None:
+        return self._collector_session_dir
+
+    def start(self, device_index: int, channel: int, baud_rate: int, terminator: bool) -> bool:
+        handle = self._can.connect_to(device_index)
+        if handle is None or getattr(handle, "value", 0) == 0:
+            LOGGER.error("Failed to connect to CAN device %d", device_index)
+            return False
+
+        base_dir = Path(self._collector_output_directory)
+        self._collector_session_dir = base_dir / datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self._collector_session_dir.mkdir(parents=True, exist_ok=True)
+        self._collector_state = "recording"
+
+        if self._capture_enabled:
+            capture_path = self._collector_session_dir / datetime.now().strftime("can_%Y%m%d_%H%M%S.tccap")
+            self._can.start_capture(str(capture_path))
+            LOGGER.info("CAN capture: %s", capture_path)
+
+        self._can.start_trace(channel, baud_rate, terminator)
+        if not self._can.is_trace:
+            LOGGER.error("Failed to start CAN trace")
+            return False
+
+        self._collector_poll_timer.start()
+        self._status_timer.start()
+        LOGGER.info("Collector session: %s", self._collector_session_dir)
+        return True
+
+    def stop(self):
+        self._collector_poll_timer.stop()
+        self._status_timer.stop()
+        if self._collector_state == "stopped":
+            return
+        self._collector_state = "stopped"
+        self._can.stop_capture()
+        if self._can.is_trace:
+            self._can.stop_trace()
+        if self._can.is_connect:
+            self._can.disconnect_device()
+        self._log_status()
+
+    def _on_discovery_frames(self, frames: list[CanFrame]):
+        for frame in frames:
+            if frame.is_tx:
+                continue
+            wall_time_us = self._can_wall_time_us(frame.timestamp_us, "RX")
+            self._track_collector_node(wall_time_us, self._j1939_decode_cache.get(frame.identifier))
+
+    def _handle_collector_frame(self, timestamp, parsed_id, payload):
+        if len(payload) >= 2 and (payload[1] & 0xFF) == self._collector_read_service.success_sid:
+            self._responses += 1
+        super()._handle_collector_frame(timestamp, parsed_id, payload)
+
+    # No views and no trend history in headless mode.
+    def _schedule_collector_views_update(self, *, nodes: bool = False, trend: bool = False):
+        return
+
+    def _append_collector_trend_sample(self, node_sa: int, node: dict[str, object], timestamp: str):
+        return
+
+    def _log_status(self):
+        now = time.perf_counter()
+        elapsed = now - self._last_status_time
+        rate = (self._responses - self._last_status_responses) / elapsed if elapsed > 0 else 0.0
+        self._last_status_time = now
+        self._last_status_responses = self._responses
+        scheduler = self._collector_poll_scheduler
+        LOGGER.info("Collector: %d nodes, %d responses (%.1f/s), %d changed values, %d timeouts, "
+                    "latency %.1f ms, RX dropped %d",
+                    self.nodes_count, self._responses, rate, scheduler.changed_responses, scheduler.timeouts,
+                    scheduler.mean_latency_s * 1000.0, self._can.rx_dropped)
+        if self._can.tx_queue is not None:
+            LOGGER.info("TX queue: %s", self._can.tx_stats())
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Headless CAN/UDS collector")
+    parser.add_argument("--backend", choices=BACKENDS, default="tscan", help="CAN backend (default: tscan)")
+    parser.add_argument("--can-interface", metavar="IFACE", help="SocketCAN interface, e.g. can0")
+    parser.add_argument("--virtual-ecus", type=int, default=0, metavar="N",
+                        help="collect from N simulated ECUs on a virtual bus instead of --backend")
+    parser.add_argument("--device-index", type=int, default=0, help="adapter index (default: 0)")
+    parser.add_argument("--channel", type=int, default=0, help="adapter channel (default: 0)")
+    parser.add_argument("--baud-rate", type=int, default=500, help="bus speed, kbit/s (default: 500)")
+    parser.add_argument("--terminator", action="store_true", help="enable the adapter 120 Ohm terminator")
+    parser.add_argument("--output", default="logs", help="CSV output directory (default: logs)")
+    parser.add_argument("--poll-interval-ms", type=int, default=1000, help="pause between DID requests")
+    parser.add_argument("--cycle-pause-ms", type=int, default=1000, help="pause after a node is polled")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="nodes polled at once (default: 8)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="poll each node/DID faster while it changes and slower while it is static")
+    parser.add_argument("--bus-budget-fps", type=float, default=0.0,
+                        help="bus frames/s the polling may use, requests and answers (default: 0 = unlimited)")
+    parser.add_argument("--capture", action="store_true", help="also write raw traffic to a *.tccap file")
+    parser.add_argument("--status-interval", type=float, default=60.0, help="status log period, s (default: 60)")
+    parser.add_argument("--duration", type=float, default=0.0, help="stop after N seconds, 0 = run until signal")
+    return parser.parse_args()
+
+
+def main() -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    arguments = parse_arguments()
+
+    if arguments.virtual_ecus > 0:
+        from app_can.VirtualCanDevice import VirtualCanDevice
+        device = VirtualCanDevice(arguments.virtual_ecus)
+    else:
+        try:
+            device = create_can_device(arguments.backend, arguments.can_interface)
+        except Exception as err:
+            LOGGER.error("CAN backend %s: %s", arguments.backend, err)
+            return 2
+    device.activate()
+
+    app = QCoreApplication(sys.argv[:1])
+    daemon = CollectorDaemon(device,
+                             Path(arguments.output).expanduser(),
+                             poll_interval_ms=arguments.poll_interval_ms,
+                             cycle_pause_ms=arguments.cycle_pause_ms,
+                             max_in_flight=arguments.max_in_flight,
+                             adaptive=arguments.adaptive,
+                             bus_budget_fps=arguments.bus_budget_fps,
+                             capture=arguments.capture,
+                             status_interval_s=arguments.status_interval)
+    app.aboutToQuit.connect(daemon.stop)
+
+    if device.get_devices().value <= arguments.device_index:
+        LOGGER.error("CAN device %d not found", arguments.device_index)
+        return 1
+    if not daemon.start(arguments.device_index, arguments.channel, arguments.baud_rate, arguments.terminator):
+        return 1
+
+    # Python signal handlers run only when control returns to the interpreter.
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    wakeup_timer = QTimer()
+    wakeup_timer.timeout.connect(lambda: None)
+    wakeup_timer.start(200)
+
+    if arguments.duration > 0:
+        QTimer.singleShot(int(arguments.duration * 1000), app.quit)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
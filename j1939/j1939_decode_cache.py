@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class J1939DecodedId(NamedTuple):
+    """
+    Разобранный 29-битный идентификатор с готовыми строками для отображения
+    """
+    identifier: int
+    priority: int
+    pgn: int
+    src: int
+    dst: int
+    is_pdu1: bool
+    pgn_text: str
+    src_text: str
+    dst_text: str
+    is_uds_diagnostic: bool
+
+
+class J1939DecodeCache:
+    """
+    Ограниченный LRU-кэш разбора J1939 идентификаторов.
+
+    На шине обычно несколько сотен различных идентификаторов,
+    поэтому разбор и форматирование выполняются один раз на идентификатор.
+    """
+
+    __slots__ = ['_max_size', '_entries', '_hits', '_misses', '_evictions']
+
+    def __init__(self, max_size: int = 1024):
+        self._max_size = max(int(max_size), 1)
+        self._entries: OrderedDict[int, J1939DecodedId] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def decode(identifier: int) -> J1939DecodedId:
+        identifier = int(identifier) & 0x1FFFFFFF
+        priority = (identifier >> 26) & 0x7  # 3 bits
+        pgn = (identifier >> 8) & 0x3FFFF  # 18 bits
+        src = identifier & 0xFF  # 8 bits
+        dst = pgn & 0xFF
+        pdu_format = (pgn >> 8) & 0xFF
+        return J1939DecodedId(
+            identifier=identifier,
+            priority=priority,
+            pgn=pgn,
+            src=src,
+            dst=dst,
+            is_pdu1=pdu_format < 0xF0,
+            pgn_text=f"0x{pgn & 0xFFFF:04X}",
+            src_text=f"0x{src:02X}",
+            dst_text=f"0x{dst:02X}",
+            is_uds_diagnostic=pdu_format == 0xDA,
+        )
+
+    def get(self, identifier: int) -> J1939DecodedId:
+        entries = self._entries
+        entry = entries.get(identifier)
+        if entry is not None:
+            self._hits += 1
+            entries.move_to_end(identifier)
+            return entry
+
+        self._misses += 1
+        entry = self.decode(identifier)
+        entries[identifier] = entry
+        if len(entries) > self._max_size:
+            entries.popitem(last=False)
+            self._evictions += 1
+        return entry
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, size: int):
+        self._max_size = max(int(size), 1)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total > 0 else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": len(self._entries),
+            "maxSize": self._max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hitRatio": self.hit_ratio,
+        }
+
+    def reset_stats(self):
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def clear(self):
+        self._entries.clear()
+        self.reset_stats()
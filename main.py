@@ -1,4 +1,5 @@
-﻿import logging
+﻿import argparse
+import logging
 import sys
 from pathlib import Path
 
@@ -7,8 +8,27 @@ from PySide6.QtGui import QGuiApplication
 from PySide6.QtQml import QQmlApplicationEngine
 from PySide6.QtQuickControls2 import QQuickStyle
 
+from app_can.CanBackends import BACKENDS, add_virtual_bus_arguments, create_can_device, create_virtual_device
+from app_can.ReplayCanDevice import ReplayCanDevice
 from ui.qml.app_controller import AppController
 
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(add_help=True)
+    parser.add_argument("--backend", choices=BACKENDS, default="tscan",
+                        help="CAN backend: TOSUN adapter, Linux SocketCAN or in-process loopback (default: tscan)")
+    parser.add_argument("--can-interface", metavar="IFACE",
+                        help="SocketCAN interface, e.g. can0 or vcan0 (default: every CAN interface is listed)")
+    parser.add_argument("--replay", metavar="FILE", help="replay a *.tccap capture instead of the TSCAN adapter")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay rate multiplier, 0 = as fast as possible (default: 1.0)")
+    parser.add_argument("--replay-loop", action="store_true", help="restart the capture when it ends")
+    add_virtual_bus_arguments(parser)
+    # Unknown arguments are left to Qt.
+    return parser.parse_known_args()
+
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -16,14 +36,28 @@ if __name__ == "__main__":
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
 
+    arguments, qt_arguments = parse_arguments()
+    if arguments.replay:
+        ReplayCanDevice(arguments.replay, speed=arguments.replay_speed, loop=arguments.replay_loop).activate()
+    elif arguments.virtual_ecus > 0:
+        create_virtual_device(arguments).activate()
+    elif arguments.backend != "tscan":
+        try:
+            create_can_device(arguments.backend, arguments.can_interface).activate()
+        except Exception as err:
+            LOGGER.error("CAN backend %s: %s", arguments.backend, err)
+            sys.exit(2)
+
     # Use non-native style to allow full customization of Qt Quick Controls.
     QQuickStyle.setStyle("Fusion")
     QQuickStyle.setFallbackStyle("Basic")
 
-    app = QGuiApplication(sys.argv)
+    app = QGuiApplication(sys.argv[:1] + qt_arguments)
 
     engine = QQmlApplicationEngine()
     controller = AppController()
+    # Flush the last block of an active CAN capture before exit.
+    app.aboutToQuit.connect(controller.stopCanCapture)
     engine.rootContext().setContextProperty("appController", controller)
 
     if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
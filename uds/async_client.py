@@ -0,0 +1,362 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanFrame import CanFrame
+from app_can.TxQueue import TxPriority
+from uds.data_identifiers import UdsVar
+from uds.isotp import (FC_CONTINUE_TO_SEND, FC_OVERFLOW, ISOTP_CONSECUTIVE, ISOTP_FIRST, ISOTP_FLOW_CONTROL,
+                       ISOTP_SINGLE, PAD_BYTE, decode_st_min, first_frame_pci)
+from uds.services.session import Session
+from uds.uds_identifiers import UdsIdentifiers
+
+LOGGER = logging.getLogger(__name__)
+
+NRC_RESPONSE_PENDING = 0x78
+
+
+class UdsError(Exception):
+    """Ошибка выполнения запроса UDS."""
+
+
+class UdsTimeoutError(UdsError, TimeoutError):
+    def __init__(self, node_sa: int, sid: int):
+        super().__init__(f"Таймаут ответа узла 0x{node_sa:02X} на SID 0x{sid:02X}")
+        self.node_sa = node_sa
+        self.sid = sid
+
+
+class UdsNegativeResponseError(UdsError):
+    def __init__(self, node_sa: int, sid: int, nrc: int):
+        super().__init__(f"Узел 0x{node_sa:02X}: NRC 0x{nrc:02X} на SID 0x{sid:02X}")
+        self.node_sa = node_sa
+        self.sid = sid
+        self.nrc = nrc
+
+
+@dataclass
+class _Transaction:
+    """Запрос к одному узлу, ожидающий ответа."""
+
+    sid: int
+    future: asyncio.Future
+    deadline: float
+    flow_control: asyncio.Future | None = None
+    rx_buffer: bytearray = field(default_factory=bytearray)
+    rx_length: int = 0
+    rx_next_sn: int = 0
+
+
+class AsyncUdsClient:
+    """
+    Клиент UDS на asyncio: запрос возвращает расшифрованный ответ
+    или бросает UdsNegativeResponseError / UdsTimeoutError.
+
+    К каждому узлу в полете не больше одного запроса (так требует UDS),
+    запросы к разным узлам выполняются одновременно: ответы различаются
+    по SA отправителя. Многокадровые запросы и ответы собираются по ISO-TP,
+    NRC 0x78 продлевает ожидание до p2_star_s.
+
+    Кадры приходят из router в GUI-потоке и передаются в цикл asyncio
+    через call_soon_threadsafe, поэтому цикл может работать как в том же
+    потоке (QtAsyncio), так и в отдельном (start_thread/submit).
+    """
+
+    def __init__(self,
+                 device: BaseCanDevice | None = None,
+                 tester_address: int | None = None,
+                 byte_order: str = "big",
+                 timeout_s: float = 1.0,
+                 p2_star_s: float = 5.0,
+                 priority: TxPriority = TxPriority.DIAGNOSTIC):
+        self._device = device if device is not None else BaseCanDevice.active()
+        self._tester = (int(UdsIdentifiers.tx.src) if tester_address is None else int(tester_address)) & 0xFF
+        order = str(byte_order).strip().lower()
+        self._byte_order = order if order in ("big", "little") else "big"
+        self._timeout_s = float(timeout_s)
+        self._p2_star_s = float(p2_star_s)
+        self._priority = priority
+
+        # Приоритет и PF берутся из текущих идентификаторов UDS
+        self._tx_base = UdsIdentifiers.tx.identifier & 0x1FFF0000
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._own_thread: threading.Thread | None = None
+        self._transactions: dict[int, _Transaction] = {}
+        self._node_locks: dict[int, asyncio.Lock] = {}
+
+        # Все диагностические кадры, адресованные тестеру, от любого узла
+        self._route = self._device.router.add_masked(
+            0x00DA0000 | (self._tester << 8), 0x00FFFF00, self._on_router_frames, "uds-async"
+        )
+
+    @property
+    def device(self) -> BaseCanDevice:
+        return self._device
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        return self._loop
+
+    @property
+    def tester_address(self) -> int:
+        return self._tester
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._transactions)
+
+    def attach(self, loop: asyncio.AbstractEventLoop | None = None) -> asyncio.AbstractEventLoop:
+        """Привязка к циклу asyncio; без аргумента - к текущему работающему."""
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+        return self._loop
+
+    def start_thread(self) -> asyncio.AbstractEventLoop:
+        """Запускает собственный цикл asyncio в отдельном потоке."""
+        if self._own_thread is not None:
+            return self._loop
+        loop = asyncio.new_event_loop()
+        self._own_thread = threading.Thread(target=loop.run_forever, name="UdsAsyncLoop", daemon=True)
+        self._own_thread.start()
+        return self.attach(loop)
+
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """Выполняет корутину в цикле клиента из любого потока (например, из GUI)."""
+        if self._loop is None:
+            self.start_thread()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def close(self):
+        self._device.router.remove(self._route)
+        if self._own_thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._own_thread.join(timeout=2.0)
+            self._own_thread = None
+            self._loop.close()
+            self._loop = None
+
+    def tx_identifier(self, node_sa: int) -> int:
+        return self._tx_base | ((int(node_sa) & 0xFF) << 8) | self._tester
+
+    # Сервисы
+
+    async def read_did(self, node_sa: int, var: UdsVar, timeout: float | None = None) -> int | bytes:
+        """ReadDataByIdentifier: значение младшим байтом вперед (как parse_data_field), длиннее 4 байт - bytes."""
+        response = await self.request(node_sa, bytes((0x22,)) + self._did_bytes(var.pid), timeout)
+        if self._parse_did(response) != var.pid:
+            raise UdsError(f"Узел 0x{node_sa:02X}: ответ на DID 0x{self._parse_did(response):04X} "
+                           f"вместо 0x{var.pid:04X}")
+        data = response[3:]
+        if var.size > 4:
+            return bytes(data)
+        return int.from_bytes(data, "little")
+
+    async def write_did(self, node_sa: int, var: UdsVar, value: int | bytes, timeout: float | None = None):
+        if isinstance(value, (bytes, bytearray)):
+            data = bytes(value)
+        else:
+            data = (int(value) & ((1 << (8 * var.size)) - 1)).to_bytes(var.size, "little")
+        await self.request(node_sa, bytes((0x2E,)) + self._did_bytes(var.pid) + data, timeout)
+
+    async def diagnostic_session(self, node_sa: int, session: Session, timeout: float | None = None) -> bytes:
+        return await self.request(node_sa, bytes((0x10, int(session))), timeout)
+
+    async def ecu_reset(self, node_sa: int, reset_type: int, timeout: float | None = None) -> bytes:
+        return await self.request(node_sa, bytes((0x11, int(reset_type) & 0xFF)), timeout)
+
+    async def security_access(self, node_sa: int, timeout: float | None = None):
+        """Seed/key по алгоритму ServiceSecurityAccess."""
+        response = await self.request(node_sa, bytes((0x27, 0x01)), timeout)
+        if len(response) < 4:
+            raise UdsError(f"Узел 0x{node_sa:02X}: короткий ответ seed")
+        seed = (response[3] << 8) | response[2]
+        if seed == 0:
+            # Нулевой seed - доступ уже открыт
+            return
+        key = ((seed ^ 0xAA55) | seed) & 0xFFFF
+        await self.request(node_sa, bytes((0x27, 0x02, key >> 8, key & 0xFF)), timeout)
+
+    async def erase_memory(self, node_sa: int, address: int | None = None, length: int | None = None,
+                           timeout: float | None = None) -> bytes:
+        """Erase Memory: без адреса - вся область программы, иначе только [address, address + length)."""
+        # Идентификатор рутины 0xFF00 передается как 0xFF, 0x00 (ServiceRoutineControl)
+        payload = bytes((0x31, 0x01, 0xFF, 0x00))
+        if address is not None:
+            payload += (bytes((0x44,))
+                        + (int(address) & 0xFFFFFFFF).to_bytes(4, self._byte_order)
+                        + (int(length) & 0xFFFFFFFF).to_bytes(4, self._byte_order))
+        return await self.request(node_sa, payload, timeout)
+
+    async def request_download(self, node_sa: int, address: int, length: int, timeout: float | None = None) -> int:
+        """RequestDownload; возвращает maxNumberOfBlockLength из ответа ЭБУ."""
+        payload = (bytes((0x34, 0x00, 0x44))
+                   + (int(address) & 0xFFFFFFFF).to_bytes(4, self._byte_order)
+                   + (int(length) & 0xFFFFFFFF).to_bytes(4, self._byte_order))
+        response = await self.request(node_sa, payload, timeout)
+        length_size = (response[1] >> 4) if len(response) > 1 else 0
+        if length_size == 0 or len(response) < 2 + length_size:
+            raise UdsError(f"Узел 0x{node_sa:02X}: нет maxNumberOfBlockLength в ответе RequestDownload")
+        return int.from_bytes(response[2:2 + length_size], "big")
+
+    async def transfer_data(self, node_sa: int, block_sequence: int, data: bytes,
+                            timeout: float | None = None) -> bytes:
+        return await self.request(node_sa, bytes((0x36, block_sequence & 0xFF)) + bytes(data), timeout)
+
+    async def request_transfer_exit(self, node_sa: int, timeout: float | None = None) -> bytes:
+        return await self.request(node_sa, bytes((0x37,)), timeout)
+
+    # Транспорт
+
+    async def request(self, node_sa: int, payload: bytes, timeout: float | None = None) -> bytes:
+        """Отправляет запрос и ждет положительный ответ (SID + 0x40), возвращает его целиком."""
+        if self._loop is None:
+            self.attach()
+        node_sa = int(node_sa) & 0xFF
+        lock = self._node_locks.get(node_sa)
+        if lock is None:
+            lock = self._node_locks[node_sa] = asyncio.Lock()
+
+        async with lock:
+            loop = self._loop
+            timeout_s = self._timeout_s if timeout is None else float(timeout)
+            transaction = _Transaction(sid=payload[0], future=loop.create_future(),
+                                       deadline=loop.time() + timeout_s)
+            self._transactions[node_sa] = transaction
+            try:
+                await self._send_payload(node_sa, transaction, bytes(payload), timeout_s)
+                transaction.deadline = loop.time() + timeout_s
+                while not transaction.future.done():
+                    remaining = transaction.deadline - loop.time()
+                    if remaining <= 0:
+                        raise UdsTimeoutError(node_sa, transaction.sid)
+                    await asyncio.wait((transaction.future,), timeout=remaining)
+                return transaction.future.result()
+            finally:
+                self._transactions.pop(node_sa, None)
+
+    async def _send_payload(self, node_sa: int, transaction: _Transaction, payload: bytes, timeout_s: float):
+        identifier = self.tx_identifier(node_sa)
+        if len(payload) <= 7:
+            self._send_frame(identifier, bytes((len(payload),)) + payload)
+            return
+
+        # До 4095 байт 12-битная длина, иначе escape-последовательность FF с 32-битной
+        pci = first_frame_pci(len(payload))
+        offset = 8 - len(pci)
+        first = pci + payload[:offset]
+
+        sn = 1
+        while True:
+            block_size, st_min = await self._await_flow_control(node_sa, transaction, first, identifier, timeout_s)
+            first = None
+            # Серия до следующего Flow Control; STmin выдерживает поток передачи устройства
+            frames = []
+            while offset < len(payload) and not (block_size and len(frames) >= block_size):
+                frames.append((identifier, 8, self._pad(bytes((0x20 | sn,)) + payload[offset:offset + 7])))
+                offset += 7
+                sn = (sn + 1) & 0x0F
+            self._device.send_burst(frames, st_min, self._priority)
+            if offset >= len(payload):
+                return
+
+    async def _await_flow_control(self, node_sa: int, transaction: _Transaction, first: bytes | None,
+                                  identifier: int, timeout_s: float) -> tuple[int, float]:
+        while True:
+            transaction.flow_control = self._loop.create_future()
+            if first is not None:
+                self._send_frame(identifier, first)
+                first = None
+            try:
+                data = await asyncio.wait_for(transaction.flow_control, timeout_s)
+            except asyncio.TimeoutError:
+                raise UdsTimeoutError(node_sa, transaction.sid) from None
+            finally:
+                transaction.flow_control = None
+
+            status = data[0] & 0x0F
+            if status == FC_CONTINUE_TO_SEND:
+                return data[1], decode_st_min(data[2])
+            if status == FC_OVERFLOW:
+                raise UdsError(f"Узел 0x{node_sa:02X}: переполнение буфера приема (Flow Control overflow)")
+            # FC_WAIT: ждем следующий Flow Control
+
+    def _send_frame(self, identifier: int, frame: bytes):
+        self._device.send_async(identifier, 8, self._pad(frame), self._priority)
+
+    @staticmethod
+    def _pad(frame: bytes) -> list[int]:
+        return list(frame) + [PAD_BYTE] * (8 - len(frame))
+
+    def _did_bytes(self, pid: int) -> bytes:
+        return (int(pid) & 0xFFFF).to_bytes(2, self._byte_order)
+
+    def _parse_did(self, response: bytes) -> int:
+        if len(response) < 3:
+            return -1
+        return int.from_bytes(response[1:3], self._byte_order)
+
+    # Прием
+
+    def _on_router_frames(self, frames: list[CanFrame]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._on_frames, frames)
+
+    def _on_frames(self, frames: list[CanFrame]):
+        for frame in frames:
+            if frame.is_tx:
+                continue
+            transaction = self._transactions.get(frame.identifier & 0xFF)
+            if transaction is None or transaction.future.done():
+                continue
+            self._on_frame(frame.identifier & 0xFF, transaction, frame.payload)
+
+    def _on_frame(self, node_sa: int, transaction: _Transaction, data: bytes):
+        if not data:
+            return
+        frame_type = data[0] >> 4
+
+        if frame_type == ISOTP_SINGLE:
+            length = data[0] & 0x0F
+            if 0 < length <= len(data) - 1:
+                self._on_response(node_sa, transaction, bytes(data[1:1 + length]))
+
+        elif frame_type == ISOTP_FIRST:
+            if len(data) < 2:
+                return
+            length = ((data[0] & 0x0F) << 8) | data[1]
+            offset = 2
+            if length == 0 and len(data) >= 6:
+                length = int.from_bytes(data[2:6], "big")
+                offset = 6
+            transaction.rx_buffer = bytearray(data[offset:])
+            transaction.rx_length = length
+            transaction.rx_next_sn = 1
+            # Принимаем без ограничения блока и паузы
+            self._send_frame(self.tx_identifier(node_sa), bytes((0x30, 0x00, 0x00)))
+
+        elif frame_type == ISOTP_CONSECUTIVE:
+            if transaction.rx_length == 0 or (data[0] & 0x0F) != transaction.rx_next_sn:
+                return
+            transaction.rx_next_sn = (transaction.rx_next_sn + 1) & 0x0F
+            transaction.rx_buffer += data[1:]
+            if len(transaction.rx_buffer) >= transaction.rx_length:
+                response = bytes(transaction.rx_buffer[:transaction.rx_length])
+                transaction.rx_length = 0
+                self._on_response(node_sa, transaction, response)
+
+        elif frame_type == ISOTP_FLOW_CONTROL:
+            if transaction.flow_control is not None and not transaction.flow_control.done():
+                transaction.flow_control.set_result(bytes(data[:3]))
+
+    def _on_response(self, node_sa: int, transaction: _Transaction, response: bytes):
+        if response[0] == 0x7F and len(response) >= 3 and response[1] == transaction.sid:
+            if response[2] == NRC_RESPONSE_PENDING:
+                transaction.deadline = self._loop.time() + self._p2_star_s
+                return
+            transaction.future.set_exception(UdsNegativeResponseError(node_sa, transaction.sid, response[2]))
+        elif response[0] == transaction.sid + 0x40:
+            transaction.future.set_result(response)
@@ -2,10 +2,13 @@ import enum
 
 from PySide6.QtCore import Slot, Signal, QObject, QTimer
 
-from app_can.BaseTranslator import BaseTranslator
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanFrame import CanFrame
 from colors import RowColor
 from uds.data_identifiers import UdsData
+from uds.firmware_cache import FirmwareImage
+from uds.flash_checkpoint import FlashCheckpointStore
+from uds.flash_regions import FlashRegion, delta_regions, full_region
 from uds.services.ecu_reset import ServiceEcuReset
 from uds.services.read_data_by_id import ServiceReadDataById
 from uds.services.request_download import ServiceRequestDownload
@@ -50,8 +53,43 @@ class BootloaderState(enum.IntEnum):
     WRITE_CAN_SOURCE_ADDRESS = 17
     READ_CAN_SOURCE_ADDRESS = 18
 
+    ERASE_REGION = 19
+    ERASE_REGION_CONSECUTIVE = 20
+
 
 class Bootloader(QObject):
+    # Интервал доставки RX на время прошивки: каждый flow control задерживает
+    # следующую серию CF, обычных 20 мс на блок слишком много
+    TRANSFER_RX_BATCH_INTERVAL_S = 0.001
+
+    # Нет ответа ЭБУ во время TransferData дольше этого (N_Bs ISO-TP, NRC 0x78 продлевает) -
+    # продолжаем с последнего подтвержденного блока
+    TRANSFER_TIMEOUT_MS = 1000
+    # Ответа на запросы подготовки (сессия, доступ, стирание) ждем до P2*
+    SETUP_TIMEOUT_MS = 5000
+    # Подряд неудачных продолжений до полного перезапуска и полных перезапусков до ошибки
+    MAX_RESUME_ATTEMPTS = 3
+    MAX_FULL_RESTARTS = 1
+
+    SETUP_STATES = (BootloaderState.SET_PROGRAMMING_SESSION,
+                    BootloaderState.REQUEST_SEED,
+                    BootloaderState.SEED_VERIFICATION,
+                    BootloaderState.WRITE_FINGERPRINT,
+                    BootloaderState.ERASE_FIRMWARE,
+                    BootloaderState.ERASE_REGION,
+                    BootloaderState.ERASE_REGION_CONSECUTIVE,
+                    BootloaderState.REQUEST_DOWNLOAD,
+                    BootloaderState.REQUEST_DOWNLOAD_CONSECUTIVE)
+    # Стирание и RequestDownload повторяемы: без ответа участок начинается заново в той же сессии
+    DOWNLOAD_SETUP_STATES = (BootloaderState.ERASE_FIRMWARE,
+                             BootloaderState.ERASE_REGION,
+                             BootloaderState.ERASE_REGION_CONSECUTIVE,
+                             BootloaderState.REQUEST_DOWNLOAD,
+                             BootloaderState.REQUEST_DOWNLOAD_CONSECUTIVE)
+    TRANSFER_STATES = (BootloaderState.TRANSFER_DATA_FF,
+                       BootloaderState.TRANSFER_DATA_CF,
+                       BootloaderState.REQUEST_TRANSFER_EXIT)
+
     signal_new_state = Signal(str, RowColor)
     signal_data_sent = Signal(int)
     signal_finished = Signal(bool)
@@ -64,6 +102,7 @@ class Bootloader(QObject):
         self._state: BootloaderState = BootloaderState.READY
 
         self._binary_content = None
+        self._firmware: FirmwareImage | None = None
         self._transfer_byte_order = "big"
         self._pending_source_address: int | None = None
         self._pending_rx_identifier: int | None = None
@@ -78,6 +117,7 @@ class Bootloader(QObject):
         self._service_ecu_reset = ServiceEcuReset()
         self._service_read_data_by_id = ServiceReadDataById()
         self._service_request_download.set_byte_order(self._transfer_byte_order)
+        self._service_routine_control.set_byte_order(self._transfer_byte_order)
         self._service_read_data_by_id.set_byte_order(self._transfer_byte_order)
         self._service_write_data_by_id.set_byte_order(self._transfer_byte_order)
 
@@ -88,22 +128,85 @@ class Bootloader(QObject):
 
         self._service_transfer_data.signal_data_sent.connect(self._handle_data_sent)
 
-        CanDevice.instance().signal_new_message.connect(self.on_new_message)
+        # Контрольные точки: последний блок, подтвержденный 0x76, по каждому SA
+        self._checkpoints = FlashCheckpointStore()
+        self._acked_block_index = -1
+        self._resume_attempts = 0
+        self._full_restarts = 0
+        self._resuming = False
+
+        # Участки загрузки сессии: один на весь образ или измененные участки при дельта-прошивке
+        self._delta_enabled = False
+        self._delta = False
+        self._regions: list[FlashRegion] = []
+        self._region_index = 0
+
+        self._transfer_timeout_timer = QTimer(self)
+        self._transfer_timeout_timer.setSingleShot(True)
+        self._transfer_timeout_timer.timeout.connect(self._on_transfer_timeout)
+
+        # Загрузчик получает только кадры с UdsIdentifiers.rx (и ожидаемого нового SA)
+        self._router = BaseCanDevice.active().router
+        self._rx_route = self._router.add_exact(UdsIdentifiers.rx.identifier, self.on_new_messages, "bootloader")
+        self._pending_rx_route = None
+        self._saved_rx_batch_interval: float | None = None
+
+    def _set_fast_rx(self, enabled: bool):
+        device = BaseCanDevice.active()
+        if enabled:
+            if self._saved_rx_batch_interval is None:
+                self._saved_rx_batch_interval = device.rx_batch_interval
+            device.rx_batch_interval = self.TRANSFER_RX_BATCH_INTERVAL_S
+        elif self._saved_rx_batch_interval is not None:
+            device.rx_batch_interval = self._saved_rx_batch_interval
+            self._saved_rx_batch_interval = None
+
+    def _sync_rx_routes(self):
+        self._router.retarget(self._rx_route, UdsIdentifiers.rx.identifier)
+
+        if self._pending_rx_identifier is None:
+            if self._pending_rx_route is not None:
+                self._router.remove(self._pending_rx_route)
+                self._pending_rx_route = None
+        elif self._pending_rx_route is None:
+            self._pending_rx_route = self._router.add_exact(self._pending_rx_identifier,
+                                                            self.on_new_messages,
+                                                            "bootloader-pending")
+        else:
+            self._router.retarget(self._pending_rx_route, self._pending_rx_identifier)
 
     @Slot(int)
     def _handle_data_sent(self, total_bytes):
-        self.signal_data_sent.emit(total_bytes)
-
-    def set_firmware(self, binary_content: bytes):
-        self._binary_content = binary_content
+        # Прогресс - позиция в образе: при дельта-прошивке участок начинается со своего смещения
+        region = self._current_region()
+        self.signal_data_sent.emit(total_bytes + (region.offset if region is not None else 0))
+
+    def set_firmware(self, firmware: FirmwareImage | bytes):
+        # План кадров берется из подготовленного образа и не строится на каждом запуске
+        self._firmware = firmware if isinstance(firmware, FirmwareImage) else FirmwareImage(firmware)
+        self._binary_content = self._firmware.content
         if self._service_request_download is not None:
             self._service_request_download.set_memory_length(len(self._binary_content))
 
+    def set_delta_flash(self, enabled: bool):
+        """
+        Прошивать только участки, отличающиеся от последнего прошитого в узел образа.
+        Включать только для загрузчика, который подтвержденно стирает участок по RoutineControl 0xFF00
+        с адресом и длиной: загрузчик, отбрасывающий параметры, сотрет всю память, а дельта допишет
+        только измененные участки. Отказ ЭБУ (NRC) переводит прошивку на полное стирание.
+        """
+        self._delta_enabled = bool(enabled)
+
+    def set_checkpoint_directory(self, directory):
+        self._checkpoints = FlashCheckpointStore(directory)
+
     def set_transfer_byte_order(self, byte_order: str):
         order = str(byte_order).strip().lower()
         self._transfer_byte_order = order if order in ("big", "little") else "big"
         if self._service_request_download is not None:
             self._service_request_download.set_byte_order(self._transfer_byte_order)
+        if self._service_routine_control is not None:
+            self._service_routine_control.set_byte_order(self._transfer_byte_order)
         if self._service_read_data_by_id is not None:
             self._service_read_data_by_id.set_byte_order(self._transfer_byte_order)
         if self._service_write_data_by_id is not None:
@@ -131,6 +234,7 @@ class Bootloader(QObject):
 
         self._pending_source_address = source_address
         self._pending_rx_identifier = (current_rx_identifier & ~0xFF) | (source_address & 0xFF)
+        self._sync_rx_routes()
         self._state = BootloaderState.WRITE_CAN_SOURCE_ADDRESS
         self._source_address_timeout_timer.start()
         self.signal_new_state.emit(f"Отправлен запрос на изменение Source Address: 0x{source_address:02X}", RowColor.blue)
@@ -143,6 +247,7 @@ class Bootloader(QObject):
             return False
 
         current_tx_identifier = UdsIdentifiers.tx.identifier
+        self._sync_rx_routes()
         self._service_read_data_by_id.read_data_by_identifier(current_tx_identifier, UdsData.can_sa)
         self._state = BootloaderState.READ_CAN_SOURCE_ADDRESS
         self._source_address_timeout_timer.start()
@@ -164,37 +269,92 @@ class Bootloader(QObject):
 
         self._pending_source_address = None
         self._pending_rx_identifier = None
+        self._sync_rx_routes()
         self._state = BootloaderState.READY
 
     def ecu_uds_reset(self):
+        self._sync_rx_routes()
         self._service_ecu_reset.ecu_uds_reset()
 
         self._state = BootloaderState.ECU_UDS_RESET
         self.signal_new_state.emit("Запрос на сброс МК для перехода в загрузчик", RowColor.blue)
 
     def ecu_software_reset(self):
+        self._sync_rx_routes()
         self._service_ecu_reset.ecu_software_reset()
 
         self._state = BootloaderState.ECU_SOFTWARE_RESET
         self.signal_new_state.emit("Запрос на сброс МК для перехода в основную программу", RowColor.blue)
 
     def check_state(self):
+        self._sync_rx_routes()
         self._service_read_data_by_id.read_data(UdsData.fingerprint)
 
         self._state = BootloaderState.READ_FINGERPRINT
         self.signal_new_state.emit("Чтение статуса", RowColor.blue)
 
-    def start(self) -> bool:
+    def start(self, resume: bool = True) -> bool:
+        """
+        Запуск прошивки. Если для узла сохранена контрольная точка этого же образа,
+        сначала продолжаем передачу с блока после нее; ЭБУ, который не сохранил
+        сеанс загрузки, ответит ошибкой - тогда прошивка начинается заново.
+        """
+        self._resume_attempts = 0
+        self._full_restarts = 0
+        return self._start_session(resume)
+
+    def _start_session(self, resume: bool) -> bool:
         if self._state == BootloaderState.READY:
 
-            if self._binary_content is None:
+            if self._firmware is None:
                 self.signal_new_state.emit("Не загружена основная программа", RowColor.red)
                 return False
 
-            self._service_transfer_data.set_firmware(self._binary_content)
+            node_sa = UdsIdentifiers.rx.src
+            flashed_hashes = self._checkpoints.delta_hashes(node_sa, self._firmware) if self._delta_enabled else None
+            self._delta = flashed_hashes is not None
+            if self._delta:
+                self._regions = delta_regions(self._firmware, flashed_hashes)
+            else:
+                self._regions = [full_region(self._firmware)]
+            self._region_index = 0
+            if not self._regions:
+                self.signal_new_state.emit("Образ уже прошит в узел, передавать нечего", RowColor.green)
+                self.signal_finished.emit(True)
+                return True
+            if self._delta:
+                changed = sum(region.length for region in self._regions)
+                self.signal_new_state.emit(f"Дельта-прошивка: {len(self._regions)} участков, "
+                                           f"{changed} из {len(self._firmware)} байт", RowColor.blue)
+
+            # Продолжение идет без RequestDownload, блоками той длины, что ЭБУ сообщил в прерванной
+            # прошивке; новая загрузка получит длину из ответа RequestDownload
+            transfer = self._service_transfer_data
+            resume_plan = None
+            if resume and not self._delta:
+                resume_plan = self._checkpoints.resume_plan(node_sa, self._firmware, transfer.sid)
+            if resume_plan is not None:
+                transfer.set_max_block_length(resume_plan[0].max_block_length)
+                transfer.set_plan(resume_plan[0])
+            else:
+                transfer.set_max_block_length(0)
+                transfer.set_firmware(self._firmware)
+
+            self._sync_rx_routes()
+            self._set_fast_rx(True)
+
+            if resume_plan is not None:
+                resume_index = resume_plan[1]
+                self.signal_new_state.emit(f"Продолжение прошивки с блока {resume_index + 1}", RowColor.blue)
+                self._acked_block_index = resume_index - 1
+                # Сохраненная точка проверяется одной попыткой: без ответа - сразу полный перезапуск
+                self._resume_attempts = self.MAX_RESUME_ATTEMPTS
+                self._resume_transfer()
+                return True
 
             self._state = BootloaderState.SET_PROGRAMMING_SESSION
             self._service_session.set(Session.PROGRAMMING)
+            self._restart_watchdog()
 
             self.signal_new_state.emit("Запрос на установку сессии 'programming'", RowColor.blue)
 
@@ -204,10 +364,142 @@ class Bootloader(QObject):
 
             return False
 
-    @Slot(str, str, str, str, list)
-    def on_new_message(self, _time, _id, _dir, _data_len_code, _data):
+    def _resume_transfer(self):
+        """Передача с блока после последнего подтвержденного без повторной настройки сессии."""
+        self._resuming = True
+        block_index = self._acked_block_index + 1
+        if block_index >= len(self._service_transfer_data.plan.blocks):
+            self._state = BootloaderState.REQUEST_TRANSFER_EXIT
+            self._service_request_transfer_exit.request_transfer_exit()
+            self.signal_new_state.emit("Завершение передачи", RowColor.blue)
+        else:
+            self._service_transfer_data.seek_block(block_index)
+            self._state = BootloaderState.TRANSFER_DATA_FF
+            block_size = self._service_transfer_data.send_first_frame()
+            self.signal_new_state.emit(f"Передача блока ({block_size} байт)", RowColor.blue)
+        self._restart_watchdog()
+
+    def _current_region(self) -> FlashRegion | None:
+        if 0 <= self._region_index < len(self._regions):
+            return self._regions[self._region_index]
+        return None
+
+    def _erase_region(self):
+        region = self._current_region()
+        self._state = BootloaderState.ERASE_REGION
+        self._service_routine_control.request_erase_region_first(
+            self._service_request_download.MEMORY_ADDRESS + region.offset, region.erase_length)
+        self.signal_new_state.emit(f"Очистка участка {self._region_index + 1}/{len(self._regions)} "
+                                   f"(0x{region.offset:05X}, {region.erase_length} байт)", RowColor.blue)
+
+    def _plan_region(self):
+        region = self._current_region()
+        transfer = self._service_transfer_data
+        transfer.set_plan(self._firmware.region_plan(region.offset, region.length, transfer.sid,
+                                                     transfer.max_block_length))
+
+    def _request_region_download(self):
+        region = self._current_region()
+        self._plan_region()
+        self._service_request_download.set_memory_address(self._service_request_download.MEMORY_ADDRESS + region.offset)
+        self._service_request_download.set_memory_length(region.length)
+        self._state = BootloaderState.REQUEST_DOWNLOAD
+        self._service_request_download.request_download_first()
+        self.signal_new_state.emit("Запрос на программирование области памяти", RowColor.blue)
+
+    def _fall_back_to_full_flash(self, nrc: int):
+        """ЭБУ отклонил стирание участка: в том же сеансе стираем всю память и прошиваем образ целиком."""
+        self.signal_new_state.emit(f"ЭБУ не поддерживает очистку участка (NRC 0x{nrc:02X}), "
+                                   f"прошивка образа целиком", RowColor.yellow)
+        self._delta = False
+        self._regions = [full_region(self._firmware)]
+        self._region_index = 0
+        self._checkpoints.begin_flash(UdsIdentifiers.rx.src, self._firmware, full_erase=True)
+        self._retry_region()
+
+    def _retry_region(self):
+        if self._delta:
+            self._erase_region()
+        else:
+            self._state = BootloaderState.ERASE_FIRMWARE
+            self._service_routine_control.request_erase_firmware()
+        self._restart_watchdog()
+
+    def _next_region(self):
+        """Следующий участок дельта-прошивки или завершение, если участков больше нет."""
+        self._region_index += 1
+        if self._current_region() is not None:
+            self._erase_region()
+            return
+
+        self._transfer_timeout_timer.stop()
+        self._checkpoints.record_flashed(UdsIdentifiers.rx.src, self._firmware)
+        self._set_fast_rx(False)
+        self._state = BootloaderState.READY
+        self.signal_finished.emit(True)
+
+    def _restart_watchdog(self):
+        if self._state in self.TRANSFER_STATES:
+            self._transfer_timeout_timer.start(self.TRANSFER_TIMEOUT_MS)
+        elif self._state in self.SETUP_STATES:
+            self._transfer_timeout_timer.start(self.SETUP_TIMEOUT_MS)
+        else:
+            self._transfer_timeout_timer.stop()
+
+    def _on_block_acknowledged(self):
+        self._acked_block_index = self._service_transfer_data.block_index
+        self._checkpoints.record(UdsIdentifiers.rx.src, self._service_transfer_data.plan, self._acked_block_index)
+        self._resume_attempts = 0
+        self._resuming = False
+
+    def _on_transfer_timeout(self):
+        if self._state in self.DOWNLOAD_SETUP_STATES and self._resume_attempts < self.MAX_RESUME_ATTEMPTS:
+            self._resume_attempts += 1
+            self.signal_new_state.emit(f"Нет ответа ЭБУ, повтор участка {self._region_index + 1} "
+                                       f"(попытка {self._resume_attempts})", RowColor.yellow)
+            self._retry_region()
+            return
+        if self._state in self.SETUP_STATES:
+            self._restart_full("Нет ответа ЭБУ")
+            return
+        if self._state not in self.TRANSFER_STATES:
+            return
+        if self._resume_attempts < self.MAX_RESUME_ATTEMPTS:
+            self._resume_attempts += 1
+            self.signal_new_state.emit(f"Нет ответа ЭБУ, повтор с блока {self._acked_block_index + 2} "
+                                       f"(попытка {self._resume_attempts})", RowColor.yellow)
+            self._resume_transfer()
+        else:
+            self._restart_full("Нет ответа ЭБУ")
+
+    def _on_transfer_failure(self, text: str):
+        self.signal_new_state.emit(text, RowColor.red)
+        self._restart_full(text)
+
+    def _restart_full(self, reason: str):
+        self._transfer_timeout_timer.stop()
+        if self._full_restarts >= self.MAX_FULL_RESTARTS:
+            self.signal_new_state.emit(f"{reason}: прошивка прервана", RowColor.red)
+            self._state = BootloaderState.ERROR
+            self._set_fast_rx(False)
+            self.signal_finished.emit(False)
+            return
+        self._full_restarts += 1
+        self._resume_attempts = 0
+        self._resuming = False
+        self.signal_new_state.emit(f"{reason}: прошивка начинается заново", RowColor.yellow)
+        self._state = BootloaderState.READY
+        self._start_session(resume=False)
+
+    @Slot(list)
+    def on_new_messages(self, frames):
+        for frame in frames:
+            self.on_new_message(frame)
+
+    def on_new_message(self, frame: CanFrame):
 
-        identifier = BaseTranslator.to_int(_id)
+        identifier = frame.identifier
+        _data = frame.data
 
         if self._state == BootloaderState.WRITE_CAN_SOURCE_ADDRESS:
             expected_identifier = UdsIdentifiers.rx.identifier
@@ -218,6 +510,13 @@ class Bootloader(QObject):
             if identifier != UdsIdentifiers.rx.identifier:
                 return
 
+        if self._state in self.SETUP_STATES or self._state in self.TRANSFER_STATES:
+            self._restart_watchdog()
+
+        # NRC 0x78 (responsePending): ЭБУ еще выполняет запрос, ждем окончательный ответ
+        if len(_data) > 3 and _data[1] == 0x7F and _data[3] == 0x78:
+            return
+
         if self._state == BootloaderState.SET_PROGRAMMING_SESSION:
             if self._service_session.verify_answer(_data):
 
@@ -260,10 +559,17 @@ class Bootloader(QObject):
             if self._service_write_data_by_id.verify_answer_write_fingerprint(_data):
                 self.signal_new_state.emit("Успешная запись fingerprint", RowColor.green)
 
-                self._state = BootloaderState.ERASE_FIRMWARE
-                self._service_routine_control.request_erase_firmware()
+                # После стирания прежняя контрольная точка недействительна,
+                # а память узла до конца прошивки не совпадает ни с одним образом
+                self._checkpoints.clear(UdsIdentifiers.rx.src)
+                self._checkpoints.begin_flash(UdsIdentifiers.rx.src, self._firmware, full_erase=not self._delta)
+                if self._delta:
+                    self._erase_region()
+                else:
+                    self._state = BootloaderState.ERASE_FIRMWARE
+                    self._service_routine_control.request_erase_firmware()
 
-                self.signal_new_state.emit("Запрос на очистку области памяти основной программы", RowColor.blue)
+                    self.signal_new_state.emit("Запрос на очистку области памяти основной программы", RowColor.blue)
 
             else:
                 self.signal_new_state.emit("Ошибка записи fingerprint", RowColor.red)
@@ -272,14 +578,37 @@ class Bootloader(QObject):
             if self._service_routine_control.verify_answer_erase_firmware(_data):
                 self.signal_new_state.emit("Память успешно очищена", RowColor.green)
 
-                self._state = BootloaderState.REQUEST_DOWNLOAD
-                self._service_request_download.request_download_first()
-
-                self.signal_new_state.emit("Запрос на программирование области памяти", RowColor.blue)
+                self._request_region_download()
 
             else:
                 self.signal_new_state.emit("Ошибка в процессе очистки памяти", RowColor.red)
 
+        elif self._state == BootloaderState.ERASE_REGION:
+            # приходит FlowControl
+            if self._service_routine_control.verify_flow_control(_data):
+
+                self._state = BootloaderState.ERASE_REGION_CONSECUTIVE
+                self._service_routine_control.request_erase_region_consecutive()
+
+            elif len(_data) > 3 and _data[1] == 0x7F:
+                self._fall_back_to_full_flash(_data[3])
+
+        elif self._state == BootloaderState.ERASE_REGION_CONSECUTIVE:
+            if self._service_routine_control.verify_answer_erase_firmware(_data):
+                self.signal_new_state.emit("Участок памяти очищен", RowColor.green)
+
+                if self._current_region().length > 0:
+                    self._request_region_download()
+                else:
+                    # Участок есть только в прошлом образе: стирания достаточно
+                    self._next_region()
+
+            elif len(_data) > 3 and _data[1] == 0x7F:
+                self._fall_back_to_full_flash(_data[3])
+
+            else:
+                self.signal_new_state.emit("Ошибка в процессе очистки участка памяти", RowColor.red)
+
         elif self._state == BootloaderState.REQUEST_DOWNLOAD:
             # приходит FlowControl
             if self._service_request_download.verify_flow_control(_data):
@@ -291,6 +620,20 @@ class Bootloader(QObject):
             if self._service_request_download.verify_request_download(_data):
                 self.signal_new_state.emit("Успешный запрос на передачу данных", RowColor.green)
 
+                # Блоки режутся по maxNumberOfBlockLength из ответа: крупнее блок - меньше
+                # подтверждений 0x76 на образ
+                max_block_length = self._service_request_download.max_block_length
+                if self._service_transfer_data.set_max_block_length(max_block_length):
+                    self._plan_region()
+                if max_block_length == self._service_transfer_data.max_block_length:
+                    self.signal_new_state.emit(f"Длина блока TransferData {max_block_length} байт", RowColor.blue)
+                else:
+                    self.signal_new_state.emit(f"Нет допустимого maxNumberOfBlockLength в ответе ЭБУ, блок "
+                                               f"{self._service_transfer_data.max_block_length} байт",
+                                               RowColor.yellow)
+
+                self._acked_block_index = -1
+                self._resuming = False
                 self._state = BootloaderState.TRANSFER_DATA_FF
                 block_size = self._service_transfer_data.send_first_frame()
                 self.signal_new_state.emit(f"Передача блока ({block_size} байт)", RowColor.blue)
@@ -300,11 +643,15 @@ class Bootloader(QObject):
                 self._state = BootloaderState.TRANSFER_DATA_CF
                 self._service_transfer_data.send_consecutive_frames()
             else:
-                self.signal_new_state.emit("Ошибка обработки flow control", RowColor.red)
-                self._state = BootloaderState.ERROR
+                self._on_transfer_failure("Ошибка обработки flow control")
 
         elif self._state == BootloaderState.TRANSFER_DATA_CF:
             if self._service_transfer_data.data_transferred():
+                if not self._service_transfer_data.verify_answer_after_sent_block(_data):
+                    if len(_data) > 1 and _data[1] == 0x7F:
+                        self._on_transfer_failure("Последний блок отклонен ЭБУ")
+                    return
+                self._on_block_acknowledged()
                 self.signal_new_state.emit("Все данные переданы", RowColor.green)
 
                 self._state = BootloaderState.REQUEST_TRANSFER_EXIT
@@ -316,9 +663,12 @@ class Bootloader(QObject):
                 # формируем другой блок, начиная с first frame
                 if self._service_transfer_data.block_transferred():
                     if self._service_transfer_data.verify_answer_after_sent_block(_data):
+                        self._on_block_acknowledged()
                         self._state = BootloaderState.TRANSFER_DATA_FF
                         block_size = self._service_transfer_data.send_first_frame()
                         self.signal_new_state.emit(f"Передача блока ({block_size} байт)", RowColor.blue)
+                    elif len(_data) > 1 and _data[1] == 0x7F:
+                        self._on_transfer_failure("Блок отклонен ЭБУ")
                 else:
                     # После передачи максимального количества фреймов в одном блоке,
                     # принимаем очередной flow_control и из него берем очередное количество
@@ -326,19 +676,17 @@ class Bootloader(QObject):
                     if self._service_transfer_data.verify_flow_control(_data):
                         self._service_transfer_data.send_consecutive_frames()
                     else:
-                        self.signal_new_state.emit("Ошибка обработки flow control", RowColor.red)
-                        self._state = BootloaderState.ERROR
+                        self._on_transfer_failure("Ошибка обработки flow control")
 
         elif self._state == BootloaderState.REQUEST_TRANSFER_EXIT:
             if self._service_request_transfer_exit.verify_answer_request_transfer_exit(_data):
                 self.signal_new_state.emit("Успешное завершение передачи данных", RowColor.green)
 
-                self.signal_finished.emit(True)
-                self._state = BootloaderState.READY
+                self._checkpoints.clear(UdsIdentifiers.rx.src)
+                self._next_region()
 
             else:
-                self.signal_new_state.emit("Ошибка завершения передачи данных", RowColor.red)
-                self._state = BootloaderState.ERROR
+                self._on_transfer_failure("Ошибка завершения передачи данных")
 
         elif self._state == BootloaderState.WRITE_CAN_SOURCE_ADDRESS:
             if self._source_address_timeout_timer.isActive():
@@ -356,6 +704,7 @@ class Bootloader(QObject):
 
             self._pending_source_address = None
             self._pending_rx_identifier = None
+            self._sync_rx_routes()
             self._state = BootloaderState.READY
 
         elif self._state == BootloaderState.READ_CAN_SOURCE_ADDRESS:
@@ -374,6 +723,7 @@ class Bootloader(QObject):
 
             self._pending_source_address = None
             self._pending_rx_identifier = None
+            self._sync_rx_routes()
             self._state = BootloaderState.READY
 
         elif self._state == BootloaderState.ECU_UDS_RESET:
@@ -403,8 +753,11 @@ class Bootloader(QObject):
                 self.signal_new_state.emit("Загрузчик не активен", RowColor.red)
                 self._state = BootloaderState.READY
 
-        if self._state == BootloaderState.ERROR:
-            pass
-            # CanDevice.instance().signal_new_message.disconnect(self.on_new_message)
+        if self._state in self.SETUP_STATES or self._state in self.TRANSFER_STATES:
+            self._restart_watchdog()
+        elif self._state == BootloaderState.ERROR:
+            self._transfer_timeout_timer.stop()
+            self._set_fast_rx(False)
+            # BaseCanDevice.active().signal_new_messages.disconnect(self.on_new_messages)
 
 
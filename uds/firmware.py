@@ -1,6 +1,8 @@
 import logging
 from enum import Enum
 
+from uds.firmware_cache import FirmwareCache, FirmwareImage
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -12,18 +14,19 @@ class FirmwareState(Enum):
 
 class Firmware:
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, cache: FirmwareCache | None = None):
         self._errcode: FirmwareState = FirmwareState.no_errors
-        self._binary_content = self._open_file(file_path)
+        self._cache = cache if cache is not None else FirmwareCache(max_size=1)
+        self._image = self._open_file(file_path)
+        self._binary_content = self._image.content if self._image is not None else None
 
-    def _open_file(self, file_path: str) -> bytes | None:
+    def _open_file(self, file_path: str) -> FirmwareImage | None:
         file = None
         if file_path:
             try:
-                # Открываем файл в бинарном режиме и читаем его содержимое
-                with open(file_path, "rb") as file:
-                    file = file.read()
-                    self._errcode = FirmwareState.successfully_uploaded
+                # Образ берется из кэша, если этот файл уже загружался и не менялся
+                file = self._cache.load(file_path)
+                self._errcode = FirmwareState.successfully_uploaded
             except Exception as e:
                 self._errcode = FirmwareState.loading_error
                 LOGGER.error(f"Ошибка при открытии файла: {e}")
@@ -41,6 +44,10 @@ class Firmware:
     def binary_content(self) -> bytes:
         return self._binary_content
 
+    @property
+    def image(self) -> FirmwareImage | None:
+        return self._image
+
     def binary_content_size(self) -> int:
         if self._binary_content is None:
             return 0
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from uds.services.request_download import ServiceRequestDownload
+from uds.transfer_plan import TransferPlan
+
+LOGGER = logging.getLogger(__name__)
+
+# Размер блока сравнения образов (страница flash)
+FIRMWARE_BLOCK_SIZE = 1024
+# Значение стертой flash, которым дополняется последний блок
+ERASED_BYTE = 0xFF
+
+
+class FirmwareImage:
+    """
+    Подготовленный образ прошивки: SHA-256, CRC32, длина с выравниванием
+    по блоку, хэши блоков по FIRMWARE_BLOCK_SIZE и планы кадров TransferData.
+
+    Образ неизменяем, поэтому один экземпляр можно отдавать загрузчику,
+    оркестратору и сравнению образов из разных потоков.
+    """
+
+    def __init__(self, content: bytes, max_memory_length: int = ServiceRequestDownload.MAX_MEMORY_LENGTH):
+        self._content = bytes(content)
+        self._sha256 = hashlib.sha256(self._content).hexdigest()
+        self._crc32 = zlib.crc32(self._content)
+        self._max_memory_length = int(max_memory_length)
+
+        blocks_count = -(-len(self._content) // FIRMWARE_BLOCK_SIZE)
+        self._padded_length = blocks_count * FIRMWARE_BLOCK_SIZE
+
+        view = memoryview(self._content)
+        block_hashes = []
+        for offset in range(0, len(self._content), FIRMWARE_BLOCK_SIZE):
+            chunk = view[offset:offset + FIRMWARE_BLOCK_SIZE]
+            digest = hashlib.sha256(chunk)
+            if len(chunk) < FIRMWARE_BLOCK_SIZE:
+                # Хвост сравнивается как страница flash после записи
+                digest.update(bytes([ERASED_BYTE]) * (FIRMWARE_BLOCK_SIZE - len(chunk)))
+            block_hashes.append(digest.digest())
+        self._block_hashes = tuple(block_hashes)
+
+        self._plans: dict[tuple[int, int, int, int], TransferPlan] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def content(self) -> bytes:
+        return self._content
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256
+
+    @property
+    def crc32(self) -> int:
+        return self._crc32
+
+    @property
+    def padded_length(self) -> int:
+        """Длина образа, дополненная до целого числа блоков."""
+        return self._padded_length
+
+    @property
+    def max_memory_length(self) -> int:
+        return self._max_memory_length
+
+    @property
+    def fits_memory(self) -> bool:
+        return self._padded_length <= self._max_memory_length
+
+    @property
+    def memory_length(self) -> int:
+        """Длина для RequestDownload: образ, но не больше области памяти."""
+        return min(len(self._content), self._max_memory_length)
+
+    @property
+    def block_hashes(self) -> tuple[bytes, ...]:
+        return self._block_hashes
+
+    def __len__(self) -> int:
+        return len(self._content)
+
+    def plan(self, sid: int = 0x36, max_block_length: int = 1026) -> TransferPlan:
+        """План кадров TransferData, строится один раз на sid и длину блока."""
+        return self.region_plan(0, len(self._content), sid, max_block_length)
+
+    def region_plan(self, offset: int, length: int, sid: int = 0x36, max_block_length: int = 1026) -> TransferPlan:
+        """План для участка образа [offset, offset + length) - отдельной загрузки RequestDownload."""
+        offset, length = int(offset), int(length)
+        key = (offset, length, int(sid) & 0xFF, int(max_block_length))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                content = self._content
+                if (offset, length) != (0, len(content)):
+                    content = content[offset:offset + length]
+                plan = TransferPlan(content, key[2], key[3])
+                self._plans[key] = plan
+            return plan
+
+    def changed_blocks(self, other: "FirmwareImage") -> list[int]:
+        """Индексы блоков FIRMWARE_BLOCK_SIZE, которые отличаются от other (или есть только в одном образе)."""
+        if other.sha256 == self._sha256:
+            return []
+        own, theirs = self._block_hashes, other.block_hashes
+        changed = [index for index, (a, b) in enumerate(zip(own, theirs)) if a != b]
+        changed.extend(range(min(len(own), len(theirs)), max(len(own), len(theirs))))
+        return changed
+
+
+class FirmwareCache:
+    """
+    Ограниченный LRU-кэш подготовленных образов по SHA-256 содержимого.
+
+    Для файлов дополнительно запоминается (размер, mtime) -> SHA-256, поэтому
+    повторная загрузка того же BIN не читает и не хэширует файл заново.
+    Используется из потока загрузки и из GUI-потока, доступ под блокировкой.
+    """
+
+    def __init__(self, max_size: int = 8, max_memory_length: int = ServiceRequestDownload.MAX_MEMORY_LENGTH):
+        self._max_size = max(int(max_size), 1)
+        self._max_memory_length = int(max_memory_length)
+        self._entries: OrderedDict[str, FirmwareImage] = OrderedDict()
+        self._files: dict[str, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, content: bytes) -> FirmwareImage:
+        sha256 = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            image = self._lookup(sha256)
+        if image is not None:
+            return image
+
+        image = FirmwareImage(content, self._max_memory_length)
+        with self._lock:
+            return self._store(image)
+
+    def load(self, file_path: str | Path) -> FirmwareImage:
+        """Образ из файла; OSError пробрасывается вызывающему."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._files.get(path)
+            if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                image = self._lookup(known[2])
+                if image is not None:
+                    return image
+
+        with open(path, "rb") as file:
+            image = self.get(file.read())
+        with self._lock:
+            self._files[path] = (stat.st_size, stat.st_mtime_ns, image.sha256)
+        return image
+
+    def _lookup(self, sha256: str) -> FirmwareImage | None:
+        image = self._entries.get(sha256)
+        if image is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(sha256)
+        return image
+
+    def _store(self, image: FirmwareImage) -> FirmwareImage:
+        existing = self._entries.get(image.sha256)
+        if existing is not None:
+            return existing
+        self._entries[image.sha256] = image
+        while len(self._entries) > self._max_size:
+            sha256, _ = self._entries.popitem(last=False)
+            self._files = {path: known for path, known in self._files.items() if known[2] != sha256}
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._files.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from uds.firmware_cache import FirmwareImage
+from uds.transfer_plan import BLOCK_HEADER_LENGTH, TransferPlan
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIRECTORY = Path("logs") / "flash_checkpoints"
+
+
+@dataclass
+class FlashCheckpoint:
+    """Последний блок TransferData, подтвержденный ЭБУ ответом 0x76."""
+
+    node_sa: int
+    image_crc32: int
+    image_size: int
+    max_block_length: int
+    block_index: int        # индекс блока в TransferPlan
+    block_sequence: int     # его blockSequenceCounter
+    image_offset: int       # байт образа подтверждено
+    data_crc32: int         # CRC32 подтвержденных байт образа
+    updated: float = 0.0
+
+    def matches(self, plan: TransferPlan) -> bool:
+        """Контрольная точка относится к этому образу и разбиению на блоки."""
+        if (self.image_crc32 != plan.image_crc32 or self.image_size != len(plan.image)
+                or self.max_block_length != plan.max_block_length):
+            return False
+        if not 0 <= self.block_index < len(plan.blocks):
+            return False
+        block = plan.blocks[self.block_index]
+        if block.sequence != self.block_sequence or block.image_offset + block.payload_length != self.image_offset:
+            return False
+        return zlib.crc32(memoryview(plan.image)[:self.image_offset]) == self.data_crc32
+
+
+@dataclass
+class FlashedImage:
+    """Образ, последним полностью прошитый в узел, - с ним сравнивается новый при дельта-прошивке."""
+
+    node_sa: int
+    sha256: str
+    length: int
+    block_hashes: list[str]     # SHA-256 блоков FIRMWARE_BLOCK_SIZE, hex
+    pending_sha256: str = ""    # прошивка этого образа начата и не завершена, память узла смешанная
+    updated: float = 0.0
+    full_erase: bool = False    # начато полное стирание: содержимое памяти узла неизвестно
+
+
+class FlashCheckpointStore:
+    """
+    Контрольные точки прошивки по узлам, по JSON-файлу на SA.
+
+    Запись идет после каждого подтвержденного блока (через временный файл,
+    чтобы обрыв не оставил половину JSON), поэтому продолжить можно и после
+    переподключения адаптера или перезапуска программы. Рядом хранится
+    прошитый образ узла (node_<SA>.image.json) для дельта-прошивки.
+    """
+
+    def __init__(self, directory: Path | str = DEFAULT_CHECKPOINT_DIRECTORY):
+        self._directory = Path(directory)
+        self._cache: dict[int, FlashCheckpoint] = {}
+        self._images: dict[int, FlashedImage] = {}
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _path(self, node_sa: int) -> Path:
+        return self._directory / f"node_{int(node_sa) & 0xFF:02X}.json"
+
+    def _image_path(self, node_sa: int) -> Path:
+        return self._directory / f"node_{int(node_sa) & 0xFF:02X}.image.json"
+
+    def _write(self, path: Path, data: dict) -> bool:
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(temp_path, path)
+        except OSError as err:
+            LOGGER.warning(f"Файл {path} не сохранен: {err}")
+            return False
+        return True
+
+    def load(self, node_sa: int) -> FlashCheckpoint | None:
+        node_sa = int(node_sa) & 0xFF
+        checkpoint = self._cache.get(node_sa)
+        if checkpoint is not None:
+            return checkpoint
+        path = self._path(node_sa)
+        if not path.exists():
+            return None
+        try:
+            checkpoint = FlashCheckpoint(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError) as err:
+            LOGGER.warning(f"Контрольная точка {path}: {err}")
+            return None
+        self._cache[node_sa] = checkpoint
+        return checkpoint
+
+    def record(self, node_sa: int, plan: TransferPlan, block_index: int) -> FlashCheckpoint:
+        """Сохраняет подтверждение блока block_index плана."""
+        node_sa = int(node_sa) & 0xFF
+        block = plan.blocks[block_index]
+        previous = self._cache.get(node_sa)
+        if (previous is not None and previous.block_index == block_index - 1
+                and previous.image_crc32 == plan.image_crc32):
+            # CRC считается нарастающим итогом от предыдущей точки
+            data_crc32 = zlib.crc32(plan.block_data(block), previous.data_crc32)
+        else:
+            data_crc32 = zlib.crc32(memoryview(plan.image)[:block.image_offset + block.payload_length])
+
+        checkpoint = FlashCheckpoint(node_sa, plan.image_crc32, len(plan.image), plan.max_block_length,
+                                     block_index, block.sequence, block.image_offset + block.payload_length,
+                                     data_crc32, time.time())
+        self._cache[node_sa] = checkpoint
+        self._write(self._path(node_sa), asdict(checkpoint))
+        return checkpoint
+
+    def resume_index(self, node_sa: int, plan: TransferPlan) -> int | None:
+        """Индекс блока, с которого можно продолжить, или None - только полный перезапуск."""
+        checkpoint = self.load(node_sa)
+        if checkpoint is None or not checkpoint.matches(plan):
+            return None
+        return checkpoint.block_index + 1
+
+    def resume_plan(self, node_sa: int, image: FirmwareImage, sid: int = 0x36) -> tuple[TransferPlan, int] | None:
+        """
+        План с длиной блока прерванной прошивки (ЭБУ согласовал ее в RequestDownload
+        того сеанса) и индекс блока для продолжения или None - только полный перезапуск.
+        """
+        checkpoint = self.load(node_sa)
+        if (checkpoint is None or checkpoint.image_crc32 != image.crc32
+                or checkpoint.max_block_length <= BLOCK_HEADER_LENGTH):
+            return None
+        plan = image.plan(sid, checkpoint.max_block_length)
+        resume_index = self.resume_index(node_sa, plan)
+        return None if resume_index is None else (plan, resume_index)
+
+    def clear(self, node_sa: int):
+        node_sa = int(node_sa) & 0xFF
+        self._cache.pop(node_sa, None)
+        try:
+            self._path(node_sa).unlink(missing_ok=True)
+        except OSError as err:
+            LOGGER.warning(f"Контрольная точка узла 0x{node_sa:02X} не удалена: {err}")
+
+    def flashed_image(self, node_sa: int) -> FlashedImage | None:
+        node_sa = int(node_sa) & 0xFF
+        flashed = self._images.get(node_sa)
+        if flashed is not None:
+            return flashed
+        path = self._image_path(node_sa)
+        if not path.exists():
+            return None
+        try:
+            flashed = FlashedImage(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError) as err:
+            LOGGER.warning(f"Прошитый образ {path}: {err}")
+            return None
+        self._images[node_sa] = flashed
+        return flashed
+
+    def delta_hashes(self, node_sa: int, image: FirmwareImage) -> tuple[bytes, ...] | None:
+        """
+        Хэши блоков памяти узла для сравнения с image или None - нужна полная прошивка:
+        образ узла неизвестен, прерванная прошивка другого образа оставила смешанную память
+        или прерванное полное стирание оставило стертыми блоки, которые дельта не перезапишет.
+        """
+        flashed = self.flashed_image(node_sa)
+        if flashed is None or flashed.full_erase or flashed.pending_sha256 not in ("", image.sha256):
+            return None
+        try:
+            return tuple(bytes.fromhex(digest) for digest in flashed.block_hashes)
+        except ValueError:
+            return None
+
+    def begin_flash(self, node_sa: int, image: FirmwareImage, full_erase: bool = False):
+        """
+        Отмечается перед первым стиранием: до record_flashed память узла не равна ни одному образу.
+        full_erase - стирается вся память, дельта-прошивка до record_flashed больше невозможна.
+        """
+        flashed = self.flashed_image(node_sa)
+        if flashed is None:
+            return
+        full_erase = full_erase or flashed.full_erase
+        if flashed.pending_sha256 == image.sha256 and flashed.full_erase == full_erase:
+            return
+        flashed.pending_sha256 = image.sha256
+        flashed.full_erase = full_erase
+        flashed.updated = time.time()
+        self._write(self._image_path(node_sa), asdict(flashed))
+
+    def record_flashed(self, node_sa: int, image: FirmwareImage) -> FlashedImage:
+        node_sa = int(node_sa) & 0xFF
+        flashed = FlashedImage(node_sa, image.sha256, len(image),
+                               [digest.hex() for digest in image.block_hashes], "", time.time())
+        self._images[node_sa] = flashed
+        self._write(self._image_path(node_sa), asdict(flashed))
+        return flashed
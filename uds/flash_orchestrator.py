@@ -0,0 +1,303 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+from dataclasses import dataclass, field
+
+from PySide6.QtCore import QObject, Signal
+
+from app_can.TxQueue import TxPriority
+from uds.async_client import AsyncUdsClient, UdsError, UdsNegativeResponseError, UdsTimeoutError
+from uds.bootloader import Bootloader
+from uds.data_identifiers import UdsData
+from uds.firmware_cache import FirmwareImage
+from uds.flash_checkpoint import DEFAULT_CHECKPOINT_DIRECTORY, FlashCheckpointStore
+from uds.flash_regions import FlashRegion, delta_regions
+from uds.isotp import FF_MAX_LENGTH_32BIT
+from uds.services.request_download import ServiceRequestDownload
+from uds.services.session import Session
+from uds.transfer_plan import BLOCK_HEADER_LENGTH, TransferBlock, TransferPlan
+
+LOGGER = logging.getLogger(__name__)
+
+# Значение fingerprint, которое загрузчик пишет перед стиранием (Bootloader.start)
+FINGERPRINT_PROGRAMMING = 0xAA
+
+
+@dataclass
+class NodeFlashResult:
+    node_sa: int
+    success: bool = False
+    state: str = "ожидание"
+    attempts: int = 0
+    bytes_sent: int = 0
+    block_retries: int = 0
+    elapsed_s: float = 0.0
+    error: str = ""
+
+
+@dataclass
+class FleetFlashReport:
+    image_size: int
+    elapsed_s: float
+    nodes: list[NodeFlashResult] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> list[int]:
+        return [node.node_sa for node in self.nodes if node.success]
+
+    @property
+    def failed(self) -> list[int]:
+        return [node.node_sa for node in self.nodes if not node.success]
+
+    @property
+    def throughput_bps(self) -> float:
+        """Байт прошивки в секунду по всем успешно прошитым узлам."""
+        if self.elapsed_s <= 0:
+            return 0.0
+        return self.image_size * len(self.succeeded) / self.elapsed_s
+
+    def summary(self) -> str:
+        text = (f"Прошито {len(self.succeeded)}/{len(self.nodes)} узлов за {self.elapsed_s:.2f} с "
+                f"({self.throughput_bps:.0f} байт/с)")
+        errors = [f"0x{node.node_sa:02X}: {node.error}" for node in self.nodes if not node.success]
+        if errors:
+            text += "; ошибки: " + ", ".join(errors)
+        return text
+
+
+class FlashOrchestrator(QObject):
+    """
+    Одновременная прошивка нескольких узлов через AsyncUdsClient.
+
+    Для каждого SA выполняется своя сессия загрузчика (та же последовательность,
+    что в Bootloader.start) на собственных идентификаторах 0x18DA<SA><тестер>,
+    одновременно - не больше max_parallel узлов. Кадры всех сессий идут через
+    общую очередь передачи устройства: пока один узел ждет Flow Control или
+    выдерживает STmin, шину занимают кадры других.
+
+    Таймаут TransferData повторяет тот же блок (ЭБУ подтверждает повтор
+    последнего счетчика). После другой ошибки (и при запуске, если прошлая
+    прошивка того же образа прервалась) узел продолжает с блока после
+    сохраненной контрольной точки; если ЭБУ не сохранил сеанс загрузки,
+    сессия начинается заново, не больше node_retries раз.
+
+    С delta=True узел, для которого известен последний прошитый образ,
+    получает только отличающиеся участки по 1 КБ: для каждого свое стирание,
+    RequestDownload, TransferData и TransferExit в одной сессии.
+    Стирание участка - RoutineControl 0xFF00 с адресом и длиной: включать
+    delta только для загрузчика, который подтвержденно это поддерживает
+    (загрузчик, отбрасывающий параметры, сотрет всю память). Если ЭБУ
+    отклоняет стирание участка (NRC), узел в той же сессии прошивается целиком.
+    Длина блоков TransferData у каждого узла своя - maxNumberOfBlockLength
+    из его ответа RequestDownload.
+    Сигналы испускаются из потока asyncio.
+    """
+
+    signal_node_state = Signal(int, str)
+    signal_node_progress = Signal(int, int, int)  # SA, байт передано, размер образа
+    signal_finished = Signal(object)  # FleetFlashReport
+
+    def __init__(self,
+                 client: AsyncUdsClient | None = None,
+                 max_parallel: int = 8,
+                 node_retries: int = 2,
+                 block_retries: int = 3,
+                 byte_order: str = "big",
+                 checkpoint_directory=DEFAULT_CHECKPOINT_DIRECTORY,
+                 delta: bool = False):
+        super().__init__()
+        self._client = client if client is not None else AsyncUdsClient(byte_order=byte_order,
+                                                                        priority=TxPriority.FLASHING)
+        self._max_parallel = max(1, int(max_parallel))
+        self._node_retries = max(0, int(node_retries))
+        self._block_retries = max(0, int(block_retries))
+        self._request_download = ServiceRequestDownload()
+        self._checkpoints = FlashCheckpointStore(checkpoint_directory)
+        self._delta = bool(delta)
+        self._results: dict[int, NodeFlashResult] = {}
+
+    @property
+    def client(self) -> AsyncUdsClient:
+        return self._client
+
+    @property
+    def results(self) -> dict[int, NodeFlashResult]:
+        return self._results
+
+    def start(self, nodes: list[int], image: FirmwareImage | bytes) -> concurrent.futures.Future:
+        """Запуск из GUI-потока: прошивка идет в цикле asyncio клиента."""
+        return self._client.submit(self.run(nodes, image))
+
+    async def run(self, nodes: list[int], image: FirmwareImage | bytes) -> FleetFlashReport:
+        firmware = image if isinstance(image, FirmwareImage) else FirmwareImage(image)
+        if len(firmware) > self._request_download.max_memory_length:
+            raise ValueError(f"Образ {len(firmware)} байт больше области памяти "
+                             f"{self._request_download.max_memory_length} байт")
+
+        self._results = {int(node_sa) & 0xFF: NodeFlashResult(int(node_sa) & 0xFF) for node_sa in nodes}
+        semaphore = asyncio.Semaphore(self._max_parallel)
+
+        # Как и Bootloader, на время прошивки ускоряем доставку RX (Flow Control)
+        device = self._client.device
+        saved_interval = device.rx_batch_interval
+        device.rx_batch_interval = Bootloader.TRANSFER_RX_BATCH_INTERVAL_S
+        started = time.perf_counter()
+        results = list(self._results.values())
+        try:
+            # Сбой одного узла не должен оставлять остальные без отчета
+            outcomes = await asyncio.gather(*(self._flash_node(result, firmware, semaphore) for result in results),
+                                            return_exceptions=True)
+        finally:
+            device.rx_batch_interval = saved_interval
+        for result, outcome in zip(results, outcomes):
+            if isinstance(outcome, BaseException):
+                result.success = False
+                result.error = f"{type(outcome).__name__}: {outcome}"
+
+        report = FleetFlashReport(len(firmware), time.perf_counter() - started, results)
+        LOGGER.info(report.summary())
+        self.signal_finished.emit(report)
+        return report
+
+    async def _flash_node(self, result: NodeFlashResult, firmware: FirmwareImage, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            started = time.perf_counter()
+            for attempt in range(1, self._node_retries + 2):
+                result.attempts = attempt
+                try:
+                    await self._flash_session(result, firmware)
+                except UdsError as err:
+                    result.error = str(err)
+                    LOGGER.warning(f"Узел 0x{result.node_sa:02X}: попытка {attempt}: {err}")
+                    self._set_state(result, f"ошибка: {err}")
+                    continue
+                except Exception as err:
+                    # Не ошибка обмена, а сбой подготовки: повтор не поможет
+                    result.error = f"{type(err).__name__}: {err}"
+                    LOGGER.exception(f"Узел 0x{result.node_sa:02X}: попытка {attempt}")
+                    self._set_state(result, f"ошибка: {result.error}")
+                    break
+                result.success = True
+                result.error = ""
+                self._set_state(result, "прошит")
+                break
+            result.elapsed_s = time.perf_counter() - started
+
+    async def _flash_session(self, result: NodeFlashResult, firmware: FirmwareImage):
+        node_sa = result.node_sa
+        flashed_hashes = self._checkpoints.delta_hashes(node_sa, firmware) if self._delta else None
+        if flashed_hashes is not None:
+            await self._flash_delta(result, firmware, delta_regions(firmware, flashed_hashes))
+            return
+
+        resume_plan = self._checkpoints.resume_plan(node_sa, firmware)
+        if resume_plan is not None:
+            plan, resume_index = resume_plan
+            self._set_state(result, f"продолжение с блока {resume_index + 1}")
+            try:
+                await self._transfer(result, plan, resume_index)
+                self._checkpoints.record_flashed(node_sa, firmware)
+                return
+            except UdsError as err:
+                if self._checkpoints.resume_index(node_sa, plan) != resume_index:
+                    # Блоки после точки приняты: следующая попытка снова продолжит
+                    raise
+                LOGGER.info(f"Узел 0x{node_sa:02X}: продолжить нельзя ({err}), прошивка заново")
+
+        await self._open_session(result)
+        await self._flash_full(result, firmware)
+
+    async def _flash_full(self, result: NodeFlashResult, firmware: FirmwareImage):
+        """Стирание всей памяти и загрузка образа целиком в открытой сессии."""
+        node_sa = result.node_sa
+        self._set_state(result, "очистка памяти")
+        self._checkpoints.begin_flash(node_sa, firmware, full_erase=True)
+        # После стирания прежняя контрольная точка недействительна
+        self._checkpoints.clear(node_sa)
+        await self._client.erase_memory(node_sa)
+        plan = await self._start_download(result, firmware, 0, len(firmware))
+        await self._transfer(result, plan, 0)
+        self._checkpoints.record_flashed(node_sa, firmware)
+
+    async def _flash_delta(self, result: NodeFlashResult, firmware: FirmwareImage, regions: list[FlashRegion]):
+        """Стирание и загрузка только отличающихся участков, по RequestDownload на участок."""
+        node_sa = result.node_sa
+        if not regions:
+            self._set_state(result, "образ уже прошит")
+            return
+
+        await self._open_session(result)
+        self._checkpoints.begin_flash(node_sa, firmware)
+        self._checkpoints.clear(node_sa)
+        total = sum(region.length for region in regions)
+        sent = 0
+        for number, region in enumerate(regions, 1):
+            self._set_state(result, f"участок {number}/{len(regions)}: очистка памяти")
+            try:
+                await self._client.erase_memory(node_sa, self._request_download.memory_address + region.offset,
+                                                region.erase_length)
+            except UdsNegativeResponseError as err:
+                LOGGER.warning(f"Узел 0x{node_sa:02X}: стирание участка отклонено ({err}), прошивка образа целиком")
+                await self._flash_full(result, firmware)
+                return
+            if region.length == 0:
+                continue
+            plan = await self._start_download(result, firmware, region.offset, region.length)
+            await self._transfer(result, plan, 0, sent, total)
+            sent += region.length
+        self._checkpoints.record_flashed(node_sa, firmware)
+
+    async def _open_session(self, result: NodeFlashResult):
+        client = self._client
+        node_sa = result.node_sa
+
+        self._set_state(result, "сессия programming")
+        await client.diagnostic_session(node_sa, Session.PROGRAMMING)
+        self._set_state(result, "доступ")
+        await client.security_access(node_sa)
+        self._set_state(result, "запись fingerprint")
+        await client.write_did(node_sa, UdsData.fingerprint, bytes((FINGERPRINT_PROGRAMMING,)))
+
+    async def _start_download(self, result: NodeFlashResult, firmware: FirmwareImage,
+                              offset: int, length: int) -> TransferPlan:
+        """RequestDownload участка; план режется по maxNumberOfBlockLength из ответа узла."""
+        node_sa = result.node_sa
+        self._set_state(result, "запрос загрузки")
+        max_block_length = await self._client.request_download(node_sa, self._request_download.memory_address + offset,
+                                                               length)
+        if not BLOCK_HEADER_LENGTH < max_block_length <= FF_MAX_LENGTH_32BIT:
+            raise UdsError(f"Узел 0x{node_sa:02X}: недопустимый maxNumberOfBlockLength {max_block_length}")
+        return firmware.region_plan(offset, length, 0x36, max_block_length)
+
+    async def _transfer(self, result: NodeFlashResult, plan: TransferPlan, start_index: int,
+                        sent_before: int = 0, total: int | None = None):
+        node_sa = result.node_sa
+        total = len(plan.image) if total is None else total
+        self._set_state(result, "передача")
+        for block_index in range(start_index, len(plan.blocks)):
+            block = plan.blocks[block_index]
+            await self._transfer_block(result, plan, block)
+            self._checkpoints.record(node_sa, plan, block_index)
+            result.bytes_sent = sent_before + block.image_offset + block.payload_length
+            self.signal_node_progress.emit(node_sa, result.bytes_sent, total)
+
+        self._set_state(result, "завершение передачи")
+        await self._client.request_transfer_exit(node_sa)
+        self._checkpoints.clear(node_sa)
+
+    async def _transfer_block(self, result: NodeFlashResult, plan: TransferPlan, block: TransferBlock):
+        data = plan.block_data(block)
+        for retry in range(self._block_retries + 1):
+            try:
+                await self._client.transfer_data(result.node_sa, block.sequence, data)
+                return
+            except UdsTimeoutError:
+                if retry >= self._block_retries:
+                    raise
+                result.block_retries += 1
+                LOGGER.warning(f"Узел 0x{result.node_sa:02X}: повтор блока {block.sequence}")
+
+    def _set_state(self, result: NodeFlashResult, state: str):
+        result.state = state
+        self.signal_node_state.emit(result.node_sa, state)
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+from uds.firmware_cache import FIRMWARE_BLOCK_SIZE, FirmwareImage
+
+# Неизменные участки не длиннее стольких блоков передаются вместе с соседними
+# измененными: лишний 1 КБ дешевле отдельного стирания, RequestDownload и TransferExit
+MERGE_GAP_BLOCKS = 2
+
+
+@dataclass(frozen=True)
+class FlashRegion:
+    """Участок области памяти, который стирается и (если length > 0) программируется заново."""
+
+    offset: int         # смещение от начала области памяти и образа, кратно FIRMWARE_BLOCK_SIZE
+    length: int         # байт образа для RequestDownload, 0 - участок только стирается
+    erase_length: int   # байт flash для стирания, кратно FIRMWARE_BLOCK_SIZE
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.erase_length
+
+
+def full_region(image: FirmwareImage) -> FlashRegion:
+    """Весь образ одной загрузкой (стирается вся область памяти)."""
+    return FlashRegion(0, len(image), image.padded_length)
+
+
+def delta_regions(image: FirmwareImage, flashed_hashes: tuple[bytes, ...] | list[bytes]) -> list[FlashRegion]:
+    """
+    Участки, где image отличается от прошитого образа с хэшами блоков flashed_hashes.
+
+    Соседние измененные блоки объединяются в один участок, блоки, которые есть
+    только в прошитом образе, стираются без записи. Пустой список - образ уже прошит.
+    """
+    own = image.block_hashes
+    changed = [index for index, digest in enumerate(own)
+               if index >= len(flashed_hashes) or flashed_hashes[index] != digest]
+    changed.extend(range(len(own), len(flashed_hashes)))
+
+    runs: list[list[int]] = []
+    for index in changed:
+        if runs and index - runs[-1][1] <= MERGE_GAP_BLOCKS:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+
+    regions = []
+    for first, last in runs:
+        offset = first * FIRMWARE_BLOCK_SIZE
+        end = last * FIRMWARE_BLOCK_SIZE
+        regions.append(FlashRegion(offset, max(0, min(end, len(image)) - offset), end - offset))
+    return regions
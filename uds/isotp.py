@@ -0,0 +1,41 @@
+# Общие константы транспорта ISO-TP (ISO 15765-2)
+
+# Тип кадра ISO-TP (старшая тетрада PCI)
+ISOTP_SINGLE = 0x0
+ISOTP_FIRST = 0x1
+ISOTP_CONSECUTIVE = 0x2
+ISOTP_FLOW_CONTROL = 0x3
+
+# Flow Status кадра Flow Control
+FC_CONTINUE_TO_SEND = 0
+FC_WAIT = 1
+FC_OVERFLOW = 2
+
+PAD_BYTE = 0xFF
+
+# Полезных байт в Consecutive Frame
+CF_DATA_LENGTH = 7
+
+
+def decode_st_min(value: int) -> float:
+    """STmin кадра Flow Control в секундах (0x00-0x7F мс, 0xF1-0xF9 сотни мкс)."""
+    if value <= 0x7F:
+        return value / 1000.0
+    if 0xF1 <= value <= 0xF9:
+        return (value - 0xF0) / 10000.0
+    # Зарезервированные значения трактуются как максимум
+    return 0.127
+
+
+# Наибольшая длина сообщения в 12-битном поле First Frame; длиннее - escape FF с 32-битной длиной
+FF_MAX_LENGTH_12BIT = 0xFFF
+FF_MAX_LENGTH_32BIT = 0xFFFFFFFF
+
+
+def first_frame_pci(length: int) -> bytes:
+    """PCI First Frame: 2 байта для длины до 4095, иначе escape (0x10 0x00) и 4 байта длины."""
+    if not 0 < length <= FF_MAX_LENGTH_32BIT:
+        raise ValueError(f"Длина сообщения ISO-TP {length} вне диапазона")
+    if length <= FF_MAX_LENGTH_12BIT:
+        return bytes(((ISOTP_FIRST << 4) | (length >> 8), length & 0xFF))
+    return bytes(((ISOTP_FIRST << 4), 0x00)) + length.to_bytes(4, "big")
@@ -1,6 +1,6 @@
 import enum
 
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -18,7 +18,7 @@ class ServiceEcuReset:
         self._sid = 0x11
 
     def ecu_uds_reset(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x02,
@@ -27,7 +27,7 @@ class ServiceEcuReset:
              0xff, 0xff, 0xff, 0xff, 0xff])
 
     def ecu_software_reset(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x02,
@@ -1,6 +1,7 @@
 from typing import Optional
 
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.TxQueue import TxPriority
 from uds.data_identifiers import UdsVar
 from uds.uds_identifiers import UdsIdentifiers
 
@@ -43,19 +44,21 @@ class ServiceReadDataById:
     def read_data(self, var: UdsVar):
         self._pid_request = var.pid
         pid_b0, pid_b1 = self._pid_to_bytes(var.pid)
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x03, self._sid, pid_b0, pid_b1, 0xFF, 0xFF, 0xFF, 0xFF],
         )
 
-    def read_data_by_identifier(self, tx_identifier: Optional[int], var: UdsVar):
+    def read_data_by_identifier(self, tx_identifier: Optional[int], var: UdsVar,
+                                priority: TxPriority = TxPriority.DIAGNOSTIC):
         self._pid_request = var.pid
         pid_b0, pid_b1 = self._pid_to_bytes(var.pid)
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             tx_identifier,
             8,
             [0x03, self._sid, pid_b0, pid_b1, 0xFF, 0xFF, 0xFF, 0xFF],
+            priority,
         )
 
     def parse_pid_field(self, data):
@@ -1,22 +1,43 @@
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
 class ServiceRequestDownload:
+    # Начало и размер области основной программы во flash ЭБУ
+    MEMORY_ADDRESS = 0x08000000 + 1024 * 30
+    MAX_MEMORY_LENGTH = 1024 * 80
+
     def __init__(self):
         self._sid = 0x34
         self._data_length = 0x0B
         self._data_format_id = 0x00
         self._addr_and_len_id = 0x44
 
-        self._memory_addr = 0x08000000 + 1024 * 30
+        self._memory_addr = self.MEMORY_ADDRESS
         self._memory_length = 0
-        self._max_memory_length = 1024 * 80
+        self._max_memory_length = self.MAX_MEMORY_LENGTH
+        self._max_block_length = 0
         self._counter = 0
 
         # Transfer format for multibyte address/length fields.
         self._byte_order = "big"
 
+    @property
+    def memory_address(self) -> int:
+        return self._memory_addr
+
+    @property
+    def max_memory_length(self) -> int:
+        return self._max_memory_length
+
+    @property
+    def max_block_length(self) -> int:
+        """maxNumberOfBlockLength из последнего положительного ответа, 0 - ЭБУ его не сообщил."""
+        return self._max_block_length
+
+    def set_memory_address(self, memory_address: int):
+        self._memory_addr = int(memory_address) & 0xFFFFFFFF
+
     def set_memory_length(self, memory_length):
         if memory_length > self._max_memory_length:
             self._memory_length = self._max_memory_length
@@ -51,7 +72,7 @@ class ServiceRequestDownload:
 
     def request_download_first(self):
         addr = self._u32_to_bytes(self._memory_addr)
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [
@@ -69,7 +90,7 @@ class ServiceRequestDownload:
     def request_download_consecutive(self):
         addr = self._u32_to_bytes(self._memory_addr)
         length = self._u32_to_bytes(self._memory_length)
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [
@@ -88,5 +109,21 @@ class ServiceRequestDownload:
         sid = data[1]
         positive_sid = self._sid + 0x40
         if sid == positive_sid:
+            self._max_block_length = self.parse_max_block_length(data)
             return True
         return False
+
+    @staticmethod
+    def parse_max_block_length(data) -> int:
+        """
+        maxNumberOfBlockLength из single frame ответа [длина, 0x74, lengthFormatIdentifier, ...]:
+        старшая тетрада lengthFormatIdentifier - число байт значения (big-endian).
+        """
+        if len(data) < 3:
+            return 0
+        length_size = data[2] >> 4
+        end = 3 + length_size
+        # Значение должно уместиться в объявленную длину single frame
+        if length_size == 0 or end > len(data) or end > (data[0] & 0x0F) + 1:
+            return 0
+        return int.from_bytes(bytes(data[3:end]), "big")
@@ -1,4 +1,4 @@
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -7,7 +7,7 @@ class ServiceRequestTransferExit:
         self._sid = 0x37
 
     def request_transfer_exit(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x01,
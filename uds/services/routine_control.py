@@ -1,4 +1,4 @@
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -7,9 +7,23 @@ class ServiceRoutineControl:
         self._sid = 0x31
         self._pid_start_routine = 0x01
         self._id_erase_memory = 0x00ff
+        self._addr_and_len_id = 0x44
+
+        self._erase_address = 0
+        self._erase_length = 0
+
+        # Transfer format for multibyte address/length fields.
+        self._byte_order = "big"
+
+    def set_byte_order(self, byte_order: str):
+        order = str(byte_order).strip().lower()
+        self._byte_order = order if order in ("big", "little") else "big"
+
+    def _u32_to_bytes(self, value: int) -> list[int]:
+        return list((int(value) & 0xFFFFFFFF).to_bytes(4, "little" if self._byte_order == "little" else "big"))
 
     def request_erase_firmware(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x04,                      # Single Frame, длина запроса
@@ -18,6 +32,41 @@ class ServiceRoutineControl:
              self._id_erase_memory & 0x00ff, self._id_erase_memory >> 8,  # ID Routine: Erase Memory (0xFF00)
              0xff, 0xff, 0xff])
 
+    def request_erase_region_first(self, address: int, length: int):
+        """
+        Erase Memory только для области [address, address + length): в запросе
+        addressAndLengthFormatIdentifier, адрес и длина (13 байт, First Frame + один CF).
+        Не стандартная форма рутины 0xFF00: загрузчик должен подтвержденно ее поддерживать,
+        иначе он ответит NRC или, отбросив параметры, сотрет всю область программы.
+        """
+        self._erase_address = address
+        self._erase_length = length
+        addr = self._u32_to_bytes(self._erase_address)
+        BaseCanDevice.active().send_async(
+            UdsIdentifiers.tx.identifier,
+            8,
+            [0x10,                      # first frame
+             0x0D,                      # data length
+             self._sid,
+             self._pid_start_routine,
+             self._id_erase_memory & 0x00ff, self._id_erase_memory >> 8,
+             self._addr_and_len_id,
+             addr[0]])
+
+    def request_erase_region_consecutive(self):
+        addr = self._u32_to_bytes(self._erase_address)
+        length = self._u32_to_bytes(self._erase_length)
+        BaseCanDevice.active().send_async(
+            UdsIdentifiers.tx.identifier,
+            8,
+            [0x21,
+             addr[1], addr[2], addr[3],
+             length[0], length[1], length[2], length[3]])
+
+    def verify_flow_control(self, data) -> bool:
+        frame_type = data[0] >> 4 & 0x0F
+        return frame_type == 3
+
     def verify_answer_erase_firmware(self, data) -> bool:
         data_length = data[0]
         positive_sid = self._sid + 0x40
@@ -29,4 +78,3 @@ class ServiceRoutineControl:
                 if id_routine == self._id_erase_memory:
                     return True
         return False
-
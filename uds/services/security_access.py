@@ -1,4 +1,4 @@
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -16,7 +16,7 @@ class ServiceSecurityAccess:
         return (self._seed ^ 0xAA55) | self._seed
 
     def request_seed(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x02,              # Single Frame, длина запроса
@@ -25,7 +25,7 @@ class ServiceSecurityAccess:
              0xff, 0xff, 0xff, 0xff, 0xff])
 
     def request_check_key(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x04,                                  # Single Frame, длина запроса
@@ -35,7 +35,7 @@ class ServiceSecurityAccess:
              0xff, 0xff, 0xff])
 
     def get_session(self):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x03,          # Single Frame, 3 байта длина запроса
@@ -1,6 +1,6 @@
 from enum import IntEnum
 
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -29,7 +29,7 @@ class ServiceSession:
         return self._verify_state
 
     def set(self, session: Session):
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x02,      # Single Frame, data length
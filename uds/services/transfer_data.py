@@ -1,10 +1,12 @@
-import math
+from PySide6.QtCore import QObject, Signal
 
-from PySide6.QtCore import QTimer, QObject, Signal
-
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.TxQueue import TxPriority
 from dataclasses import dataclass
 
+from uds.firmware_cache import FirmwareImage
+from uds.isotp import FC_CONTINUE_TO_SEND, FF_MAX_LENGTH_32BIT, decode_st_min
+from uds.transfer_plan import BLOCK_HEADER_LENGTH, TransferBlock, TransferPlan
 from uds.uds_identifiers import UdsIdentifiers
 
 
@@ -19,128 +21,143 @@ class FlowControl:
 class ServiceTransferData(QObject):
     signal_data_sent = Signal(int)  # bytes
 
+    # Длина блока до ответа RequestDownload и для ЭБУ, не сообщивших maxNumberOfBlockLength:
+    # буфер приёма загрузчика 2050 байт (1024 байт полезных данных + sid и block_sequence)
+    DEFAULT_MAX_BLOCK_LENGTH = 1026
+
     def __init__(self):
         super().__init__()
 
         self._sid = 0x36  # RequestDownload SID запроса
 
-        self._timer = QTimer()
-        self._timer.timeout.connect(self._send_consecutive_frame)
-
-        self._binary_content_size = 0
-        self._binary_content = None
-        self._bytes_sent = 0
+        self._plan: TransferPlan | None = None
+        self._block_index = -1
+        self._frame_cursor = 0  # индекс следующего кадра плана
+        self._bytes_sent = 0  # байт сообщения текущего блока
         self._total_bytes_sent = 0
-        self._index_binary_content = 0
 
         self._block_sequence = 0  # счетчик последовательности блоков в сервисе TransferData (0x36)
-        self._frame_number = 0  # номер фрейма в Consecutive Frame
 
         self._flow_control: FlowControl = FlowControl(0, 0, 0, 0)
-        # Берем максимальное количество байт для передачи данных в одной последовательности
-        # так как на приёмной стороне буфер 2050 байт
-        # (1024 байт полезных данных + 2 байта служебные (sid и block_sequence))
-        self._ff_max_data_length = 1026
-        self._ff_data_length = 0
-
-    def set_firmware(self, binary_content: bytes):
-        self._binary_content = binary_content
-        self._binary_content_size = len(self._binary_content)
-        # Учитываем, что для каждого блока (_ff_max_data_length) еще по 2 байта служебной информации в виде sid и block_sequence
-        num_of_blocks = math.ceil(self._binary_content_size / self._ff_max_data_length)
-        self._binary_content_size += num_of_blocks * 2
-
-    def _form_first_message(self, data_length) -> list | None:
-        if self._binary_content is None:
-            return None
-
-        self._block_sequence += 1
-
-        message = [
-            0x10 | ((data_length >> 8) & 0xf),
-            data_length & 0xff,
-            self._sid,
-            self._block_sequence]
-
-        data = [0xff, 0xff, 0xff, 0xff]
-        if data_length > 4:
-            data_length = 4
-        for i in range(data_length):
-            data[i] = self._binary_content[self._index_binary_content + i]
-        message += data
-
-        self._frame_number = 0
-
-        if data_length < 4:
-            self._index_binary_content += data_length
-            # self._sid + self._block_sequence + data_length
-            self._total_bytes_sent += data_length + 2
-            self._bytes_sent = data_length + 2
+        # Максимальная длина сообщения TransferData (sid + block_sequence + данные),
+        # после RequestDownload - maxNumberOfBlockLength из ответа ЭБУ
+        self._max_block_length = self.DEFAULT_MAX_BLOCK_LENGTH
+
+    @property
+    def plan(self) -> TransferPlan | None:
+        return self._plan
+
+    @property
+    def sid(self) -> int:
+        return self._sid
+
+    @property
+    def max_block_length(self) -> int:
+        return self._max_block_length
+
+    def set_max_block_length(self, max_block_length: int) -> bool:
+        """
+        Длина блока для следующих планов; 0 и значения, не вмещающие данные, -
+        DEFAULT_MAX_BLOCK_LENGTH. Возвращает True, если длина изменилась.
+        """
+        max_block_length = min(int(max_block_length), FF_MAX_LENGTH_32BIT)
+        if max_block_length <= BLOCK_HEADER_LENGTH:
+            max_block_length = self.DEFAULT_MAX_BLOCK_LENGTH
+        changed = max_block_length != self._max_block_length
+        self._max_block_length = max_block_length
+        return changed
+
+    def set_plan(self, plan: TransferPlan):
+        """Передача по готовому плану, например участка образа при дельта-прошивке."""
+        self._plan = plan
+        self.reset_transfer()
+
+    def set_firmware(self, firmware: FirmwareImage | bytes):
+        # Кадры всех блоков готовятся один раз, при отправке только выбираются из плана
+        if isinstance(firmware, FirmwareImage):
+            self._plan = firmware.plan(self._sid, self._max_block_length)
         else:
-            self._index_binary_content += 4
-            # self._sid + self._block_sequence + data = 6 bytes
-            self._total_bytes_sent += 6
-            self._bytes_sent = 6
+            self._plan = TransferPlan(firmware, self._sid, self._max_block_length)
+        self.reset_transfer()
+
+    @property
+    def block_index(self) -> int:
+        """Индекс текущего (последнего начатого) блока плана, -1 - передача не начата."""
+        return self._block_index
+
+    def seek_block(self, block_index: int):
+        """Следующий send_first_frame отправит блок block_index (продолжение прерванной передачи)."""
+        self.reset_transfer()
+        if self._plan is None or not 0 <= block_index < len(self._plan.blocks):
+            return
+        block = self._plan.blocks[block_index]
+        self._block_index = block_index - 1
+        self._frame_cursor = block.first_frame
+        self._total_bytes_sent = block.message_offset
 
-        # print(list(map(hex, data)), self._total_bytes_sent)
+    def _current_block(self) -> TransferBlock | None:
+        if self._plan is None or not 0 <= self._block_index < len(self._plan.blocks):
+            return None
+        return self._plan.blocks[self._block_index]
 
-        return message
+    def _advance(self, block: TransferBlock, frames_count: int):
+        self._frame_cursor += frames_count
+        self._bytes_sent = self._plan.block_bytes_sent(block, self._frame_cursor - block.first_frame)
+        self._total_bytes_sent = block.message_offset + self._bytes_sent
 
     def block_transferred(self) -> bool:
-        return self._bytes_sent == self._ff_data_length
+        block = self._current_block()
+        return block is not None and self._bytes_sent == block.data_length
 
     def data_transferred(self):
-        return self._total_bytes_sent == self._binary_content_size
+        return self._plan is not None and self._total_bytes_sent == self._plan.message_length
 
     def send_first_frame(self) -> int:
-        if self._total_bytes_sent + self._ff_max_data_length < self._binary_content_size:
-            self._ff_data_length = self._ff_max_data_length
-        else:
-            self._ff_data_length = self._binary_content_size - self._total_bytes_sent
+        if self._plan is None or self._block_index + 1 >= len(self._plan.blocks):
+            return 0
+
+        self._block_index += 1
+        block = self._plan.blocks[self._block_index]
+        self._block_sequence = block.sequence
+        self._frame_cursor = block.first_frame
+        self._advance(block, 1)
 
-        first_frame = self._form_first_message(self._ff_data_length)
-        CanDevice.instance().send_async(UdsIdentifiers.tx.identifier, 8, first_frame)
+        BaseCanDevice.active().send_async(UdsIdentifiers.tx.identifier, 8,
+                                          self._plan.frames[block.first_frame], TxPriority.FLASHING)
 
         self.signal_data_sent.emit(self._total_bytes_sent)
 
-        # 2 байта - служебная информация (sid, block_sequence)
-        return self._ff_data_length - 2
+        return block.payload_length
 
     def send_consecutive_frames(self):
+        """
+        Отправляет очередную серию CF: до block_size кадров (0 - до конца блока)
+        подряд с паузой STmin из Flow Control. Серию выдерживает поток передачи
+        устройства, а не таймер Qt, поэтому скорость ограничена шиной и STmin ЭБУ.
+        """
         if self._flow_control is None:
             return
-        if self._flow_control.block_size == 0:
+        if self._flow_control.flow_status != FC_CONTINUE_TO_SEND:
+            # WAIT: ЭБУ пришлет следующий Flow Control
+            return
+        block = self._current_block()
+        if block is None:
             return
-        if self._flow_control.sep_time > 0:
-            self._timer.start(self._flow_control.sep_time)
-        else:
-            self._timer.start(10)
-
-    def _send_consecutive_frame(self):
-        self._frame_number += 1
-        if self._frame_number > 0xf:
-            self._frame_number = 0
-        data_length = 7
-        if self._bytes_sent + data_length > self._ff_data_length:
-            data_length = self._ff_data_length - self._bytes_sent
-
-        frame = [0x20 | self._frame_number, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff]
-        for i in range(data_length):
-            frame[i + 1] = self._binary_content[self._index_binary_content + i]
-
-        self._index_binary_content += data_length
-        self._total_bytes_sent += data_length
-        self._bytes_sent += data_length
 
-        # print(list(map(hex, frame)), self._total_bytes_sent)
+        frames_left = block.first_frame + block.frame_count - self._frame_cursor
+        if self._flow_control.block_size > 0:
+            frames_left = min(frames_left, self._flow_control.block_size)
+        if frames_left <= 0:
+            return
 
-        CanDevice.instance().send_async(UdsIdentifiers.tx.identifier, 8, frame)
+        identifier = UdsIdentifiers.tx.identifier
+        frames = [(identifier, 8, frame)
+                  for frame in self._plan.frames[self._frame_cursor:self._frame_cursor + frames_left]]
+        self._advance(block, frames_left)
+        BaseCanDevice.active().send_burst(frames, decode_st_min(self._flow_control.sep_time), TxPriority.FLASHING)
 
         self.signal_data_sent.emit(self._total_bytes_sent)
 
-        if self._bytes_sent >= self._ff_data_length:
-            self._timer.stop()
-
     def verify_answer_after_sent_block(self, data) -> bool:
         frame_type = data[0] >> 4 & 0x0f
         status = data[1]
@@ -166,5 +183,8 @@ class ServiceTransferData(QObject):
         return False
 
     def reset_transfer(self):
+        self._block_index = -1
+        self._frame_cursor = 0
+        self._bytes_sent = 0
         self._total_bytes_sent = 0
-        self._frame_number = 0
+        self._block_sequence = 0
@@ -1,4 +1,4 @@
-from app_can.CanDevice import CanDevice
+from app_can.BaseCanDevice import BaseCanDevice
 from uds.data_identifiers import UdsData, UdsVar
 from uds.uds_identifiers import UdsIdentifiers
 
@@ -44,7 +44,7 @@ class ServiceWriteDataById:
                 frame.append(0xFF)
 
         identifier = UdsIdentifiers.tx.identifier if tx_identifier is None else int(tx_identifier)
-        CanDevice.instance().send_async(identifier, 8, frame)
+        BaseCanDevice.active().send_async(identifier, 8, frame)
         return True
 
     def verify_answer_write_data(self, response_data) -> bool:
@@ -55,7 +55,7 @@ class ServiceWriteDataById:
 
     def write_fingerprint(self, value: int):
         pid_b0, pid_b1 = self._pid_to_bytes(UdsData.fingerprint.pid)
-        CanDevice.instance().send_async(
+        BaseCanDevice.active().send_async(
             UdsIdentifiers.tx.identifier,
             8,
             [0x04, self._sid, pid_b0, pid_b1, value, 0xFF, 0xFF, 0xFF],
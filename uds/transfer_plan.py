@@ -0,0 +1,144 @@
+import math
+import zlib
+from dataclasses import dataclass
+
+from uds.isotp import CF_DATA_LENGTH, FF_MAX_LENGTH_32BIT, ISOTP_CONSECUTIVE, PAD_BYTE, first_frame_pci
+
+# Размер кадра CAN в плане
+FRAME_SIZE = 8
+# SID и blockSequenceCounter в начале каждого сообщения TransferData
+BLOCK_HEADER_LENGTH = 2
+
+
+def first_frame_message_length(data_length: int) -> int:
+    """Байт сообщения длиной data_length в First Frame: 6 при 12-битной длине, 2 при escape."""
+    return FRAME_SIZE - len(first_frame_pci(data_length))
+
+
+@dataclass(frozen=True)
+class TransferBlock:
+    sequence: int           # blockSequenceCounter (1, 2, ... 0xFF, 0x00, ...)
+    image_offset: int       # смещение данных блока в образе
+    data_length: int        # длина сообщения TransferData: SID + счетчик + данные
+    message_offset: int     # сумма data_length предыдущих блоков
+    first_frame: int        # индекс FF блока в плане
+    frame_count: int        # FF + все CF блока
+
+    @property
+    def payload_length(self) -> int:
+        return self.data_length - BLOCK_HEADER_LENGTH
+
+
+class TransferPlan:
+    """
+    Образ прошивки, заранее разрезанный на кадры TransferData (0x36).
+
+    Все кадры лежат подряд в одном bytearray по FRAME_SIZE байт: для каждого
+    блока First Frame и его Consecutive Frames с PCI, SID, счетчиком блока и
+    заполнением PAD_BYTE. Отправка берет готовые memoryview кадров без
+    копирования данных; план неизменяем и не зависит от адреса ЭБУ.
+
+    Блоки длиннее 4095 байт (maxNumberOfBlockLength из ответа RequestDownload)
+    начинаются escape First Frame с 32-битной длиной: в нем после PCI
+    (6 байт) помещаются только SID и счетчик, данные идут с первого CF.
+    """
+
+    def __init__(self, image: bytes, sid: int = 0x36, max_block_length: int = 1026):
+        if max_block_length <= BLOCK_HEADER_LENGTH:
+            raise ValueError(f"max_block_length {max_block_length} не вмещает данные")
+        if max_block_length > FF_MAX_LENGTH_32BIT:
+            raise ValueError(f"max_block_length {max_block_length} больше длины сообщения ISO-TP")
+
+        self._image = bytes(image)
+        self._image_crc32 = zlib.crc32(self._image)
+        self._sid = int(sid) & 0xFF
+        self._max_block_length = int(max_block_length)
+
+        block_payload = self._max_block_length - BLOCK_HEADER_LENGTH
+        blocks: list[TransferBlock] = []
+        frame_index = 0
+        message_offset = 0
+        for number, image_offset in enumerate(range(0, len(self._image), block_payload)):
+            payload_length = min(block_payload, len(self._image) - image_offset)
+            data_length = payload_length + BLOCK_HEADER_LENGTH
+            ff_length = first_frame_message_length(data_length)
+            frame_count = 1 + math.ceil(max(data_length - ff_length, 0) / CF_DATA_LENGTH)
+            blocks.append(TransferBlock((number + 1) & 0xFF, image_offset, data_length,
+                                        message_offset, frame_index, frame_count))
+            frame_index += frame_count
+            message_offset += data_length
+        self._blocks = tuple(blocks)
+        self._message_length = message_offset
+
+        frames = bytearray([PAD_BYTE]) * (frame_index * FRAME_SIZE)
+        for block in self._blocks:
+            self._fill_block(frames, block)
+        self._frames = memoryview(bytes(frames))
+        self._frame_views = tuple(self._frames[i:i + FRAME_SIZE]
+                                  for i in range(0, len(self._frames), FRAME_SIZE))
+
+    def _fill_block(self, frames: bytearray, block: TransferBlock):
+        image = self._image
+        position = block.first_frame * FRAME_SIZE
+        end = block.image_offset + block.payload_length
+
+        header = first_frame_pci(block.data_length) + bytes((self._sid, block.sequence))
+        chunk = image[block.image_offset:min(block.image_offset + FRAME_SIZE - len(header), end)]
+        frames[position:position + len(header)] = header
+        frames[position + len(header):position + len(header) + len(chunk)] = chunk
+
+        offset = block.image_offset + len(chunk)
+        for number in range(1, block.frame_count):
+            position += FRAME_SIZE
+            chunk = image[offset:min(offset + CF_DATA_LENGTH, end)]
+            frames[position] = (ISOTP_CONSECUTIVE << 4) | (number & 0x0F)
+            frames[position + 1:position + 1 + len(chunk)] = chunk
+            offset += len(chunk)
+
+    @property
+    def image(self) -> bytes:
+        return self._image
+
+    @property
+    def image_crc32(self) -> int:
+        return self._image_crc32
+
+    def block_data(self, block: TransferBlock) -> memoryview:
+        """Данные блока без SID и счетчика (содержимое запроса TransferData)."""
+        return memoryview(self._image)[block.image_offset:block.image_offset + block.payload_length]
+
+    @property
+    def sid(self) -> int:
+        return self._sid
+
+    @property
+    def max_block_length(self) -> int:
+        return self._max_block_length
+
+    @property
+    def blocks(self) -> tuple[TransferBlock, ...]:
+        return self._blocks
+
+    @property
+    def message_length(self) -> int:
+        """Сумма длин всех сообщений TransferData: образ плюс заголовки блоков."""
+        return self._message_length
+
+    @property
+    def frame_bytes(self) -> memoryview:
+        """Все кадры плана подряд, только для чтения."""
+        return self._frames
+
+    @property
+    def frames(self) -> tuple[memoryview, ...]:
+        return self._frame_views
+
+    def __len__(self) -> int:
+        return len(self._frame_views)
+
+    def block_bytes_sent(self, block: TransferBlock, frames_sent: int) -> int:
+        """Байт сообщения блока, переданных первыми frames_sent кадрами."""
+        if frames_sent <= 0:
+            return 0
+        sent = first_frame_message_length(block.data_length) + (frames_sent - 1) * CF_DATA_LENGTH
+        return min(sent, block.data_length)
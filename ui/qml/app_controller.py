@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 import csv
 from copy import copy
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 import math
 from pathlib import Path
@@ -11,16 +12,22 @@ import time
 from PySide6.QtCore import QObject, Property, QThread, QTimer, QUrl, Signal, Slot
 from PySide6.QtGui import QColor
 
-from app_can.CanDevice import CanDevice
+from app_can.CanCapture import CAPTURE_SUFFIX, CaptureReader
+from app_can.BaseCanDevice import BaseCanDevice
+from app_can.CanJournal import CanJournal
 from colors import RowColor
 from j1939.j1939_can_identifier import J1939CanIdentifier
+from j1939.j1939_decode_cache import J1939DecodeCache
 from uds.data_identifiers import UdsData
 from uds.bootloader import Bootloader
 from uds.firmware import Firmware, FirmwareState
+from uds.firmware_cache import FirmwareCache
 from uds.services.ecu_reset import ServiceEcuReset
 from uds.services.read_data_by_id import ServiceReadDataById
 from uds.uds_identifiers import UdsIdentifiers
+from ui.qml.can_traffic_model import CanTrafficListModel
 from ui.qml.collector_csv_manager import CollectorCsvManager
+from ui.qml.collector_poll_scheduler import CollectorPollScheduler
 from ui.qml.app_controller_parts.can_traffic import AppControllerCanTrafficMixin
 from ui.qml.app_controller_parts.collector import AppControllerCollectorMixin
 
@@ -28,23 +35,26 @@ LOGGER = logging.getLogger(__name__)
 
 
 class FirmwareLoadWorker(QObject):
-    finished = Signal(str, bool, bytes, str)
+    finished = Signal(str, bool, object, str)  # path, success, FirmwareImage | None, error
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, cache: FirmwareCache):
         super().__init__()
         self._file_path = file_path
+        self._cache = cache
 
     @Slot()
     def run(self):
-        firmware = Firmware(self._file_path)
-        if firmware.state == FirmwareState.successfully_uploaded and firmware.binary_content is not None:
-            self.finished.emit(self._file_path, True, firmware.binary_content, "")
+        firmware = Firmware(self._file_path, self._cache)
+        if firmware.state == FirmwareState.successfully_uploaded and firmware.image is not None:
+            self.finished.emit(self._file_path, True, firmware.image, "")
             return
-        self.finished.emit(self._file_path, False, b"", "Не удалось открыть BIN файл.")
+        self.finished.emit(self._file_path, False, None, "Не удалось открыть BIN файл.")
 
 
 class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollectorMixin):
     CAN_FILTER_FIELDS = ("time", "dir", "frameId", "pgn", "src", "dst", "j1939", "dlc", "uds", "data")
+    # Fields derived from the CAN journal index key (identifier, direction, DLC).
+    CAN_INDEXED_FILTER_FIELDS = ("dir", "frameId", "pgn", "src", "dst", "dlc")
 
     devicesChanged = Signal()
     selectedDeviceIndexChanged = Signal()
@@ -59,6 +69,7 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     infoMessage = Signal(str, str)
     programmingActiveChanged = Signal()
     autoResetBeforeProgrammingChanged = Signal()
+    deltaFlashEnabledChanged = Signal()
     debugEnabledChanged = Signal()
     firmwareLoadingChanged = Signal()
     transferByteOrderIndexChanged = Signal()
@@ -68,18 +79,24 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     udsIdentifiersChanged = Signal()
     observedUdsCandidateChanged = Signal()
     canJournalEnabledChanged = Signal()
+    canJournalCapacityChanged = Signal()
+    canCaptureChanged = Signal()
+    canCaptureViewChanged = Signal()
     autoDetectEnabledChanged = Signal()
     collectorNodesChanged = Signal()
     collectorOutputDirectoryChanged = Signal()
     collectorPollIntervalChanged = Signal()
     collectorCyclePauseChanged = Signal()
+    collectorMaxInFlightChanged = Signal()
+    collectorAdaptivePollingChanged = Signal()
+    collectorBusBudgetChanged = Signal()
     collectorStateChanged = Signal()
     collectorTrendChanged = Signal()
 
     def __init__(self):
         super().__init__()
 
-        self._can = CanDevice.instance()
+        self._can = BaseCanDevice.active()
         self._bootloader = Bootloader()
         self._bootloader.set_transfer_byte_order("big")
         self._ui_ecu_reset_service = ServiceEcuReset()
@@ -96,15 +113,28 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
 
         self._firmware_path = ""
         self._firmware = None
+        # Prepared images by content hash: reloading the same BIN skips reading and re-planning it.
+        self._firmware_cache = FirmwareCache(max_size=4)
         self._progress_value = 0
         self._progress_max = 1
 
         self._logs: list[dict[str, str]] = []
-        self._can_traffic_logs: list[dict[str, str]] = []
-        self._filtered_can_traffic_logs: list[dict[str, str]] = []
+        self._can_journal = CanJournal(capacity=100000)
+        # Display rows recently requested by the view (LRU), keyed by journal seq.
+        self._can_journal_rows: OrderedDict[int, dict[str, str]] = OrderedDict()
+        self._can_journal_row_cache_limit = 512
+        self._can_traffic_view_limit = 1500
+        # Visible (filtered) window; QML receives only inserted/removed rows.
+        self._can_traffic_model = CanTrafficListModel(self._can_journal_row, self._can_traffic_view_limit, self)
+        self._can_traffic_view_next_seq = 0
+        self._can_traffic_view_reset_pending = False
         self._can_filter_values: dict[str, str] = {field: "" for field in self.CAN_FILTER_FIELDS}
+        self._can_active_filters: dict[str, str] = {}
+        self._can_filter_key_matches: dict[int, bool] = {}
         self._can_filter_options: dict[str, list[str]] = {field: [] for field in self.CAN_FILTER_FIELDS}
         self._can_filter_option_seen: dict[str, set[str]] = {field: set() for field in self.CAN_FILTER_FIELDS}
+        self._can_filter_option_keys: set[int] = set()
+        self._can_filter_options_pending = False
         self._can_filter_option_limits: dict[str, int] = {
             "time": 60,
             "dir": 10,
@@ -119,6 +149,7 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         }
         self._programming_active = False
         self._auto_reset_before_programming = True
+        self._delta_flash_enabled = False
         self._auto_reset_delay_ms = 650
         self._pending_programming_after_reset = False
         self._debug_enabled = False
@@ -128,6 +159,9 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._source_address_busy = False
         self._source_address_operation = ""
         self._can_journal_enabled = True
+        self._can_capture_last_path = ""
+        self._can_capture_reader: CaptureReader | None = None
+        self._can_capture_page_index = 0
         self._auto_detect_enabled = True
         self._collector_read_service = ServiceReadDataById()
         self._collector_read_service.set_byte_order("big")
@@ -138,6 +172,8 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._collector_poll_interval_ms = 1000
         self._collector_cycle_pause_ms = 1000
         self._project_root_directory = self._resolve_project_root_directory()
+        # Block checkpoints let an interrupted flash continue instead of erasing again.
+        self._bootloader.set_checkpoint_directory(self._project_root_directory / "logs" / "flash_checkpoints")
         self._collector_output_directory = ""
         self._collector_output_is_session_dir = False
         default_collector_directory = self._project_root_directory / "logs"
@@ -146,8 +182,14 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._collector_session_dir: Path | None = None
         self._collector_csv_managers: dict[int, CollectorCsvManager] = {}
         self._collector_poll_vars = [UdsData.curr_fuel_tank, UdsData.raw_fuel_level, UdsData.raw_temperature]
-        self._collector_poll_node_index = 0
-        self._collector_poll_phase = 0
+        # Several nodes are polled at once; the timer only expires timeouts and fills idle slots.
+        self._collector_poll_scheduler = CollectorPollScheduler(
+            self._collector_poll_vars,
+            max_in_flight=8,
+            poll_interval_s=self._collector_poll_interval_ms / 1000.0,
+            cycle_pause_s=self._collector_cycle_pause_ms / 1000.0,
+        )
+        self._collector_poll_tick_ms = 20
         self._collector_trend_points: list[dict[str, object]] = []
         self._collector_trend_max_points = 180
         # Keep bounded per-node trend history to avoid unbounded memory and repaint cost.
@@ -179,6 +221,7 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._rx_src_text = ""
         self._rx_dst_text = ""
         self._rx_identifier_text = ""
+        self._j1939_decode_cache = J1939DecodeCache(max_size=1024)
         self._observed_node_stats: dict[int, dict[str, object]] = {}
         self._observed_candidate_order: list[int] = []
         self._observed_candidate_values: list[int] = []
@@ -190,6 +233,8 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._wall_origin = time.time()
         self._rx_time_anchor_raw: float | None = None
         self._rx_time_anchor_wall: float | None = None
+        self._wall_second_cached = -1
+        self._wall_second_text = ""
 
         self._refresh_uds_identifier_texts(emit_signal=False)
 
@@ -202,21 +247,25 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         self._bootloader.signal_source_address_applied.connect(self._on_source_address_applied)
         self._bootloader.signal_source_address_read.connect(self._on_source_address_read)
 
-        self._can.signal_new_message.connect(self._on_can_message)
+        # Journal and auto-detect see every frame, the collector only diagnostic (PF=0xDA) frames.
+        self._can_journal_route = self._can.router.add_catch_all(self._on_can_messages, "journal")
+        self._collector_route = self._can.router.add_masked(
+            0x00DA0000, 0x00FF0000, self._on_collector_frames, "collector"
+        )
         self._can.signal_tracing_started.connect(self._on_trace_state_event)
         self._can.signal_tracing_stopped.connect(self._on_trace_state_event)
 
         self._can_filter_rebuild_timer = QTimer(self)
         self._can_filter_rebuild_timer.setSingleShot(True)
         self._can_filter_rebuild_timer.setInterval(90)
-        self._can_filter_rebuild_timer.timeout.connect(self._rebuild_can_traffic_view)
+        self._can_filter_rebuild_timer.timeout.connect(self._update_can_traffic_view)
 
         self._programming_start_timer = QTimer(self)
         self._programming_start_timer.setSingleShot(True)
         self._programming_start_timer.timeout.connect(self._start_programming_after_reset)
 
         self._collector_poll_timer = QTimer(self)
-        self._collector_poll_timer.setInterval(self._collector_poll_interval_ms)
+        self._collector_poll_timer.setInterval(self._collector_poll_tick_ms)
         self._collector_poll_timer.timeout.connect(self._on_collector_poll_tick)
         self._collector_poll_timer.start()
 
@@ -285,13 +334,15 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def logs(self):
         return self._logs
 
-    @Property("QVariantList", notify=canTrafficLogsChanged)
-    def canTrafficLogs(self):
-        return self._can_traffic_logs
+    @Property(QObject, constant=True)
+    def canTrafficModel(self):
+        return self._can_traffic_model
 
-    @Property("QVariantList", notify=canTrafficLogsChanged)
-    def filteredCanTrafficLogs(self):
-        return self._filtered_can_traffic_logs
+    @Property(int, notify=canTrafficLogsChanged)
+    def canTrafficJournalCount(self):
+        if self._can_capture_reader is not None:
+            return len(self._can_capture_reader)
+        return len(self._can_journal)
 
     @Property("QStringList", notify=canFilterOptionsChanged)
     def canFilterTimeOptions(self):
@@ -341,6 +392,10 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def autoResetBeforeProgramming(self):
         return self._auto_reset_before_programming
 
+    @Property(bool, notify=deltaFlashEnabledChanged)
+    def deltaFlashEnabled(self):
+        return self._delta_flash_enabled
+
     @Property(bool, notify=debugEnabledChanged)
     def debugEnabled(self):
         return self._debug_enabled
@@ -349,6 +404,43 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def canJournalEnabled(self):
         return self._can_journal_enabled
 
+    @Property(int, notify=canJournalCapacityChanged)
+    def canJournalCapacity(self):
+        return self._can_journal.capacity
+
+    @Property(bool, notify=canCaptureViewChanged)
+    def canCaptureViewActive(self):
+        return self._can_capture_reader is not None
+
+    @Property(str, notify=canCaptureViewChanged)
+    def canCaptureViewText(self):
+        reader = self._can_capture_reader
+        if reader is None:
+            return ""
+        first = self._format_wall_time_us(reader.first_timestamp_us)
+        last = self._format_wall_time_us(reader.last_timestamp_us)
+        text = f"{reader.path.name}: {len(reader)} кадров, {first} - {last}"
+        if reader.truncated:
+            text += " (файл не дописан)"
+        return text
+
+    @Property(int, notify=canCaptureViewChanged)
+    def canCapturePageIndex(self):
+        return self._can_capture_page_index
+
+    @Property(int, notify=canCaptureViewChanged)
+    def canCapturePageCount(self):
+        return self._can_capture_page_count()
+
+    @Property(bool, notify=canCaptureChanged)
+    def canCaptureActive(self):
+        return self._can.capture is not None
+
+    @Property(str, notify=canCaptureChanged)
+    def canCapturePath(self):
+        capture = self._can.capture
+        return str(capture.path) if capture is not None else self._can_capture_last_path
+
     @Property(bool, notify=autoDetectEnabledChanged)
     def autoDetectEnabled(self):
         return self._auto_detect_enabled
@@ -445,6 +537,18 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def collectorCyclePauseMs(self):
         return self._collector_cycle_pause_ms
 
+    @Property(int, notify=collectorMaxInFlightChanged)
+    def collectorMaxInFlight(self):
+        return self._collector_poll_scheduler.max_in_flight
+
+    @Property(bool, notify=collectorAdaptivePollingChanged)
+    def collectorAdaptivePolling(self):
+        return self._collector_poll_scheduler.adaptive
+
+    @Property(int, notify=collectorBusBudgetChanged)
+    def collectorBusBudgetFps(self):
+        return int(self._collector_poll_scheduler.bus_budget_fps)
+
     @Property(str, notify=collectorStateChanged)
     def collectorStateText(self):
         if self._collector_state == "recording":
@@ -518,6 +622,127 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         else:
             self._append_log("CAN journal capture paused.", RowColor.yellow)
 
+    @Slot(bool)
+    def setCanCaptureEnabled(self, enabled):
+        value = bool(enabled)
+        if (self._can.capture is not None) == value:
+            return
+
+        if not value:
+            self.stopCanCapture()
+            return
+
+        capture_dir = Path(self._collector_output_directory) / "captures"
+        file_name = f"can_{datetime.now().strftime('%Y%m%d_%H%M%S')}{CAPTURE_SUFFIX}"
+        try:
+            capture = self._can.start_capture(str(capture_dir / file_name))
+        except Exception as err:
+            self.infoMessage.emit("Запись CAN", f"Не удалось начать запись трафика: {err}")
+            return
+        self._can_capture_last_path = str(capture.path)
+        self.canCaptureChanged.emit()
+        self._append_log(f"Запись CAN-трафика: {capture.path}", RowColor.blue)
+
+    @Slot(str)
+    def openCanCaptureFile(self, path_or_url):
+        file_path = self._to_local_path(path_or_url)
+        if not file_path:
+            return
+        try:
+            reader = CaptureReader(file_path)
+        except (OSError, ValueError) as err:
+            self.infoMessage.emit("Запись CAN", f"Не удалось открыть файл записи: {err}")
+            return
+
+        self._close_can_capture_reader()
+        self._can_capture_reader = reader
+        self._can_capture_page_index = 0
+        self._can_journal_rows.clear()
+        self.canCaptureViewChanged.emit()
+        self._rebuild_can_traffic_view()
+        self._append_log(f"Открыт файл записи CAN: {reader.path} ({len(reader)} кадров)", RowColor.blue)
+
+    @Slot()
+    def closeCanCaptureFile(self):
+        if self._can_capture_reader is None:
+            return
+        self._close_can_capture_reader()
+        self.canCaptureViewChanged.emit()
+        self._rebuild_can_traffic_view()
+
+    @Slot(int)
+    def showCanCapturePage(self, page_index):
+        if self._can_capture_reader is None:
+            return
+        page = max(0, min(int(page_index), self._can_capture_page_count() - 1))
+        if page == self._can_capture_page_index:
+            return
+        self._can_capture_page_index = page
+        self.canCaptureViewChanged.emit()
+        self._rebuild_can_traffic_view()
+
+    @Slot(str)
+    def seekCanCaptureTime(self, time_text):
+        reader = self._can_capture_reader
+        if reader is None or len(reader) == 0:
+            return
+        try:
+            clock = datetime.strptime(str(time_text).strip(), "%H:%M:%S").time()
+        except ValueError:
+            self.infoMessage.emit("Запись CAN", "Время указывается в формате ЧЧ:ММ:СС.")
+            return
+
+        first = datetime.fromtimestamp(reader.first_timestamp_us / 1000000.0)
+        target = datetime.combine(first.date(), clock)
+        if target < first.replace(microsecond=0):
+            # Ночная запись: время после полуночи относится к следующим суткам
+            target += timedelta(days=1)
+        index = reader.index_at_time(int(target.timestamp() * 1000000))
+        self.showCanCapturePage(min(index, len(reader) - 1) // self._can_traffic_view_limit)
+
+    def _close_can_capture_reader(self):
+        reader = self._can_capture_reader
+        if reader is None:
+            return
+        self._can_capture_reader = None
+        self._can_capture_page_index = 0
+        self._can_journal_rows.clear()
+        reader.close()
+
+    @Slot()
+    def stopCanCapture(self):
+        capture = self._can.stop_capture()
+        if capture is None:
+            return
+        self.canCaptureChanged.emit()
+        self._append_log(
+            f"Запись CAN-трафика остановлена: {capture.frames_written} кадров, потеряно {capture.dropped}",
+            RowColor.yellow if capture.dropped > 0 or capture.error else RowColor.green,
+        )
+
+    @Slot(str)
+    def setCanJournalCapacity(self, capacity_value):
+        try:
+            parsed = int(str(capacity_value).strip())
+        except (TypeError, ValueError):
+            self.infoMessage.emit("Журнал CAN", "Емкость журнала должна быть целым числом кадров.")
+            return
+
+        bounded = max(1000, min(CanJournal.MAX_CAPACITY, parsed))
+        if bounded != parsed:
+            self.infoMessage.emit("Журнал CAN", f"Емкость журнала ограничена диапазоном 1000..{CanJournal.MAX_CAPACITY}.")
+
+        if self._can_journal.capacity == bounded:
+            return
+
+        if self._can_filter_rebuild_timer.isActive():
+            self._can_filter_rebuild_timer.stop()
+        self._can_journal.capacity = bounded
+        self._can_journal_rows.clear()
+        self.canJournalCapacityChanged.emit()
+        self._rebuild_can_traffic_view()
+        self._append_log(f"Емкость журнала CAN: {bounded} кадров", RowColor.blue)
+
     @Slot(bool)
     def setAutoDetectEnabled(self, enabled):
         value = bool(enabled)
@@ -540,6 +765,17 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         state_text = "включен" if value else "отключен"
         self._append_log(f"Автосброс перед программированием: {state_text}", QColor("#0ea5e9"))
 
+    @Slot(bool)
+    def setDeltaFlashEnabled(self, enabled):
+        value = bool(enabled)
+        if self._delta_flash_enabled == value:
+            return
+        self._delta_flash_enabled = value
+        self._bootloader.set_delta_flash(value)
+        self.deltaFlashEnabledChanged.emit()
+        state_text = "включена" if value else "отключена"
+        self._append_log(f"Дельта-прошивка (только измененные блоки): {state_text}", QColor("#0ea5e9"))
+
     @Slot(int)
     def setTransferByteOrderIndex(self, index):
         try:
@@ -980,8 +1216,7 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
             return
 
         self._collector_poll_interval_ms = bounded
-        if self._collector_poll_phase == 1:
-            self._collector_poll_timer.setInterval(self._collector_poll_interval_ms)
+        self._collector_poll_scheduler.poll_interval_s = bounded / 1000.0
         self.collectorPollIntervalChanged.emit()
         self._append_log(f"Интервал UDS-опроса: {self._collector_poll_interval_ms} мс", RowColor.blue)
 
@@ -1001,11 +1236,68 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
             return
 
         self._collector_cycle_pause_ms = bounded
-        if self._collector_poll_phase == 0:
-            self._collector_poll_timer.setInterval(self._collector_cycle_pause_ms)
+        self._collector_poll_scheduler.cycle_pause_s = bounded / 1000.0
         self.collectorCyclePauseChanged.emit()
         self._append_log(f"Пауза между циклами UDS: {self._collector_cycle_pause_ms} мс", RowColor.blue)
 
+    @Slot(str)
+    def setCollectorMaxInFlight(self, count_value):
+        try:
+            parsed = int(str(count_value).strip())
+        except (TypeError, ValueError):
+            self.infoMessage.emit("Коллектор", "Число одновременных запросов должно быть целым.")
+            return
+
+        bounded = max(1, min(64, parsed))
+        if bounded != parsed:
+            self.infoMessage.emit("Коллектор", "Число одновременных запросов ограничено диапазоном 1..64.")
+
+        if self._collector_poll_scheduler.max_in_flight == bounded:
+            return
+
+        self._collector_poll_scheduler.max_in_flight = bounded
+        self.collectorMaxInFlightChanged.emit()
+        self._append_log(f"Одновременных UDS-запросов: {bounded}", RowColor.blue)
+
+    @Slot(result="QVariantMap")
+    def collectorPollStats(self):
+        """Poll scheduler counters: requests, responses, changed values, timeouts, latency."""
+        return self._collector_poll_scheduler.stats()
+
+    @Slot(bool)
+    def setCollectorAdaptivePolling(self, enabled):
+        value = bool(enabled)
+        if self._collector_poll_scheduler.adaptive == value:
+            return
+        self._collector_poll_scheduler.adaptive = value
+        self.collectorAdaptivePollingChanged.emit()
+        if value:
+            self._append_log("Адаптивный UDS-опрос включен: частота по изменчивости и задержке узлов.", RowColor.green)
+        else:
+            self._append_log("Адаптивный UDS-опрос выключен.", RowColor.blue)
+
+    @Slot(str)
+    def setCollectorBusBudgetFps(self, budget_value):
+        try:
+            parsed = int(str(budget_value).strip())
+        except (TypeError, ValueError):
+            self.infoMessage.emit("Коллектор", "Бюджет шины должен быть целым числом кадров в секунду.")
+            return
+
+        bounded = max(0, min(8000, parsed))
+        if bounded != parsed:
+            self.infoMessage.emit("Коллектор", "Бюджет шины ограничен диапазоном 0..8000 кадров/с.")
+
+        if int(self._collector_poll_scheduler.bus_budget_fps) == bounded:
+            return
+
+        self._collector_poll_scheduler.bus_budget_fps = bounded
+        self.collectorBusBudgetChanged.emit()
+        if bounded > 0:
+            self._append_log(f"Бюджет шины для опроса: {bounded} кадров/с", RowColor.blue)
+        else:
+            self._append_log("Бюджет шины для опроса не ограничен.", RowColor.blue)
+
     @Slot()
     def startCollectorRecording(self):
         if self._collector_state == "recording":
@@ -1065,8 +1357,7 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def clearCollectorNodes(self):
         self._collector_nodes = {}
         self._collector_node_order = []
-        self._collector_poll_node_index = 0
-        self._collector_poll_phase = 0
+        self._collector_poll_scheduler.reset()
         self._collector_nodes_view = []
         self.collectorNodesChanged.emit()
         self._reset_collector_trend()
@@ -1133,7 +1424,8 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
     def clearCanTrafficLogs(self):
         if self._can_filter_rebuild_timer.isActive():
             self._can_filter_rebuild_timer.stop()
-        self._can_traffic_logs = []
+        self._can_journal.clear()
+        self._can_journal_rows.clear()
         self._rebuild_can_traffic_view()
 
     @Slot(str, str)
@@ -1203,6 +1495,8 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
             )
 
     def _on_trace_state_event(self):
+        if not self._can.is_trace:
+            LOGGER.info("J1939 decode cache: %s", self._j1939_decode_cache.stats())
         self._rx_time_anchor_raw = None
         self._rx_time_anchor_wall = None
         self.traceStateChanged.emit()
@@ -1232,29 +1526,33 @@ class AppController(QObject, AppControllerCanTrafficMixin, AppControllerCollecto
         else:
             self.infoMessage.emit("Протокол", "Не удалось прочитать Source Address.")
 
-    @Slot(str, bool, bytes, str)
-    def _on_firmware_loaded(self, _file_path, success, binary_content, error_text):
+    @Slot(str, bool, object, str)
+    def _on_firmware_loaded(self, _file_path, success, firmware, error_text):
         try:
             if not success:
                 self._append_log("Ошибка загрузки BIN файла", RowColor.red)
                 self.infoMessage.emit("Прошивка", error_text if error_text else "Не удалось открыть BIN файл.")
                 return
 
-            self._bootloader.set_firmware(binary_content)
+            self._firmware = firmware
+            self._bootloader.set_firmware(firmware)
 
-            file_size = len(binary_content)
+            file_size = len(firmware)
             self._progress_max = max(file_size, 1)
             self._progress_value = 0
             self.progressChanged.emit()
 
-            self._append_log(f"BIN файл загружен ({file_size} байт)", RowColor.green)
+            self._append_log(f"BIN файл загружен ({file_size} байт, CRC32 0x{firmware.crc32:08X})", RowColor.green)
+            if not firmware.fits_memory:
+                self._append_log(f"Образ ({firmware.padded_length} байт с выравниванием) больше области памяти "
+                                 f"{firmware.max_memory_length} байт", RowColor.yellow)
             self.infoMessage.emit("Прошивка", f"BIN файл успешно загружен. Размер: {file_size} байт.")
         finally:
             self._set_firmware_loading(False)
 
     def _start_firmware_loading(self, file_path: str):
         self._firmware_loader_thread = QThread(self)
-        self._firmware_loader_worker = FirmwareLoadWorker(file_path)
+        self._firmware_loader_worker = FirmwareLoadWorker(file_path, self._firmware_cache)
         self._firmware_loader_worker.moveToThread(self._firmware_loader_thread)
 
         self._firmware_loader_thread.started.connect(self._firmware_loader_worker.run)
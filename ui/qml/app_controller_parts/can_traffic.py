@@ -1,66 +1,58 @@
 from __future__ import annotations
 
 from datetime import datetime
+import heapq
 import time
 
 from PySide6.QtCore import Slot
 
-from j1939.j1939_can_identifier import J1939CanIdentifier
+from app_can.CanFrame import CanFrame
+from app_can.CanJournal import CanJournal
+from j1939.j1939_decode_cache import J1939DecodedId
 from uds.uds_identifiers import UdsIdentifiers
 
 
 class AppControllerCanTrafficMixin:
-    @Slot(str, str, str, str, list)
-    def _on_can_message(self, msg_time, msg_id, msg_dir, msg_dlc, msg_data):
-        try:
-            identifier = int(str(msg_id), 0)
-        except (TypeError, ValueError):
-            identifier = 0
-
-        direction = self._normalize_can_direction(msg_dir)
-        payload = []
-        if isinstance(msg_data, list):
-            for value in msg_data:
-                try:
-                    payload.append(int(value) & 0xFF)
-                except (TypeError, ValueError):
-                    continue
+    def _on_can_messages(self, frames):
+        observed_updated = False
+        journal_updated = False
+        for frame in frames:
+            observed, journaled = self._on_can_message(frame)
+            observed_updated = observed_updated or observed
+            journal_updated = journal_updated or journaled
+        # Candidate list and journal view are updated once per batch instead of once per frame.
+        if observed_updated:
+            self._rebuild_observed_candidate_list()
+        if journal_updated:
+            self._schedule_can_traffic_rebuild()
+
+    def _on_can_message(self, frame: CanFrame) -> tuple[bool, bool]:
+        is_rx = frame.is_rx
+        wall_time_us = self._can_wall_time_us(frame.timestamp_us, "RX" if is_rx else "TX")
+
+        observed_updated = False
+        if is_rx:
+            decoded = self._j1939_decode_cache.get(frame.identifier)
+            if self._auto_detect_enabled:
+                observed_updated = self._update_observed_uds_candidate(decoded, rebuild=False)
+            self._track_collector_node(wall_time_us, decoded)
 
-        data_hex = " ".join(f"{byte:02X}" for byte in payload)
-        formatted_time = self._format_can_time(msg_time, direction)
+        # Only raw fields are stored; display strings are built when a row is shown.
+        if self._can_journal_enabled:
+            self._can_journal.append_frame(frame, wall_time_us)
+            return observed_updated, True
+        return observed_updated, False
 
-        pgn_text = "-"
-        src_text = "-"
-        dst_text = "-"
-        j1939_text = "-"
-        parsed_id = None
-        try:
-            parsed_id = J1939CanIdentifier(int(identifier))
-            parsed_pgn = int(parsed_id.pgn) & 0x3FFFF
-            parsed_src = int(parsed_id.src) & 0xFF
-            parsed_dst = int(parsed_id.dst) & 0xFF
-
-            pgn_text = f"0x{parsed_pgn & 0xFFFF:04X}"
-            src_text = f"0x{parsed_src:02X}"
-            dst_text = f"0x{parsed_dst:02X}"
-            app_summary = self._parse_j1939_application_summary(parsed_pgn, payload)
-            if app_summary:
-                j1939_text = app_summary
-        except Exception:
-            pass
+    def _build_can_traffic_row(self, formatted_time: str, frame: CanFrame) -> dict[str, str]:
+        direction = frame.direction
+        payload = frame.payload
+        decoded = self._j1939_decode_cache.get(frame.identifier)
+        j1939_text = self._parse_j1939_application_summary(decoded.pgn, payload) or "-"
 
         uds_text = "-"
-        is_uds_frame = self._is_uds_identifier(identifier)
-        if (not is_uds_frame) and parsed_id is not None:
-            is_uds_frame = self._is_uds_diagnostic_pgn(int(parsed_id.pgn))
-        if is_uds_frame:
+        if decoded.is_uds_diagnostic or self._is_uds_pgn(decoded.pgn):
             uds_text = self._parse_isotp_summary(payload)
 
-        if direction == "RX" and parsed_id is not None:
-            if self._auto_detect_enabled:
-                self._update_observed_uds_candidate(parsed_id)
-            self._handle_collector_frame(formatted_time, parsed_id, payload)
-
         if direction == "TX":
             dir_color = "#1d4ed8"
             dir_bg = "#dbeafe"
@@ -74,45 +66,24 @@ class AppControllerCanTrafficMixin:
             dir_bg = "#e2e8f0"
             dir_border = "#cbd5e1"
 
-        row = {
+        return {
             "time": formatted_time,
             "dir": direction,
-            "frameId": f"0x{int(identifier) & 0x1FFFFFFF:08X}",
-            "pgn": pgn_text,
-            "src": src_text,
-            "dst": dst_text,
+            "frameId": f"0x{decoded.identifier:08X}",
+            "pgn": decoded.pgn_text,
+            "src": decoded.src_text,
+            "dst": decoded.dst_text,
             "j1939": j1939_text,
-            "dlc": str(msg_dlc),
+            "dlc": str(frame.dlc),
             "uds": uds_text,
-            "data": data_hex,
+            "data": payload.hex(" ").upper(),
             "dirColor": dir_color,
             "dirBg": dir_bg,
             "dirBorder": dir_border,
         }
-        if self._can_journal_enabled:
-            self._append_can_traffic_entry(row)
-    @staticmethod
-    def _normalize_can_direction(direction) -> str:
-        raw = str(direction).strip().upper()
-        if raw.startswith("T"):
-            return "TX"
-        if raw.startswith("R"):
-            return "RX"
-        return raw or "-"
-
-    def _format_can_time(self, raw_time, direction: str) -> str:
-        raw_text = str(raw_time).strip()
-        try:
-            value = float(raw_text)
-        except (TypeError, ValueError):
-            return raw_text
 
-        # Unix epoch in seconds.
-        if value >= 946684800.0:
-            try:
-                return datetime.fromtimestamp(value).strftime("%H:%M:%S.%f")[:-3]
-            except Exception:
-                return raw_text
+    def _can_wall_time_us(self, timestamp_us: int, direction: str) -> int:
+        value = timestamp_us / 1000000.0
 
         if direction == "RX":
             if (self._rx_time_anchor_raw is None) or (value < (self._rx_time_anchor_raw - 0.001)):
@@ -126,12 +97,28 @@ class AppControllerCanTrafficMixin:
             # TX timestamp comes from perf_counter().
             wall_ts = self._wall_origin + (value - self._perf_origin)
 
+        return int(wall_ts * 1000000)
+
+    @staticmethod
+    def _format_wall_time_us(wall_time_us: int) -> str:
         try:
-            return datetime.fromtimestamp(wall_ts).strftime("%H:%M:%S.%f")[:-3]
+            return datetime.fromtimestamp(wall_time_us / 1000000.0).strftime("%H:%M:%S.%f")[:-3]
         except Exception:
-            return raw_text
+            return str(wall_time_us)
+
+    def _format_can_time(self, timestamp_us: int, direction: str) -> str:
+        return self._format_wall_time_us(self._can_wall_time_us(timestamp_us, direction))
+
+    def _format_wall_time_seconds(self, wall_time_us: int) -> str:
+        # Called for every RX frame, so the text is rebuilt only when the second changes.
+        second = wall_time_us // 1000000
+        if second != self._wall_second_cached:
+            self._wall_second_cached = second
+            self._wall_second_text = self._format_wall_time_us(second * 1000000)[:8]
+        return self._wall_second_text
+
     @staticmethod
-    def _parse_isotp_summary(payload: list[int]) -> str:
+    def _parse_isotp_summary(payload: bytes) -> str:
         if not payload:
             return "-"
 
@@ -163,7 +150,7 @@ class AppControllerCanTrafficMixin:
 
         return f"ISO-TP PCI=0x{pci_type:X}"
     @staticmethod
-    def _parse_j1939_application_summary(pgn: int, payload: list[int]) -> str:
+    def _parse_j1939_application_summary(pgn: int, payload: bytes) -> str:
         if not payload:
             return ""
 
@@ -183,34 +170,37 @@ class AppControllerCanTrafficMixin:
 
         return ""
 
-    def _append_can_traffic_entry(self, row: dict[str, str]):
-        self._can_traffic_logs.append(row)
-        self._update_can_filter_options_with_row(row)
-        hard_limit = 5000
-        keep_tail = 1500
-        if len(self._can_traffic_logs) > hard_limit:
-            self._can_traffic_logs = self._can_traffic_logs[-keep_tail:]
-            self._can_traffic_logs.insert(
-                0,
-                {
-                    "time": datetime.now().strftime("%H:%M:%S"),
-                    "dir": "SYS",
-                    "frameId": "-",
-                    "pgn": "-",
-                    "src": "-",
-                    "dst": "-",
-                    "j1939": "-",
-                    "dlc": "-",
-                    "uds": "Автоочистка журнала",
-                    "data": f"Оставлены последние {keep_tail} записей",
-                    "dirColor": "#334155",
-                    "dirBg": "#e2e8f0",
-                    "dirBorder": "#cbd5e1",
-                },
-            )
-        self._schedule_can_traffic_rebuild()
+    def _can_view_frame(self, seq: int) -> CanFrame:
+        # While a capture file is open the view rows are record indexes of that file.
+        reader = self._can_capture_reader
+        if reader is not None:
+            return reader.frame(seq)
+        return self._can_journal.frame(seq)
+
+    def _format_can_journal_row(self, seq: int) -> dict[str, str]:
+        frame = self._can_view_frame(seq)
+        return self._build_can_traffic_row(self._format_wall_time_us(frame.timestamp_us), frame)
+
+    def _can_journal_row(self, seq: int) -> dict[str, str]:
+        # Small LRU of rows recently requested by the view.
+        rows = self._can_journal_rows
+        row = rows.get(seq)
+        if row is not None:
+            rows.move_to_end(seq)
+            return row
+
+        row = self._format_can_journal_row(seq)
+        rows[seq] = row
+        if len(rows) > self._can_journal_row_cache_limit:
+            rows.popitem(last=False)
+        if self._update_can_filter_options_with_row(row):
+            self._can_filter_options_pending = True
+        return row
 
     def _schedule_can_traffic_rebuild(self, restart: bool = False):
+        if restart:
+            # Filter change: the visible window is rebuilt from the journal.
+            self._can_traffic_view_reset_pending = True
         if self._can_filter_rebuild_timer.isActive():
             if restart:
                 self._can_filter_rebuild_timer.stop()
@@ -218,29 +208,144 @@ class AppControllerCanTrafficMixin:
             return
         self._can_filter_rebuild_timer.start()
 
-    def _rebuild_can_traffic_view(self):
+    def _normalized_can_filters(self) -> dict[str, str]:
         normalized_filters: dict[str, str] = {}
         for field in self.CAN_FILTER_FIELDS:
-            normalized_filters[field] = str(self._can_filter_values.get(field, "")).strip().lower()
-
-        has_filters = any(bool(value) for value in normalized_filters.values())
-        if not has_filters:
-            self._filtered_can_traffic_logs = list(self._can_traffic_logs)
+            value = str(self._can_filter_values.get(field, "")).strip().lower()
+            if value:
+                normalized_filters[field] = value
+        return normalized_filters
+
+    def _can_row_matches(self, seq: int, normalized_filters: dict[str, str]) -> bool:
+        # Rows scanned by the filter are not put into the display cache.
+        row = self._can_journal_rows.get(seq)
+        if row is None:
+            row = self._format_can_journal_row(seq)
+        for field, filter_value in normalized_filters.items():
+            value = str(row.get(field, "")).lower()
+            if filter_value not in value:
+                return False
+        return True
+
+    def _can_index_key_matches(self, key: int, indexed_filters: dict[str, str]) -> bool:
+        # Result per journal index key is cached until the filter set changes.
+        matched = self._can_filter_key_matches.get(key)
+        if matched is not None:
+            return matched
+
+        identifier, is_tx, dlc = CanJournal.split_index_key(key)
+        decoded = self._j1939_decode_cache.get(identifier)
+        values = {
+            "dir": "tx" if is_tx else "rx",
+            "frameId": f"0x{decoded.identifier:08x}",
+            "pgn": decoded.pgn_text.lower(),
+            "src": decoded.src_text.lower(),
+            "dst": decoded.dst_text.lower(),
+            "dlc": str(dlc),
+        }
+        matched = True
+        for field, filter_value in indexed_filters.items():
+            if filter_value not in values[field]:
+                matched = False
+                break
+        self._can_filter_key_matches[key] = matched
+        return matched
+
+    def _split_can_filters(self, filters: dict[str, str]) -> tuple[dict[str, str], dict[str, str]]:
+        indexed_filters: dict[str, str] = {}
+        row_filters: dict[str, str] = {}
+        for field, value in filters.items():
+            if field in self.CAN_INDEXED_FILTER_FIELDS:
+                indexed_filters[field] = value
+            else:
+                row_filters[field] = value
+        return indexed_filters, row_filters
+
+    def _select_can_traffic_seqs(self, seqs: range) -> list[int]:
+        limit = self._can_traffic_view_limit
+        filters = self._can_active_filters
+        if not filters:
+            return list(seqs[-limit:])
+
+        indexed_filters, row_filters = self._split_can_filters(filters)
+        journal = self._can_journal
+        if indexed_filters:
+            # Exact-field filters select index keys; only rows of those keys are visited.
+            keys = [key for key in journal.index_keys() if self._can_index_key_matches(key, indexed_filters)]
+            candidates = heapq.merge(*(journal.iter_indexed_reversed(key, seqs.start) for key in keys), reverse=True)
         else:
-            filtered: list[dict[str, str]] = []
-            for row in self._can_traffic_logs:
-                match = True
-                for field, filter_value in normalized_filters.items():
-                    if not filter_value:
-                        continue
-                    value = str(row.get(field, "")).lower()
-                    if filter_value not in value:
-                        match = False
-                        break
-                if match:
-                    filtered.append(row)
-            self._filtered_can_traffic_logs = filtered
+            candidates = reversed(seqs)
 
+        # Newest rows first, stop once the visible window is filled.
+        selected: list[int] = []
+        for seq in candidates:
+            if row_filters and not self._can_row_matches(seq, row_filters):
+                continue
+            selected.append(seq)
+            if len(selected) >= limit:
+                break
+        selected.reverse()
+        return selected
+
+    def _select_can_capture_page_seqs(self) -> list[int]:
+        # Filters are applied inside the current page of the capture file.
+        reader = self._can_capture_reader
+        limit = self._can_traffic_view_limit
+        start = self._can_capture_page_index * limit
+        seqs = range(start, min(start + limit, len(reader)))
+        filters = self._can_active_filters
+        if not filters:
+            return list(seqs)
+
+        indexed_filters, row_filters = self._split_can_filters(filters)
+        selected: list[int] = []
+        for seq in seqs:
+            if indexed_filters:
+                frame = reader.frame(seq)
+                key = CanJournal.index_key(frame.identifier, frame.flags, frame.dlc)
+                if not self._can_index_key_matches(key, indexed_filters):
+                    continue
+            if row_filters and not self._can_row_matches(seq, row_filters):
+                continue
+            selected.append(seq)
+        return selected
+
+    def _can_capture_page_count(self) -> int:
+        reader = self._can_capture_reader
+        if reader is None:
+            return 0
+        return max(1, -(-len(reader) // self._can_traffic_view_limit))
+
+    def _update_can_traffic_view(self):
+        if self._can_traffic_view_reset_pending:
+            self._rebuild_can_traffic_view()
+            return
+        if self._can_capture_reader is not None:
+            # Live frames keep going into the journal but the view shows the capture page.
+            return
+
+        # Only rows appended since the last update are tested and cross into the model.
+        journal = self._can_journal
+        new_seqs = journal.seqs(self._can_traffic_view_next_seq)
+        self._can_traffic_view_next_seq = journal.next_seq
+        self._can_traffic_model.remove_before(journal.first_seq)
+        self._can_traffic_model.append_seqs(self._select_can_traffic_seqs(new_seqs))
+        self._update_can_filter_options_from_index()
+        self.canTrafficLogsChanged.emit()
+
+    def _rebuild_can_traffic_view(self):
+        self._can_traffic_view_reset_pending = False
+        self._can_active_filters = self._normalized_can_filters()
+        self._can_filter_key_matches = {}
+        if self._can_capture_reader is not None:
+            self._can_traffic_model.reset_seqs(self._select_can_capture_page_seqs())
+            self.canTrafficLogsChanged.emit()
+            return
+
+        journal = self._can_journal
+        self._can_traffic_view_next_seq = journal.next_seq
+        self._can_traffic_model.reset_seqs(self._select_can_traffic_seqs(journal.seqs()))
+        self._update_can_filter_options_from_index()
         self.canTrafficLogsChanged.emit()
 
     def _normalize_filter_option_value(self, field: str, value: str) -> str:
@@ -263,9 +368,37 @@ class AppControllerCanTrafficMixin:
 
         return text
 
-    def _update_can_filter_options_with_row(self, row: dict[str, str]):
+    def _update_can_filter_options_from_index(self):
+        # Options of exact fields come from new journal index keys, free-text
+        # options from rows formatted for display (see _can_journal_row).
+        changed = self._can_filter_options_pending
+        self._can_filter_options_pending = False
+        seen_keys = self._can_filter_option_keys
+        for key in self._can_journal.index_keys():
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            identifier, is_tx, dlc = CanJournal.split_index_key(key)
+            decoded = self._j1939_decode_cache.get(identifier)
+            values = {
+                "dir": "TX" if is_tx else "RX",
+                "frameId": f"0x{decoded.identifier:08X}",
+                "pgn": decoded.pgn_text,
+                "src": decoded.src_text,
+                "dst": decoded.dst_text,
+                "dlc": str(dlc),
+            }
+            if self._update_can_filter_options_with_row(values):
+                changed = True
+
+        if changed:
+            self.canFilterOptionsChanged.emit()
+
+    def _update_can_filter_options_with_row(self, row: dict[str, str]) -> bool:
         changed = False
         for field in self.CAN_FILTER_FIELDS:
+            if field not in row:
+                continue
             value = self._normalize_filter_option_value(field, row.get(field, ""))
             if not value:
                 continue
@@ -282,20 +415,11 @@ class AppControllerCanTrafficMixin:
             seen.add(value)
             values.append(value)
             changed = True
+        return changed
 
-        if changed:
-            self.canFilterOptionsChanged.emit()
     @staticmethod
-    def _is_uds_identifier(identifier: int) -> bool:
-        try:
-            parsed = J1939CanIdentifier(int(identifier))
-            pgn = int(parsed.pgn) & 0x3FFFF
-            return pgn in (int(UdsIdentifiers.tx.pgn) & 0x3FFFF, int(UdsIdentifiers.rx.pgn) & 0x3FFFF)
-        except Exception:
-            return False
-    @staticmethod
-    def _is_uds_diagnostic_pgn(pgn: int) -> bool:
-        return ((int(pgn) >> 8) & 0xFF) == 0xDA
+    def _is_uds_pgn(pgn: int) -> bool:
+        return pgn in (int(UdsIdentifiers.tx.pgn) & 0x3FFFF, int(UdsIdentifiers.rx.pgn) & 0x3FFFF)
 
     @Slot(int, bool)
 
@@ -393,17 +517,16 @@ class AppControllerCanTrafficMixin:
             + f" Найдено устройств: {len(self._observed_candidate_values)}."
         )
 
-    def _update_observed_uds_candidate(self, parsed_id: J1939CanIdentifier):
+    def _update_observed_uds_candidate(self, parsed_id: J1939DecodedId, rebuild: bool = True) -> bool:
         device_sa = int(parsed_id.src) & 0xFF
         tester_sa = int(parsed_id.dst) & 0xFF
         current_tester_sa = int(UdsIdentifiers.tx.src) & 0xFF
 
         # Исключаем собственный SA тестера, чтобы не подхватывать эхо своих сообщений.
         if device_sa == current_tester_sa:
-            return
+            return False
 
-        pgn = int(parsed_id.pgn) & 0x3FFFF
-        is_diag = self._is_uds_diagnostic_pgn(pgn)
+        is_diag = parsed_id.is_uds_diagnostic
 
         stats = self._observed_node_stats.get(device_sa)
         if stats is None:
@@ -436,7 +559,9 @@ class AppControllerCanTrafficMixin:
             )[:128]
             self._observed_node_stats = dict(trimmed)
 
-        self._rebuild_observed_candidate_list()
+        if rebuild:
+            self._rebuild_observed_candidate_list()
+        return True
 
     def _reset_observed_uds_candidate(self, emit_signal: bool = True):
         self._observed_node_stats = {}
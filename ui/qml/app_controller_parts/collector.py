@@ -7,7 +7,9 @@ import math
 from pathlib import Path
 import time
 
-from j1939.j1939_can_identifier import J1939CanIdentifier
+from app_can.CanFrame import CanFrame
+from app_can.TxQueue import TxPriority
+from j1939.j1939_decode_cache import J1939DecodedId
 from uds.data_identifiers import UdsData
 from uds.services.read_data_by_id import ServiceReadDataById
 from uds.uds_identifiers import UdsIdentifiers
@@ -155,7 +157,7 @@ class AppControllerCollectorMixin:
         return True
 
     @staticmethod
-    def _extract_collector_node_sa(parsed_id: J1939CanIdentifier) -> int:
+    def _extract_collector_node_sa(parsed_id: J1939DecodedId) -> int:
         node_sa = int(parsed_id.src) & 0xFF
         tester_sa = int(UdsIdentifiers.rx.dst) & 0xFF
         if node_sa == tester_sa:
@@ -182,8 +184,7 @@ class AppControllerCollectorMixin:
         return node
 
     def _collector_node_stale_timeout_sec(self) -> float:
-        nodes_count = max(1, len(self._collector_node_order))
-        cycle_estimate_sec = (float(self._collector_poll_interval_ms) + float(self._collector_cycle_pause_ms)) * nodes_count / 1000.0
+        cycle_estimate_sec = self._collector_poll_scheduler.cycle_estimate_s(len(self._collector_node_order))
         return max(6.0, cycle_estimate_sec * 2.5)
 
     def _prune_collector_inactive_nodes(self):
@@ -216,13 +217,9 @@ class AppControllerCollectorMixin:
         for node_sa in removed_set:
             self._collector_nodes.pop(node_sa, None)
             self._collector_trend_points_by_node.pop(node_sa, None)
+            self._collector_poll_scheduler.forget(node_sa)
 
         self._collector_node_order = [node_sa for node_sa in kept_nodes if node_sa not in removed_set]
-        if len(self._collector_node_order) == 0:
-            self._collector_poll_node_index = 0
-            self._collector_poll_phase = 0
-        else:
-            self._collector_poll_node_index %= len(self._collector_node_order)
 
         self._schedule_collector_views_update(nodes=True, trend=True)
     @staticmethod
@@ -464,7 +461,7 @@ class AppControllerCollectorMixin:
             fuel_percent=float(node.get("fuelLevel", 0.0)),
         )
 
-    def _handle_collector_frame(self, timestamp: str, parsed_id: J1939CanIdentifier, payload: list[int]):
+    def _track_collector_node(self, wall_time_us: int, parsed_id: J1939DecodedId):
         node_sa = self._extract_collector_node_sa(parsed_id)
         tester_sa = int(UdsIdentifiers.rx.dst) & 0xFF
         if node_sa == tester_sa:
@@ -474,30 +471,52 @@ class AppControllerCollectorMixin:
         node = self._ensure_collector_node(node_sa)
         nodes_changed = was_new_node
         node["lastSeenMonotonic"] = time.monotonic()
-        new_last_seen = timestamp[:8] if len(timestamp) >= 8 else timestamp
+        new_last_seen = self._format_wall_time_seconds(wall_time_us)
         if str(node.get("lastSeen", "")) != new_last_seen:
             node["lastSeen"] = new_last_seen
             nodes_changed = True
 
+        if nodes_changed:
+            self._schedule_collector_views_update(nodes=True, trend=was_new_node)
+
+    def _on_collector_frames(self, frames: list[CanFrame]):
+        for frame in frames:
+            if frame.is_tx:
+                continue
+            timestamp = self._format_can_time(frame.timestamp_us, "RX")
+            self._handle_collector_frame(timestamp, self._j1939_decode_cache.get(frame.identifier), frame.payload)
+        # Answered requests free their slots: send the next ones without waiting for the tick.
+        self._fill_collector_poll_slots()
+
+    def _handle_collector_frame(self, timestamp: str, parsed_id: J1939DecodedId, payload: bytes):
+        node_sa = self._extract_collector_node_sa(parsed_id)
+        tester_sa = int(UdsIdentifiers.rx.dst) & 0xFF
+        if node_sa == tester_sa:
+            return
+
         pgn = int(parsed_id.pgn) & 0x3FFFF
         if pgn != (int(UdsIdentifiers.rx.pgn) & 0x3FFFF):
-            if nodes_changed:
-                self._schedule_collector_views_update(nodes=True, trend=was_new_node)
             return
 
         if len(payload) < 4:
-            if nodes_changed:
-                self._schedule_collector_views_update(nodes=True, trend=was_new_node)
             return
 
         sid = int(payload[1]) & 0xFF
+        if sid == 0x7F and (int(payload[2]) & 0xFF) == self._collector_read_service.sid:
+            nrc = int(payload[3]) & 0xFF
+            self._collector_poll_scheduler.on_negative_response(
+                node_sa, nrc, time.monotonic(), response_pending=(nrc == 0x78)
+            )
+            return
         if sid != self._collector_read_service.success_sid:
-            if nodes_changed:
-                self._schedule_collector_views_update(nodes=True, trend=was_new_node)
             return
 
+        was_new_node = int(node_sa) not in self._collector_nodes
+        node = self._ensure_collector_node(node_sa)
         did = self._collector_read_service.parse_did_field(payload)
         value = int(ServiceReadDataById.parse_data_field(payload))
+        self._collector_poll_scheduler.on_response(node_sa, did, time.monotonic(), value)
+        nodes_changed = was_new_node
         has_trend_update = False
 
         if did == int(UdsData.curr_fuel_tank.pid):
@@ -535,30 +554,22 @@ class AppControllerCollectorMixin:
             return
 
         self._prune_collector_inactive_nodes()
+        self._collector_poll_scheduler.expire(time.monotonic())
+        self._fill_collector_poll_slots()
 
-        if len(self._collector_poll_vars) == 0:
+    def _fill_collector_poll_slots(self):
+        if not self._can.is_connect:
             return
-
-        nodes = list(self._collector_node_order)
-        if len(nodes) == 0:
+        if self._source_address_busy:
             return
 
-        self._collector_poll_node_index %= len(nodes)
-        poll_vars_count = len(self._collector_poll_vars)
-        self._collector_poll_phase %= poll_vars_count
-
-        node_sa = int(nodes[self._collector_poll_node_index]) & 0xFF
-        poll_var = self._collector_poll_vars[self._collector_poll_phase]
+        requests = self._collector_poll_scheduler.next_requests(self._collector_node_order, time.monotonic())
+        if len(requests) == 0:
+            return
 
         tx_identifier = copy(UdsIdentifiers.tx)
-        tx_identifier.dst = node_sa
-        self._collector_read_service.read_data_by_identifier(tx_identifier.identifier, poll_var)
-
-        next_phase = (self._collector_poll_phase + 1) % poll_vars_count
-        self._collector_poll_phase = next_phase
-        if next_phase != 0:
-            self._collector_poll_timer.setInterval(self._collector_poll_interval_ms)
-        else:
-            self._collector_poll_node_index = (self._collector_poll_node_index + 1) % len(nodes)
-            self._collector_poll_timer.setInterval(self._collector_cycle_pause_ms)
-
+        for node_sa, poll_var in requests:
+            tx_identifier.dst = node_sa
+            self._collector_read_service.read_data_by_identifier(
+                tx_identifier.identifier, poll_var, TxPriority.POLLING
+            )
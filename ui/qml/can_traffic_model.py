@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from PySide6.QtCore import QAbstractListModel, QByteArray, QModelIndex, QObject, Property, Qt, Signal, Slot
+
+
+class CanTrafficListModel(QAbstractListModel):
+    """List model over CAN journal row seqs; row strings are requested from the controller on demand."""
+
+    ROLE_NAMES = ("time", "dir", "frameId", "pgn", "src", "dst", "j1939", "dlc", "uds", "data",
+                  "dirColor", "dirBg", "dirBorder")
+
+    countChanged = Signal()
+
+    def __init__(self, row_provider: Callable[[int], dict[str, str]], limit: int = 1500,
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self._row_provider = row_provider
+        self._limit = max(int(limit), 1)
+        self._seqs: list[int] = []
+        self._roles = {Qt.UserRole + 1 + index: name for index, name in enumerate(self.ROLE_NAMES)}
+
+    @property
+    def seqs(self) -> list[int]:
+        return self._seqs
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def last_seq(self) -> int | None:
+        return self._seqs[-1] if self._seqs else None
+
+    @Property(int, notify=countChanged)
+    def count(self):
+        return len(self._seqs)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._seqs)
+
+    def roleNames(self):
+        return {role: QByteArray(name.encode("ascii")) for role, name in self._roles.items()}
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row_index = index.row()
+        if not (0 <= row_index < len(self._seqs)):
+            return None
+        name = self._roles.get(role)
+        if name is None:
+            return None
+        return self._row_provider(self._seqs[row_index]).get(name, "")
+
+    @Slot(int, result="QVariantMap")
+    def get(self, row_index: int):
+        if not (0 <= row_index < len(self._seqs)):
+            return {}
+        return dict(self._row_provider(self._seqs[row_index]))
+
+    def append_seqs(self, seqs: list[int]):
+        """Append new rows at the end, dropping the oldest ones beyond the window limit."""
+        if not seqs:
+            return
+        if len(seqs) > self._limit:
+            seqs = seqs[-self._limit:]
+
+        overflow = len(self._seqs) + len(seqs) - self._limit
+        if overflow > 0:
+            self.remove_first(overflow)
+
+        first = len(self._seqs)
+        self.beginInsertRows(QModelIndex(), first, first + len(seqs) - 1)
+        self._seqs.extend(seqs)
+        self.endInsertRows()
+        self.countChanged.emit()
+
+    def remove_first(self, count: int):
+        count = min(int(count), len(self._seqs))
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self._seqs[:count]
+        self.endRemoveRows()
+        self.countChanged.emit()
+
+    def remove_before(self, seq: int):
+        """Drop rows whose journal seq was already evicted from the ring buffer."""
+        count = 0
+        for value in self._seqs:
+            if value >= seq:
+                break
+            count += 1
+        self.remove_first(count)
+
+    def reset_seqs(self, seqs: list[int]):
+        self.beginResetModel()
+        self._seqs = list(seqs[-self._limit:])
+        self.endResetModel()
+        self.countChanged.emit()
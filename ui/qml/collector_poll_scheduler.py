@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from uds.data_identifiers import UdsVar
+
+# A single-frame ReadDataByIdentifier request and its single-frame answer.
+FRAMES_PER_REQUEST = 2
+
+
+@dataclass
+class PendingPoll:
+    node_sa: int
+    var: UdsVar
+    sent_at: float
+    deadline: float
+
+
+@dataclass
+class PollSeriesStats:
+    """Adaptive state of one node/DID pair."""
+
+    period_s: float
+    due: float = 0.0
+    samples: int = 0
+    changed_samples: int = 0
+    last_value: int | None = None
+    latency_s: float = 0.0
+
+
+class CollectorPollScheduler:
+    """
+    Keeps up to max_in_flight DID requests outstanding, each to a different node.
+
+    Responses come back on the node's own RX identifier, so one request per node
+    can't collide with another. A node walks its DID list with poll_interval_s
+    between requests and cycle_pause_s after the last one; a slot freed by a
+    response or a timeout is handed to the next due node right away.
+
+    In adaptive mode every node/DID pair has its own period: it shrinks while the
+    value keeps changing and grows while it stays put, never below a multiple of
+    the node's measured latency. bus_budget_fps caps the request rate in both
+    modes; when the budget is short, the most overdue pairs (relative to their
+    period) are polled first.
+    """
+
+    ACTIVE_PERIOD_FACTOR = 0.7
+    IDLE_PERIOD_FACTOR = 1.25
+    TIMEOUT_PERIOD_FACTOR = 2.0
+    LATENCY_PERIOD_FACTOR = 4.0
+    SMOOTHING = 0.2
+
+    def __init__(self,
+                 poll_vars: list[UdsVar],
+                 max_in_flight: int = 8,
+                 poll_interval_s: float = 1.0,
+                 cycle_pause_s: float = 1.0,
+                 timeout_s: float = 0.3,
+                 pending_timeout_s: float = 2.0,
+                 adaptive: bool = False,
+                 bus_budget_fps: float = 0.0,
+                 min_period_s: float = 0.1,
+                 max_period_s: float = 30.0,
+                 deadband: int = 1):
+        self._poll_vars = list(poll_vars)
+        self._max_in_flight = max(1, int(max_in_flight))
+        self.poll_interval_s = float(poll_interval_s)
+        self.cycle_pause_s = float(cycle_pause_s)
+        self.timeout_s = float(timeout_s)
+        self.pending_timeout_s = float(pending_timeout_s)
+        self.adaptive = bool(adaptive)
+        self.min_period_s = float(min_period_s)
+        self.max_period_s = float(max_period_s)
+        # Smaller changes (raw units) are treated as noise.
+        self.deadband = int(deadband)
+
+        self._pending: dict[int, PendingPoll] = {}
+        self._phase: dict[int, int] = {}
+        self._next_due: dict[int, float] = {}
+        self._series: dict[tuple[int, int], PollSeriesStats] = {}
+        # Rotating start keeps nodes fair when more of them are due than there are slots.
+        self._cursor = 0
+
+        self._bus_budget_fps = 0.0
+        self._tokens = 0.0
+        self._tokens_time: float | None = None
+        self.bus_budget_fps = bus_budget_fps
+
+        self.sent = 0
+        self.responses = 0
+        self.changed_responses = 0
+        self.timeouts = 0
+        self.negative_responses = 0
+        self.latency_sum_s = 0.0
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: int):
+        self._max_in_flight = max(1, int(value))
+
+    @property
+    def bus_budget_fps(self) -> float:
+        """Frames per second the polling may put on the bus (requests and answers), 0 - unlimited."""
+        return self._bus_budget_fps
+
+    @bus_budget_fps.setter
+    def bus_budget_fps(self, value: float):
+        self._bus_budget_fps = max(0.0, float(value))
+        self._tokens = min(self._tokens, self._token_capacity())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def mean_latency_s(self) -> float:
+        return self.latency_sum_s / self.responses if self.responses > 0 else 0.0
+
+    def stats(self) -> dict[str, int | float | bool]:
+        """Counters since the last reset, for logs and benchmarks."""
+        return {
+            "sent": self.sent,
+            "responses": self.responses,
+            "changed_responses": self.changed_responses,
+            "timeouts": self.timeouts,
+            "negative_responses": self.negative_responses,
+            "mean_latency_ms": self.mean_latency_s * 1000.0,
+            "adaptive": self.adaptive,
+        }
+
+    def series_stats(self, node_sa: int, var: UdsVar) -> PollSeriesStats | None:
+        return self._series.get((int(node_sa) & 0xFF, int(var.pid)))
+
+    def cycle_estimate_s(self, nodes_count: int) -> float:
+        """Time to poll every DID of every node once."""
+        vars_count = max(1, len(self._poll_vars))
+        if self.adaptive:
+            per_node = self.max_period_s
+        else:
+            per_node = self.poll_interval_s * (vars_count - 1) + self.cycle_pause_s + self.timeout_s * vars_count
+        rounds = -(-max(1, int(nodes_count)) // self._max_in_flight)
+        estimate = max(per_node, self.timeout_s * vars_count * rounds)
+        if self._bus_budget_fps > 0.0:
+            estimate = max(estimate, nodes_count * vars_count * FRAMES_PER_REQUEST / self._bus_budget_fps)
+        return estimate
+
+    def next_requests(self, nodes: list[int], now: float) -> list[tuple[int, UdsVar]]:
+        """Claims free slots for due nodes; the caller sends the returned requests."""
+        if len(self._poll_vars) == 0 or len(nodes) == 0:
+            return []
+
+        free = min(self._max_in_flight - len(self._pending), self._take_budget(now))
+        if free <= 0:
+            return []
+        if self.adaptive:
+            requests = self._next_adaptive_requests(nodes, now, free)
+        else:
+            requests = self._next_round_requests(nodes, now, free)
+
+        for node_sa, var in requests:
+            self._pending[node_sa] = PendingPoll(node_sa, var, now, now + self.timeout_s)
+        self.sent += len(requests)
+        if self._bus_budget_fps > 0.0:
+            self._tokens -= len(requests)
+        return requests
+
+    def on_response(self, node_sa: int, did: int, now: float, value: int | None = None) -> float | None:
+        """Positive response; returns the request latency if it matches the outstanding DID."""
+        pending = self._pending.get(int(node_sa) & 0xFF)
+        if pending is None or int(pending.var.pid) != int(did):
+            return None
+        latency = now - pending.sent_at
+        self.responses += 1
+        self.latency_sum_s += latency
+        if self._update_series(pending, latency, value):
+            self.changed_responses += 1
+        self._finish(pending)
+        return latency
+
+    def on_negative_response(self, node_sa: int, nrc: int, now: float, response_pending: bool = False):
+        pending = self._pending.get(int(node_sa) & 0xFF)
+        if pending is None:
+            return
+        if response_pending:
+            pending.deadline = max(pending.deadline, now + self.pending_timeout_s)
+            return
+        self.negative_responses += 1
+        self._back_off(pending)
+        self._finish(pending)
+
+    def expire(self, now: float) -> list[PendingPoll]:
+        """Frees slots whose response did not arrive in time."""
+        expired = [pending for pending in self._pending.values() if pending.deadline <= now]
+        for pending in expired:
+            self.timeouts += 1
+            self._back_off(pending)
+            self._finish(pending)
+        return expired
+
+    def forget(self, node_sa: int):
+        normalized = int(node_sa) & 0xFF
+        self._pending.pop(normalized, None)
+        self._phase.pop(normalized, None)
+        self._next_due.pop(normalized, None)
+        for var in self._poll_vars:
+            self._series.pop((normalized, int(var.pid)), None)
+
+    def reset(self):
+        self._pending.clear()
+        self._phase.clear()
+        self._next_due.clear()
+        self._series.clear()
+        self._cursor = 0
+
+    def _next_round_requests(self, nodes: list[int], now: float, free: int) -> list[tuple[int, UdsVar]]:
+        requests: list[tuple[int, UdsVar]] = []
+        count = len(nodes)
+        start = self._cursor % count
+        for offset in range(count):
+            if len(requests) >= free:
+                break
+            node_sa = int(nodes[(start + offset) % count]) & 0xFF
+            if node_sa in self._pending or self._next_due.get(node_sa, 0.0) > now:
+                continue
+            phase = self._phase.get(node_sa, 0) % len(self._poll_vars)
+            requests.append((node_sa, self._poll_vars[phase]))
+            self._cursor = (start + offset + 1) % count
+        return requests
+
+    def _next_adaptive_requests(self, nodes: list[int], now: float, free: int) -> list[tuple[int, UdsVar]]:
+        # Per node the most overdue DID; across nodes the largest lateness in periods wins.
+        candidates: list[tuple[float, int, UdsVar]] = []
+        for node_sa in nodes:
+            node_sa = int(node_sa) & 0xFF
+            if node_sa in self._pending:
+                continue
+            best: tuple[float, int, UdsVar] | None = None
+            for var in self._poll_vars:
+                series = self._ensure_series(node_sa, var, now)
+                lateness = (now - series.due) / series.period_s
+                if lateness >= 0.0 and (best is None or lateness > best[0]):
+                    best = (lateness, node_sa, var)
+            if best is not None:
+                candidates.append(best)
+
+        if len(candidates) > free:
+            candidates.sort(key=lambda item: item[0], reverse=True)
+            candidates = candidates[:free]
+        return [(node_sa, var) for _lateness, node_sa, var in candidates]
+
+    def _ensure_series(self, node_sa: int, var: UdsVar, now: float) -> PollSeriesStats:
+        key = (node_sa, int(var.pid))
+        series = self._series.get(key)
+        if series is None:
+            # Start from the fixed-mode cadence and adapt from there.
+            vars_count = max(1, len(self._poll_vars))
+            period = self.poll_interval_s * (vars_count - 1) + self.cycle_pause_s
+            series = PollSeriesStats(period_s=self._clamp_period(period), due=now)
+            self._series[key] = series
+        return series
+
+    def _update_series(self, pending: PendingPoll, latency: float, value: int | None) -> bool:
+        series = self._ensure_series(pending.node_sa, pending.var, pending.sent_at)
+        changed = False
+        if value is not None:
+            if series.last_value is not None:
+                changed = abs(int(value) - series.last_value) > self.deadband
+            series.last_value = int(value)
+            series.samples += 1
+            if changed:
+                series.changed_samples += 1
+        if series.latency_s <= 0.0:
+            series.latency_s = latency
+        else:
+            series.latency_s += self.SMOOTHING * (latency - series.latency_s)
+
+        if self.adaptive:
+            factor = self.ACTIVE_PERIOD_FACTOR if changed else self.IDLE_PERIOD_FACTOR
+            series.period_s = self._clamp_period(series.period_s * factor, series.latency_s)
+            series.due = pending.sent_at + series.period_s
+        return changed
+
+    def _back_off(self, pending: PendingPoll):
+        if not self.adaptive:
+            return
+        series = self._ensure_series(pending.node_sa, pending.var, pending.sent_at)
+        series.period_s = self._clamp_period(series.period_s * self.TIMEOUT_PERIOD_FACTOR, series.latency_s)
+        series.due = pending.sent_at + series.period_s
+
+    def _clamp_period(self, period_s: float, latency_s: float = 0.0) -> float:
+        floor = max(self.min_period_s, latency_s * self.LATENCY_PERIOD_FACTOR)
+        return min(max(period_s, floor), max(self.max_period_s, floor))
+
+    def _token_capacity(self) -> float:
+        # Burst of at most one window of requests.
+        return float(self._max_in_flight)
+
+    def _take_budget(self, now: float) -> int:
+        if self._bus_budget_fps <= 0.0:
+            return self._max_in_flight
+        if self._tokens_time is not None:
+            rate = self._bus_budget_fps / FRAMES_PER_REQUEST
+            self._tokens = min(self._tokens + (now - self._tokens_time) * rate, self._token_capacity())
+        self._tokens_time = now
+        return int(self._tokens)
+
+    def _finish(self, pending: PendingPoll):
+        node_sa = pending.node_sa
+        self._pending.pop(node_sa, None)
+        next_phase = (self._phase.get(node_sa, 0) + 1) % max(1, len(self._poll_vars))
+        self._phase[node_sa] = next_phase
+        pause = self.cycle_pause_s if next_phase == 0 else self.poll_interval_s
+        # Pacing counts from the request, so a node's sample period does not drift with latency.
+        self._next_due[node_sa] = pending.sent_at + pause
@@ -1,6 +1,7 @@
 import QtQuick 2.15
 import QtQuick.Controls 2.15
 import QtQuick.Layouts 1.15
+import QtQuick.Dialogs
 import "."
 
 /*
@@ -14,6 +15,7 @@ Card {
     property color textMain: "#1f2d3d"
     property color textSoft: "#607084"
     readonly property string anyOptionText: "Все"
+    readonly property bool captureViewActive: root.appController ? root.appController.canCaptureViewActive : false
 
     // Единые размеры колонок для строгого выравнивания.
     readonly property int colTime: 90
@@ -111,12 +113,74 @@ Card {
                 }
 
                 Text {
-                    text: "TX/RX сообщения с разбором ID, PGN, адресов и ISO-TP"
+                    Layout.fillWidth: true
+                    text: root.captureViewActive ? root.appController.canCaptureViewText : "TX/RX сообщения с разбором ID, PGN, адресов и ISO-TP"
                     color: root.textSoft
                     font.pixelSize: 12
                     font.family: "Bahnschrift"
+                    elide: Text.ElideMiddle
                 }
             }
+
+            // Просмотр файла записи: постраничный переход и поиск по времени.
+            RowLayout {
+                visible: root.captureViewActive
+                spacing: 6
+
+                FancyButton {
+                    Layout.preferredWidth: 40
+                    Layout.preferredHeight: 30
+                    text: "<"
+                    fontPixelSize: 12
+                    enabled: root.captureViewActive && root.appController.canCapturePageIndex > 0
+                    onClicked: root.appController.showCanCapturePage(root.appController.canCapturePageIndex - 1)
+                }
+
+                Text {
+                    text: root.captureViewActive ? ("Стр. " + (root.appController.canCapturePageIndex + 1) + " / " + root.appController.canCapturePageCount) : ""
+                    color: root.textSoft
+                    font.pixelSize: 11
+                    font.family: "Bahnschrift"
+                }
+
+                FancyButton {
+                    Layout.preferredWidth: 40
+                    Layout.preferredHeight: 30
+                    text: ">"
+                    fontPixelSize: 12
+                    enabled: root.captureViewActive && root.appController.canCapturePageIndex + 1 < root.appController.canCapturePageCount
+                    onClicked: root.appController.showCanCapturePage(root.appController.canCapturePageIndex + 1)
+                }
+
+                FancyTextField {
+                    id: captureSeekField
+                    Layout.preferredWidth: 96
+                    Layout.preferredHeight: 30
+                    placeholderText: "ЧЧ:ММ:СС"
+                    onAccepted: if (root.appController) root.appController.seekCanCaptureTime(text)
+                }
+
+                FancyButton {
+                    Layout.preferredWidth: 96
+                    Layout.preferredHeight: 30
+                    text: "К журналу"
+                    fontPixelSize: 12
+                    tone: "#0f766e"
+                    toneHover: "#115e59"
+                    tonePressed: "#134e4a"
+                    onClicked: if (root.appController) root.appController.closeCanCaptureFile()
+                }
+            }
+
+            FancyButton {
+                visible: !root.captureViewActive
+                Layout.preferredWidth: 130
+                Layout.preferredHeight: 30
+                text: "Открыть запись"
+                fontPixelSize: 12
+                enabled: root.appController !== null
+                onClicked: captureFileDialog.open()
+            }
         }
 
         Item {
@@ -216,7 +280,7 @@ Card {
                                 anchors.bottomMargin: 6
                                 clip: true
                                 spacing: 3
-                                model: root.appController ? root.appController.filteredCanTrafficLogs : []
+                                model: root.appController ? root.appController.canTrafficModel : null
 
                                 onCountChanged: if (count > 0) positionViewAtEnd()
 
@@ -234,34 +298,34 @@ Card {
                                         anchors.rightMargin: root.headerRightPadding
                                         spacing: root.rowSpacing
 
-                                        Text { text: modelData.time ? modelData.time : ""; Layout.preferredWidth: root.colTime; color: root.textSoft; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.time ? model.time : ""; Layout.preferredWidth: root.colTime; color: root.textSoft; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
 
                                         Rectangle {
                                             Layout.preferredWidth: root.colDir
                                             Layout.preferredHeight: 20
                                             radius: 8
-                                            color: modelData.dirBg ? modelData.dirBg : "#e2e8f0"
-                                            border.color: modelData.dirBorder ? modelData.dirBorder : "#cbd5e1"
+                                            color: model.dirBg ? model.dirBg : "#e2e8f0"
+                                            border.color: model.dirBorder ? model.dirBorder : "#cbd5e1"
                                             border.width: 1
 
                                             Text {
                                                 anchors.centerIn: parent
-                                                text: modelData.dir ? modelData.dir : "-"
-                                                color: modelData.dirColor ? modelData.dirColor : "#334155"
+                                                text: model.dir ? model.dir : "-"
+                                                color: model.dirColor ? model.dirColor : "#334155"
                                                 font.pixelSize: 11
                                                 font.bold: true
                                                 font.family: "Consolas"
                                             }
                                         }
 
-                                        Text { text: modelData.frameId ? modelData.frameId : ""; Layout.preferredWidth: root.colId; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.pgn ? modelData.pgn : ""; Layout.preferredWidth: root.colPgn; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.src ? modelData.src : ""; Layout.preferredWidth: root.colSrc; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.dst ? modelData.dst : ""; Layout.preferredWidth: root.colDst; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.j1939 ? modelData.j1939 : ""; Layout.preferredWidth: root.colJ1939; color: "#334155"; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.dlc ? modelData.dlc : ""; Layout.preferredWidth: root.colDlc; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; horizontalAlignment: Text.AlignHCenter; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.uds ? modelData.uds : ""; Layout.preferredWidth: root.colUds; color: "#475569"; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
-                                        Text { text: modelData.data ? modelData.data : ""; Layout.fillWidth: true; Layout.minimumWidth: root.minimumDataColumnWidth; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.frameId ? model.frameId : ""; Layout.preferredWidth: root.colId; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.pgn ? model.pgn : ""; Layout.preferredWidth: root.colPgn; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.src ? model.src : ""; Layout.preferredWidth: root.colSrc; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.dst ? model.dst : ""; Layout.preferredWidth: root.colDst; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.j1939 ? model.j1939 : ""; Layout.preferredWidth: root.colJ1939; color: "#334155"; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.dlc ? model.dlc : ""; Layout.preferredWidth: root.colDlc; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; horizontalAlignment: Text.AlignHCenter; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.uds ? model.uds : ""; Layout.preferredWidth: root.colUds; color: "#475569"; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
+                                        Text { text: model.data ? model.data : ""; Layout.fillWidth: true; Layout.minimumWidth: root.minimumDataColumnWidth; color: root.textMain; font.pixelSize: 12; font.family: "Consolas"; elide: Text.ElideRight; verticalAlignment: Text.AlignVCenter }
                                     }
                                 }
 
@@ -334,12 +398,60 @@ Card {
                 }
             }
 
+            Rectangle {
+                Layout.preferredWidth: 212
+                Layout.preferredHeight: 28
+                radius: 8
+                color: "#f7fbff"
+                border.color: "#d5e2ef"
+                border.width: 1
+
+                RowLayout {
+                    anchors.fill: parent
+                    anchors.leftMargin: 8
+                    anchors.rightMargin: 6
+                    spacing: 6
+
+                    Rectangle {
+                        width: 8
+                        height: 8
+                        radius: 4
+                        color: root.appController && root.appController.canCaptureActive ? "#dc2626" : "#94a3b8"
+                        border.width: 0
+                    }
+
+                    Text {
+                        Layout.fillWidth: true
+                        text: root.appController && root.appController.canCaptureActive ? "Запись в файл идет" : "Запись в файл"
+                        color: "#51657a"
+                        font.pixelSize: 10
+                        font.family: "Bahnschrift"
+                        elide: Text.ElideRight
+                    }
+
+                    FancySwitch {
+                        checked: root.appController ? root.appController.canCaptureActive : false
+                        enabled: root.appController !== null
+                        trackWidth: 38
+                        trackHeight: 22
+                        onToggled: if (root.appController) root.appController.setCanCaptureEnabled(checked)
+                    }
+                }
+
+                ToolTip.visible: captureHover.hovered && root.appController && root.appController.canCapturePath.length > 0
+                ToolTip.text: root.appController ? root.appController.canCapturePath : ""
+
+                HoverHandler {
+                    id: captureHover
+                }
+            }
+
             Item {
                 Layout.fillWidth: true
             }
 
             Text {
-                text: root.appController ? ("Записей: " + trafficList.count + " / " + root.appController.canTrafficLogs.length) : ("Записей: " + trafficList.count)
+                text: root.appController ? ("Записей: " + trafficList.count + " / " + root.appController.canTrafficJournalCount) : ("Записей: " + trafficList.count)
                 color: "#7489a1"
                 font.pixelSize: 10
                 font.family: "Bahnschrift"
@@ -412,4 +524,12 @@ Card {
 
         }
     }
+
+    FileDialog {
+        id: captureFileDialog
+        title: "Выберите файл записи CAN"
+        fileMode: FileDialog.OpenFile
+        nameFilters: ["Записи CAN (*.tccap)", "Все файлы (*)"]
+        onAccepted: if (root.appController) root.appController.openCanCaptureFile(selectedFile)
+    }
 }
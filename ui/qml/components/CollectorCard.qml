@@ -192,6 +192,32 @@ Card {
                         }
                     }
 
+                    ColumnLayout {
+                        spacing: 4
+                        Layout.preferredWidth: 176
+
+                        Text {
+                            text: "Запросов одновременно"
+                            color: root.textSoft
+                            font.pixelSize: 12
+                            font.family: "Bahnschrift"
+                        }
+
+                        FancyTextField {
+                            id: maxInFlightField
+                            Layout.fillWidth: true
+                            Layout.preferredHeight: 34
+                            text: root.appController ? String(root.appController.collectorMaxInFlight) : "8"
+                            placeholderText: "узлов"
+                            textColor: root.textMain
+                            bgColor: root.inputBg
+                            borderColor: root.inputBorder
+                            focusBorderColor: root.inputFocus
+                            validator: IntValidator { bottom: 1; top: 64 }
+                            onAccepted: if (root.appController) root.appController.setCollectorMaxInFlight(text)
+                        }
+                    }
+
                     Item { Layout.fillWidth: true }
 
                     FancyButton {
@@ -206,9 +232,63 @@ Card {
                         onClicked: if (root.appController) {
                             root.appController.setCollectorPollIntervalMs(pollIntervalField.text)
                             root.appController.setCollectorCyclePauseMs(cyclePauseField.text)
+                            root.appController.setCollectorMaxInFlight(maxInFlightField.text)
+                            root.appController.setCollectorBusBudgetFps(busBudgetField.text)
                         }
                     }
                 }
+
+                RowLayout {
+                    Layout.fillWidth: true
+                    spacing: 12
+
+                    ColumnLayout {
+                        spacing: 4
+                        Layout.preferredWidth: 216
+
+                        Text {
+                            text: "Бюджет шины, кадров/с (0 — без)"
+                            color: root.textSoft
+                            font.pixelSize: 12
+                            font.family: "Bahnschrift"
+                        }
+
+                        FancyTextField {
+                            id: busBudgetField
+                            Layout.fillWidth: true
+                            Layout.preferredHeight: 34
+                            text: root.appController ? String(root.appController.collectorBusBudgetFps) : "0"
+                            placeholderText: "кадров/с"
+                            textColor: root.textMain
+                            bgColor: root.inputBg
+                            borderColor: root.inputBorder
+                            focusBorderColor: root.inputFocus
+                            validator: IntValidator { bottom: 0; top: 8000 }
+                            onAccepted: if (root.appController) root.appController.setCollectorBusBudgetFps(text)
+                        }
+                    }
+
+                    Text {
+                        Layout.alignment: Qt.AlignBottom
+                        Layout.bottomMargin: 8
+                        text: "Адаптивный опрос"
+                        color: root.textSoft
+                        font.pixelSize: 12
+                        font.family: "Bahnschrift"
+                    }
+
+                    FancySwitch {
+                        Layout.alignment: Qt.AlignBottom
+                        Layout.bottomMargin: 5
+                        checked: root.appController ? root.appController.collectorAdaptivePolling : false
+                        enabled: root.appController !== null
+                        trackWidth: 42
+                        trackHeight: 24
+                        onToggled: if (root.appController) root.appController.setCollectorAdaptivePolling(checked)
+                    }
+
+                    Item { Layout.fillWidth: true }
+                }
             }
         }
 
@@ -413,5 +493,15 @@ Card {
                 cyclePauseField.text = String(root.appController.collectorCyclePauseMs)
             }
         }
+        function onCollectorBusBudgetChanged() {
+            if (!busBudgetField.activeFocus && root.appController) {
+                busBudgetField.text = String(root.appController.collectorBusBudgetFps)
+            }
+        }
+        function onCollectorMaxInFlightChanged() {
+            if (!maxInFlightField.activeFocus && root.appController) {
+                maxInFlightField.text = String(root.appController.collectorMaxInFlight)
+            }
+        }
     }
 }